@@ -0,0 +1,64 @@
+"""
+Measures how long a fresh interpreter takes to import a module, by default the reaction engine,
+and which heavy optional dependencies the import pulls in. Run from the repository root:
+
+    python benchmarks/import_time.py
+    python benchmarks/import_time.py --module src.single_stranded_nucleic_acids --runs 20 --max-ms 60
+
+Each run starts a new interpreter, so only the import is timed, not interpreter startup. The
+first run also writes the bytecode cache and is left out of the statistics.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# Only needed for plotting, tables or vectorized scans, never to build sequences or run reactions
+heavy_modules = ["numpy", "pandas", "matplotlib", "bokeh", "dna_features_viewer", "Bio"]
+
+_timing_script = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(elapsed * 1000)
+print(",".join(name for name in {heavy_modules!r} if name in sys.modules))
+"""
+
+
+def time_import(module: str, runs: int) -> tuple:
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=root)
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    script = _timing_script.format(module=module, heavy_modules=heavy_modules)
+    timings, loaded = [], set()
+    for run in range(runs + 1):
+        output = subprocess.run([sys.executable, "-c", script], env=env, cwd=root, check=True,
+                                capture_output=True, text=True).stdout.splitlines()
+        if run:
+            timings.append(float(output[0]))
+        loaded.update(name for name in output[1].split(",") if name)
+    return timings, sorted(loaded)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="src.nucleic_acid_reactions")
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--max-ms", type=float, default=None,
+                        help="Exit with status 1 if the median import time is above this")
+    args = parser.parse_args()
+    timings, loaded = time_import(args.module, args.runs)
+    median = statistics.median(timings)
+    print(f"{args.module}: median {median:.1f} ms, min {min(timings):.1f} ms, max {max(timings):.1f} ms "
+          f"over {args.runs} runs")
+    print(f"heavy modules loaded: {', '.join(loaded) or 'none'}")
+    if args.max_ms is not None and median > args.max_ms:
+        print(f"median import time is above {args.max_ms} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,231 @@
+import asyncio
+import os
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+from typing import AsyncIterable, AsyncIterator, Callable, Iterable, List, Optional, Tuple, Union
+
+from src.double_stranded_nucleic_acids import DoubleStrandNucleicAcidSequence
+from src.nucleic_acid_reactions import NucleicAcidReaction
+from src.sequence_io import FastaWriter, FastqWriter, read_fasta, read_fastq
+from src.sequence_registry import track_nucleic_acid
+from src.single_stranded_nucleic_acids import SingleStrandNucleicAcidSequence
+
+
+def _run_reaction(reaction_type: str, inputs: dict, kwargs: dict) -> NucleicAcidReaction:
+    # Runs in a worker. Lazy outputs are made here, where the work belongs, and the inputs are
+    # not sent back, the caller still has them.
+    reaction = NucleicAcidReaction(reaction_type, inputs, **kwargs)
+    reaction.outputs = {key: list(value) if hasattr(value, "__next__") else value
+                        for key, value in reaction.outputs.items()}
+    reaction.inputs = {}
+    return reaction
+
+
+def _track_outputs(value) -> None:
+    # Objects unpickled from a worker process skip __init__, so they are registered here for
+    # sequence_registry.get_nucleic_acid
+    if isinstance(value, DoubleStrandNucleicAcidSequence):
+        for nucleic_acid in (value, value.forward_sequence, value.reverse_sequence):
+            track_nucleic_acid(nucleic_acid)
+    elif isinstance(value, SingleStrandNucleicAcidSequence):
+        track_nucleic_acid(value)
+    elif isinstance(value, dict):
+        for field in value.values():
+            _track_outputs(field)
+    elif isinstance(value, (list, tuple)):
+        for field in value:
+            _track_outputs(field)
+
+
+def _next_batch(records, batch_size: int) -> list:
+    return list(islice(records, batch_size))
+
+
+class AsyncReactionRunner:
+    """
+    Runs reactions and sequence file reads and writes off the event loop, for asyncio services.
+    Reactions run on a process pool, file I/O on a small thread pool, both made on first use
+    and shut down by close or on leaving an async with block.
+
+    At most max_concurrency reactions are submitted at a time, callers past that wait for a free
+    slot, so a burst of requests never piles up work and memory in the pool. Cancelling a caller
+    drops its reaction if it has not started, a reaction already running in a worker finishes
+    and its result is discarded.
+
+    Parameters:
+    - processes (int): Number of worker processes, None for one per CPU and 0 to run reactions
+        on threads, which skips pickling but shares the GIL with the event loop.
+    - max_concurrency (int): The most reactions submitted at once, by default twice the workers.
+    - io_threads (int): Number of threads for file reads and writes.
+    """
+
+    def __init__(self, processes: Optional[int] = None, max_concurrency: Optional[int] = None,
+                 io_threads: int = 4):
+        if processes is not None and (not isinstance(processes, int) or processes < 0):
+            raise ValueError("Processes must be a non-negative integer or None.")
+        if max_concurrency is not None and (not isinstance(max_concurrency, int) or max_concurrency < 1):
+            raise ValueError("Maximum concurrency must be a positive integer or None.")
+        if not isinstance(io_threads, int) or io_threads < 1:
+            raise ValueError("I/O threads must be a positive integer.")
+        self._processes = processes
+        self._io_threads = io_threads
+        self._reaction_executor: Optional[Executor] = None
+        self._io_executor: Optional[ThreadPoolExecutor] = None
+        self.max_concurrency = max_concurrency or 2 * (processes or os.cpu_count() or 1)
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self._closed = False
+
+    def __repr__(self):
+        return f"AsyncReactionRunner(processes={self._processes}, max_concurrency={self.max_concurrency})"
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+    def _executor(self, io: bool = False) -> Executor:
+        if self._closed:
+            raise RuntimeError("The runner is closed.")
+        if io:
+            if self._io_executor is None:
+                self._io_executor = ThreadPoolExecutor(self._io_threads, thread_name_prefix="sequence-io")
+            return self._io_executor
+        if self._reaction_executor is None:
+            self._reaction_executor = ThreadPoolExecutor(thread_name_prefix="reaction") \
+                if self._processes == 0 else ProcessPoolExecutor(self._processes)
+        return self._reaction_executor
+
+    async def _in_io_thread(self, function: Callable, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor(io=True), partial(function, *args))
+
+    async def run_reaction(self, reaction_type: str, inputs: dict, **kwargs) -> NucleicAcidReaction:
+        """
+        Runs a reaction in the pool, see NucleicAcidReaction, and returns it once it is done with
+        its outputs set. Lazy outputs, such as the constructs of a batch SMRTbell prep, are
+        returned as lists.
+        """
+        async with self._slots:
+            future = self._executor().submit(_run_reaction, reaction_type, inputs, kwargs)
+            # Cancelling the wrapping future cancels the pool future, which drops queued work
+            reaction = await asyncio.wrap_future(future)
+        if self._processes != 0:
+            _track_outputs(reaction.outputs)
+        reaction.inputs = inputs
+        return reaction
+
+    async def map_reactions(
+        self,
+        jobs: Union[Iterable[Tuple[str, dict, dict]], AsyncIterable[Tuple[str, dict, dict]]],
+    ) -> AsyncIterator[NucleicAcidReaction]:
+        """
+        Runs (reaction_type, inputs, kwargs) jobs and yields the reactions in the order of jobs.
+        Jobs are only taken as slots free up, max_concurrency ahead of the consumer, so jobs
+        can be an endless stream and a slow consumer slows the producer down. Leaving the loop
+        early cancels the jobs still running.
+        """
+        if isinstance(jobs, AsyncIterable):
+            job_iterator = jobs.__aiter__()
+
+            async def next_job():
+                try:
+                    return await job_iterator.__anext__()
+                except StopAsyncIteration:
+                    return None
+        else:
+            job_iterator = iter(jobs)
+
+            async def next_job():
+                return next(job_iterator, None)
+
+        running, exhausted = deque(), False
+        try:
+            while True:
+                while not exhausted and len(running) < self.max_concurrency:
+                    job = await next_job()
+                    if job is None:
+                        exhausted = True
+                        break
+                    reaction_type, inputs, kwargs = job
+                    running.append(asyncio.ensure_future(self.run_reaction(reaction_type, inputs, **kwargs)))
+                if not running:
+                    return
+                yield await running.popleft()
+        finally:
+            for task in running:
+                task.cancel()
+
+    async def read_fasta(self, path: str) -> List[Tuple[str, str]]:
+        # The (header, sequence) of every record, see sequence_io.read_fasta
+        return await self._in_io_thread(lambda: list(read_fasta(path)))
+
+    async def read_fastq(self, path: str) -> list:
+        # Every record as a FastqRecord, see sequence_io.read_fastq
+        return await self._in_io_thread(lambda: list(read_fastq(path)))
+
+    async def iter_fasta(self, path: str, batch_size: int = 1000) -> AsyncIterator[List[Tuple[str, str]]]:
+        """
+        Streams the records of a FASTA file in batches, each read in an I/O thread when the
+        previous one has been consumed, so files of any size are read without holding them.
+        """
+        async for batch in self._iter_records(read_fasta, path, batch_size):
+            yield batch
+
+    async def iter_fastq(self, path: str, batch_size: int = 1000) -> AsyncIterator[list]:
+        # Streams FastqRecord batches, see iter_fasta
+        async for batch in self._iter_records(read_fastq, path, batch_size):
+            yield batch
+
+    async def _iter_records(self, reader: Callable, path: str, batch_size: int) -> AsyncIterator[list]:
+        if not isinstance(batch_size, int) or batch_size < 1:
+            raise ValueError("Batch size must be a positive integer.")
+        records = reader(path)
+        reading = None
+        try:
+            while True:
+                reading = asyncio.get_running_loop().run_in_executor(
+                    self._executor(io=True), _next_batch, records, batch_size)
+                # Shielded so a cancelled consumer leaves the read to finish before closing
+                batch = await asyncio.shield(reading)
+                if not batch:
+                    return
+                yield batch
+        finally:
+            # Closes the file, also when the consumer stops early
+            if reading is not None and not reading.done():
+                await asyncio.wait([reading])
+            if self._closed:
+                records.close()
+            else:
+                await self._in_io_thread(records.close)
+
+    async def write_fasta(self, path: str, nucleic_acids: Iterable, line_width: int = 80) -> int:
+        # Writes nucleic acids to a new FASTA file, see sequence_io.FastaWriter, and returns the
+        # number of records written
+        def write():
+            with FastaWriter(path, line_width) as writer:
+                return writer.write(nucleic_acids)
+
+        return await self._in_io_thread(write)
+
+    async def write_fastq(self, path: str, reads: Iterable) -> int:
+        # Writes reads to a new FASTQ file, see sequence_io.FastqWriter
+        def write():
+            with FastqWriter(path) as writer:
+                return writer.write(reads)
+
+        return await self._in_io_thread(write)
+
+    async def close(self) -> None:
+        """
+        Shuts both pools down, dropping reactions not yet started, and waits for the running
+        ones to finish without blocking the event loop.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        executors = [executor for executor in (self._reaction_executor, self._io_executor) if executor is not None]
+        for executor in executors:
+            await asyncio.to_thread(executor.shutdown, wait=True, cancel_futures=True)
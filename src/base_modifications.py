@@ -1,3 +1,6 @@
+import copy
+
+
 base_modification_types = {
     "5-mC": "C",
     "5-hmC": "C",
@@ -6,6 +9,12 @@ base_modification_types = {
     "6-mA": "A",
 }
 
+methylation_types = {
+    "Dam": {"motif": "GATC", "position": 1, "modification_type": "6-mA"},  # G-6mA-TC
+    "Dcm": {"motif": "CCWGG", "position": 1, "modification_type": "5-mC"},  # C-5mC-WGG
+    "CpG": {"motif": "CG", "position": 0, "modification_type": "5-mC"},  # 5mC-G
+}
+
 
 class BaseModification:
 
@@ -14,9 +23,19 @@ class BaseModification:
 
         self._parent_ss_nucleic_acid_id = parent_ss_nucleic_acid.id
         self._position = position
-        self._base = parent_ss_nucleic_acid.sequence[position]
+        self._base = parent_ss_nucleic_acid.subsequence(position, position + 1)
         self._modification_type = modification_type
 
+    @classmethod
+    def _restore(cls, parent_ss_nucleic_acid, position, modification_type):
+        # Builds a modification already known to sit on the right base, without validating it
+        base_mod = cls.__new__(cls)
+        base_mod._parent_ss_nucleic_acid_id = parent_ss_nucleic_acid.id
+        base_mod._position = position
+        base_mod._base = base_modification_types[modification_type]
+        base_mod._modification_type = modification_type
+        return base_mod
+
     def __repr__(self):
         return (f"BaseModification(position={self.position}, base='{self.base}', "
                 f"modification_type='{self.modification_type}')")
@@ -37,6 +56,20 @@ class BaseModification:
     def base(self):
         return self._base
 
+    def _moved(self, position):
+        # Copy at a new position, used by the parent strand when its sequence is edited
+        moved_base_mod = copy.copy(self)
+        moved_base_mod._position = position
+        return moved_base_mod
+
+    def _reparented(self, parent_id):
+        # Copy belonging to another strand, used when a copied strand takes its own features
+        if parent_id == self._parent_ss_nucleic_acid_id:
+            return self
+        reparented_base_mod = copy.copy(self)
+        reparented_base_mod._parent_ss_nucleic_acid_id = parent_id
+        return reparented_base_mod
+
     def validate_base_modification(self, parent_ss_nucleic_acid, position, modification_type):
         if not isinstance(position, int):
             raise TypeError("Cannot add base modification, position must be an integer.")
@@ -45,13 +78,13 @@ class BaseModification:
         if modification_type not in base_modification_types.keys():
             raise ValueError("Cannot add base modification, invalid modification type. "
                              f"Options are {base_modification_types.keys()}")
-        base = parent_ss_nucleic_acid.sequence[position]
+        if position < 0 or position >= len(parent_ss_nucleic_acid):
+            raise ValueError(
+                "Cannot add modification, must be within index bounds of the parent "
+                "nucleic acid sequence.")
+        base = parent_ss_nucleic_acid.subsequence(position, position + 1)
         if base != base_modification_types[modification_type]:
             raise ValueError(
                 "Cannot add modification, invalid base for specified modification type."
                 f"Base for {modification_type} should be "
                 f"{base_modification_types[modification_type]}")
-        if position < 0 or position >= len(parent_ss_nucleic_acid.sequence):
-            raise ValueError(
-                "Cannot add modification, must be within index bounds of the parent "
-                "nucleic acid sequence.")
@@ -0,0 +1,388 @@
+"""
+Runs a manifest of reactions, e.g. a PCR of every clone of a library, across a process pool:
+
+    python -m src.batch_runner manifest.yaml --output-dir results --processes 8
+
+A manifest is a JSON or YAML file with the sequences the items use, the reaction steps every item
+goes through and the items, or a CSV file of items. Each step names its reaction type, its
+inputs and its keyword arguments. An input given as "$field" takes the field of the item, and
+"$step.output" an output of an earlier step of the same item:
+
+    sequences: [plasmids.fasta, {name: pUC19, sequence: TCGCGCGTTTCG..., circular: true}]
+    steps:
+      - name: pcr
+        reaction_type: pcr
+        inputs: {template: $template, forward_primer: $forward_primer, reverse_primer: $reverse_primer}
+        kwargs: {keep_primer_annotations: true}
+    items: clones.csv
+
+Items without steps, such as the rows of a CSV manifest, are one reaction of their own
+reaction_type, every other field an input and a kwargs field holding JSON keyword arguments.
+Inputs are sequence names or sequences, fields listing several are separated by ";".
+
+Each finished item is appended to results.jsonl in the output directory, with the sizes and ids
+of its outputs, and its output sequences to products.fasta. results.jsonl is the checkpoint: an
+interrupted run started again skips the items it lists.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.double_stranded_nucleic_acids import DoubleStrandNucleicAcidSequence
+from src.nucleic_acid_reactions import NucleicAcidReaction
+from src.sequence_io import read_fasta
+from src.single_stranded_nucleic_acids import SingleStrandNucleicAcidSequence
+from src.util_functions import imap_windows, validate_chunk_size
+
+
+manifest_formats = ["json", "yaml", "yml", "csv"]
+# Inputs the reactions take as single strands and as lists, every other input is a double strand
+single_strand_inputs = {"forward_primer", "reverse_primer", "front_adapter", "back_adapter"}
+list_inputs = {"templates", "fragments"}
+_item_fields = {"id", "reaction_type", "kwargs"}
+_fasta_line_width = 80
+
+
+def _read_structured(path: str):
+    file_format = os.path.splitext(path)[1][1:].lower()
+    with open(path) as handle:
+        if file_format == "json":
+            return json.load(handle)
+        # PyYAML is optional, it is only needed for YAML manifests
+        try:
+            import yaml
+        except ImportError:
+            raise ImportError("PyYAML must be installed to read YAML manifests.") from None
+        return yaml.safe_load(handle)
+
+
+def _csv_items(path: str) -> Iterator[dict]:
+    # Rows are read as they are run, so manifests of any size stream
+    with open(path, newline="") as handle:
+        for row in csv.DictReader(handle):
+            item = {key: value for key, value in row.items() if value not in (None, "")}
+            if "kwargs" in item:
+                item["kwargs"] = json.loads(item["kwargs"])
+            yield item
+
+
+def read_manifest(path: str) -> Tuple[Dict[str, tuple], List[dict], Iterable[dict]]:
+    """
+    Reads a manifest, see the module docstring. Paths in the manifest are relative to it.
+
+    Returns:
+    - tuple: The sequences as {name: (sequence, circular)}, the steps, and the items, streamed
+        from CSV files.
+    """
+    file_format = os.path.splitext(path)[1][1:].lower()
+    if file_format not in manifest_formats:
+        raise ValueError(f"Invalid manifest format: {file_format}. Options are {manifest_formats}")
+    if file_format == "csv":
+        return {}, [], _csv_items(path)
+    manifest = _read_structured(path)
+    if not isinstance(manifest, dict) or "items" not in manifest:
+        raise ValueError("A manifest must be a mapping with items.")
+    base_dir = os.path.dirname(os.path.abspath(path))
+    sequences = {}
+    for source in manifest.get("sequences", []):
+        if isinstance(source, str):
+            # FASTA records are circular when their description says so
+            for header, sequence in read_fasta(os.path.join(base_dir, source)):
+                name, _, description = header.partition(" ")
+                sequences[name] = (sequence, "circular" in description.lower())
+        else:
+            sequences[source["name"]] = (source["sequence"], bool(source.get("circular", False)))
+    items = manifest["items"]
+    if isinstance(items, str):
+        items = _csv_items(os.path.join(base_dir, items))
+    return sequences, manifest.get("steps", []), items
+
+
+def _nucleic_acid(key: str, value: str, sequences: Dict[str, tuple], built: Dict[tuple, object]):
+    # Named sequences are built once, scanning their cut sites, and each item gets a copy on
+    # write of them. They keep their name as note.
+    cached = built.get((key in single_strand_inputs, value))
+    if cached is not None:
+        return cached.copy()
+    sequence, circular = sequences.get(value, (value, False))
+    note = value if value in sequences else ""
+    try:
+        if key in single_strand_inputs:
+            nucleic_acid = SingleStrandNucleicAcidSequence(sequence=sequence, circular=circular, note=note)
+        else:
+            nucleic_acid = DoubleStrandNucleicAcidSequence(forward_sequence=sequence, circular=circular,
+                                                           reverse_sequence_start=0, note=note)
+    except (TypeError, ValueError):
+        if value in sequences:
+            raise
+        raise ValueError(f"Input {key} is neither a known sequence name nor a sequence: {value[:50]}.") from None
+    if value not in sequences:
+        return nucleic_acid
+    built[(key in single_strand_inputs, value)] = nucleic_acid
+    return nucleic_acid.copy()
+
+
+def _resolve_input(key: str, value, item: dict, step_outputs: Dict[str, dict], sequences: Dict[str, tuple],
+                   built: Dict[tuple, object]):
+    if isinstance(value, str) and value.startswith("$"):
+        reference = value[1:]
+        step_name, _, output_key = reference.partition(".")
+        if output_key:
+            if step_name not in step_outputs or output_key not in step_outputs[step_name]:
+                raise ValueError(f"Step output {reference} does not exist.")
+            return step_outputs[step_name][output_key]
+        if reference not in item:
+            raise ValueError(f"Item has no field {reference}.")
+        value = item[reference]
+    if isinstance(value, str):
+        value = [part.strip() for part in value.split(";")]
+        if len(value) == 1 and key not in list_inputs:
+            return _nucleic_acid(key, value[0], sequences, built)
+    if isinstance(value, list):
+        resolved = []
+        for part in value:
+            if isinstance(part, str) and part.startswith("$"):
+                part = _resolve_input(key, part, item, step_outputs, sequences, built)
+            elif isinstance(part, str):
+                part = _nucleic_acid(key, part, sequences, built)
+            resolved += part if isinstance(part, list) else [part]
+        return resolved
+    return value
+
+
+def _item_steps(item: dict, steps: List[dict]) -> List[dict]:
+    if steps:
+        return steps
+    if "reaction_type" not in item:
+        raise ValueError("Items need a reaction_type when the manifest has no steps.")
+    return [{
+        "name": item["reaction_type"],
+        "reaction_type": item["reaction_type"],
+        "inputs": {key: value for key, value in item.items() if key not in _item_fields},
+        "kwargs": item.get("kwargs", {}),
+    }]
+
+
+def _fasta_text(name: str, sequence: str) -> str:
+    lines = [sequence[i:i + _fasta_line_width] for i in range(0, len(sequence), _fasta_line_width)]
+    return "\n".join([f">{name}"] + lines) + "\n"
+
+
+def _summarize(value, name: str, records: List[str]):
+    # JSON friendly summary of a reaction output, its sequences added to records as FASTA text
+    if isinstance(value, DoubleStrandNucleicAcidSequence):
+        records.append(_fasta_text(f"{name} {value.id}", value.forward_sequence.sequence))
+        return {"id": value.id, "length": len(value.forward_sequence), "circular": value.circular}
+    if isinstance(value, SingleStrandNucleicAcidSequence):
+        records.append(_fasta_text(f"{name} {value.id}", value.sequence))
+        return {"id": value.id, "length": len(value), "circular": value.circular}
+    if isinstance(value, dict):
+        summary = {}
+        for key, field in value.items():
+            if key == "sequence" and isinstance(field, str):
+                records.append(_fasta_text(name, field))
+            else:
+                summary[key] = _summarize(field, f"{name}/{key}", records)
+        return summary
+    if isinstance(value, (list, tuple)) or hasattr(value, "__next__"):
+        return [_summarize(field, f"{name}/{number}", records) for number, field in enumerate(value)]
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return repr(value)
+
+
+def run_item(item: dict, steps: List[dict], sequences: Dict[str, tuple],
+             built: Optional[Dict[tuple, object]] = None) -> Tuple[dict, str]:
+    """
+    Runs the steps of one item. Errors of the item are reported in its result rather than raised,
+    so one bad item never stops a batch. built keeps the named sequences built so far for the
+    next items.
+
+    Returns:
+    - tuple: The result, with the id, status, seconds taken and either the outputs of every step
+        or the error, and the FASTA text of the output sequences.
+    """
+    start = time.perf_counter()
+    item_id = str(item.get("id", ""))
+    step_outputs, records = {}, []
+    built = {} if built is None else built
+    try:
+        if not item_id:
+            raise ValueError("Items need an id.")
+        for step in _item_steps(item, steps):
+            step_name = step.get("name", step["reaction_type"])
+            inputs = {key: _resolve_input(key, value, item, step_outputs, sequences, built)
+                      for key, value in step.get("inputs", {}).items()}
+            step_outputs[step_name] = NucleicAcidReaction(step["reaction_type"], inputs,
+                                                          **step.get("kwargs", {})).outputs
+        outputs = {step_name: _summarize(step_output, f"{item_id}/{step_name}", records)
+                   for step_name, step_output in step_outputs.items()}
+        result = {"id": item_id, "status": "done", "outputs": outputs}
+    except Exception as error:
+        records = []
+        result = {"id": item_id, "status": "failed", "error": f"{type(error).__name__}: {error}"}
+    result["seconds"] = round(time.perf_counter() - start, 6)
+    return result, "".join(records)
+
+
+# The steps, sequences and built sequences of each worker process, set once when the pool starts
+_worker_manifest: Optional[Tuple[List[dict], Dict[str, tuple], Dict[tuple, object]]] = None
+
+
+def _set_worker_manifest(steps: List[dict], sequences: Dict[str, tuple]) -> None:
+    global _worker_manifest
+    _worker_manifest = (steps, sequences, {})
+
+
+def _run_worker_item(item: dict) -> Tuple[dict, str]:
+    return run_item(item, *_worker_manifest)
+
+
+def _read_checkpoint(results_path: str, products_path: str) -> Dict[str, str]:
+    # Status of every item of results.jsonl. A line cut short by an interruption is dropped, and
+    # products.fasta is cut back to the end of the products of the last complete item.
+    statuses, good_size, products_size = {}, 0, 0
+    if not os.path.exists(results_path):
+        if os.path.exists(products_path):
+            os.truncate(products_path, 0)
+        return statuses
+    with open(results_path, "rb") as handle:
+        for line in handle:
+            try:
+                result = json.loads(line) if line.endswith(b"\n") else None
+            except ValueError:
+                result = None
+            if result is None:
+                break
+            statuses[result["id"]] = result["status"]
+            products_size = result["products_offset"]
+            good_size += len(line)
+    os.truncate(results_path, good_size)
+    if os.path.exists(products_path):
+        os.truncate(products_path, products_size)
+    return statuses
+
+
+def run_batch(
+    sequences: Dict[str, tuple],
+    steps: List[dict],
+    items: Iterable[dict],
+    output_dir: str,
+    processes: Optional[int] = 1,
+    chunksize: int = 16,
+    resume: bool = True,
+    retry_failed: bool = False,
+    progress: Optional[Callable[[dict], None]] = None,
+    progress_interval: float = 10.0,
+) -> dict:
+    """
+    Runs every item of a manifest, see read_manifest, streaming each result to disk as it
+    finishes. Items are run in order across a process pool, a window of them queued at a time.
+
+    Parameters:
+    - sequences, steps, items: As read_manifest returns them.
+    - output_dir (str): Where results.jsonl and products.fasta are written, made if missing.
+    - processes (int): Number of worker processes, None for one per CPU and 1 to run in process.
+    - chunksize (int): Number of items sent to a worker at a time.
+    - resume (bool): If True, items already in results.jsonl are skipped, else both files are
+        started over.
+    - retry_failed (bool): If True, failed items of an earlier run are run again on resume.
+    - progress (callable): Called with the throughput so far every progress_interval seconds.
+
+    Returns:
+    - dict: The number of items done, failed and skipped, the seconds taken and the items run
+        per second.
+    """
+    validate_chunk_size(chunksize)
+    os.makedirs(output_dir, exist_ok=True)
+    results_path = os.path.join(output_dir, "results.jsonl")
+    products_path = os.path.join(output_dir, "products.fasta")
+    if resume:
+        statuses = _read_checkpoint(results_path, products_path)
+    else:
+        statuses = {}
+        for path in (results_path, products_path):
+            if os.path.exists(path):
+                os.remove(path)
+    finished = {"done"} if retry_failed else {"done", "failed"}
+    stats = {"done": 0, "failed": 0, "skipped": 0, "seconds": 0.0, "items_per_second": 0.0}
+    seen_ids = set()
+
+    def pending_items():
+        for item in items:
+            item_id = str(item.get("id", ""))
+            if item_id in seen_ids:
+                raise ValueError(f"Item id {item_id} is in the manifest more than once.")
+            seen_ids.add(item_id)
+            if statuses.get(item_id) in finished:
+                stats["skipped"] += 1
+            else:
+                yield item
+
+    def update_stats(start):
+        stats["seconds"] = round(time.perf_counter() - start, 3)
+        run = stats["done"] + stats["failed"]
+        stats["items_per_second"] = round(run / stats["seconds"], 3) if stats["seconds"] else 0.0
+
+    start = last_report = time.perf_counter()
+    with open(results_path, "a") as results_handle, open(products_path, "a") as products_handle:
+        if processes == 1:
+            built = {}
+            outcomes = (run_item(item, steps, sequences, built) for item in pending_items())
+            pool = None
+        else:
+            from multiprocessing import Pool
+
+            pool = Pool(processes, initializer=_set_worker_manifest, initargs=(steps, sequences))
+            outcomes = imap_windows(pool, _run_worker_item, pending_items(), processes, chunksize)
+        try:
+            for result, records in outcomes:
+                # Products are written before the result that records where they end, so a
+                # result line is only ever there with all of its products
+                products_handle.write(records)
+                products_handle.flush()
+                result["products_offset"] = products_handle.tell()
+                results_handle.write(json.dumps(result) + "\n")
+                results_handle.flush()
+                stats[result["status"]] += 1
+                if progress is not None and time.perf_counter() - last_report >= progress_interval:
+                    last_report = time.perf_counter()
+                    update_stats(start)
+                    os.fsync(results_handle.fileno())
+                    progress(dict(stats))
+        finally:
+            if pool is not None:
+                pool.terminate()
+    update_stats(start)
+    return stats
+
+
+def _report(stats: dict) -> None:
+    print(f"{stats['done']} done, {stats['failed']} failed, {stats['skipped']} skipped in "
+          f"{stats['seconds']:.1f} s, {stats['items_per_second']:.1f} items/s", file=sys.stderr)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("manifest", help="JSON, YAML or CSV manifest")
+    parser.add_argument("--output-dir", required=True)
+    parser.add_argument("--processes", type=int, default=None, help="Worker processes, one per CPU by default")
+    parser.add_argument("--chunksize", type=int, default=16)
+    parser.add_argument("--restart", action="store_true", help="Discard the results of an earlier run")
+    parser.add_argument("--retry-failed", action="store_true", help="Run failed items of an earlier run again")
+    parser.add_argument("--progress-interval", type=float, default=10.0, help="Seconds between progress reports")
+    args = parser.parse_args(argv)
+    sequences, steps, items = read_manifest(args.manifest)
+    stats = run_batch(sequences, steps, items, args.output_dir, processes=args.processes,
+                      chunksize=args.chunksize, resume=not args.restart, retry_failed=args.retry_failed,
+                      progress=_report, progress_interval=args.progress_interval)
+    _report(stats)
+    return 1 if stats["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
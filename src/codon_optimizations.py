@@ -0,0 +1,262 @@
+import math
+import re
+from itertools import product
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from src.nucleic_acids import reverse_complement_sequence, reverse_sequence
+from src.restriction_enzyme_cutsites import restriction_enzyme_types
+from src.single_stranded_nucleic_acids import SingleStrandNucleicAcidSequence
+from src.translations import _codon_order_bases, codon_tables
+from src.util_classes import IUPACCodes, NucleicAcidTypes, StrandDirections
+
+
+# Codons per thousand in Escherichia coli K-12 genes, rounded
+e_coli_codon_usage = dict(zip(("".join(codon) for codon in product(_codon_order_bases, repeat=3)), [
+    19.7, 15.0, 15.2, 11.9, 5.7, 5.5, 7.8, 8.0, 16.8, 14.6, 1.8, 0.2, 5.9, 8.0, 1.0, 10.7,
+    11.9, 10.5, 5.3, 46.9, 8.4, 6.4, 6.6, 26.7, 15.8, 13.1, 12.1, 27.7, 21.1, 26.0, 4.3, 4.1,
+    30.5, 18.2, 3.7, 24.8, 8.0, 22.8, 6.4, 11.5, 21.9, 24.4, 33.2, 12.1, 7.2, 16.6, 1.4, 1.6,
+    16.8, 11.7, 11.5, 26.4, 10.7, 31.6, 21.1, 38.5, 37.9, 20.5, 43.7, 18.4, 21.3, 33.4, 5.0, 8.6,
+]))
+# Weight of codons a usage table never saw, so they are possible but never preferred
+_min_weight = 1e-3
+
+
+def _motif_pattern(motif: str) -> str:
+    return "".join(f"[{''.join(IUPACCodes[code].value)}]" if len(IUPACCodes[code].value) > 1 else code
+                   for code in motif)
+
+
+class CodonOptimizer:
+    """
+    Recodes coding sequences with synonymous codons to follow a codon usage table while creating
+    as few forbidden motifs as possible, none unless fixed codons force one, on either strand,
+    anywhere in the coding sequence or across its ends. One optimizer is meant to be reused for
+    a whole batch of genes, as it caches every codon step it has checked.
+
+    The search is dynamic programming over codons. A state is the longest end of a recoding that
+    begins a forbidden motif, which is all later codons depend on, and keeps its best score, so
+    recodings that can no longer complete a motif all share one state. Only motifs ending in the
+    new codon are checked when a codon is added. beam_width caps the states kept per codon,
+    without it the result is optimal.
+
+    Parameters:
+    - codon_usage (dict): Frequency of every codon, e.g. per thousand codons. Codons are scored
+        by the log of their frequency relative to the most frequent synonymous codon.
+    - forbidden_motifs (list of str): Motifs that may not occur, which may contain IUPAC codes.
+        Their reverse complements are forbidden too.
+    - restriction_enzymes (list of str): Enzymes of restriction_enzyme_types whose recognition
+        sequences are forbidden, all of them if both these and forbidden_motifs are None.
+    - table_id (int): The NCBI genetic code, see translations.codon_tables.
+    - beam_width (int): The most states kept per codon.
+    - change_penalty (float): Score lost per changed codon, higher values keep more of the
+        original sequence.
+    """
+
+    def __init__(
+        self,
+        codon_usage: Optional[Dict[str, float]] = None,
+        forbidden_motifs: Optional[List[str]] = None,
+        restriction_enzymes: Optional[List[str]] = None,
+        table_id: int = 1,
+        beam_width: int = 64,
+        change_penalty: float = 0.0,
+    ):
+        if table_id not in codon_tables:
+            raise ValueError(f"Invalid codon table: {table_id}. Options are {list(codon_tables.keys())}")
+        if not isinstance(beam_width, int) or beam_width < 1:
+            raise ValueError("Beam width must be a positive integer.")
+        codon_usage = e_coli_codon_usage if codon_usage is None else {
+            codon.upper().replace("U", "T"): frequency for codon, frequency in codon_usage.items()}
+        motifs = [motif.upper().replace("U", "T") for motif in forbidden_motifs or []]
+        if restriction_enzymes is None and forbidden_motifs is None:
+            restriction_enzymes = list(restriction_enzyme_types)
+        for restriction_enzyme in restriction_enzymes or []:
+            if restriction_enzyme not in restriction_enzyme_types:
+                raise ValueError(f"Invalid restriction enzyme: {restriction_enzyme}. "
+                                 f"Options are {list(restriction_enzyme_types.keys())}")
+            motifs.append(restriction_enzyme_types[restriction_enzyme]["recognition_sequence"])
+        for motif in motifs:
+            if not motif or any(code not in IUPACCodes.__members__ for code in motif):
+                raise ValueError(f"Invalid forbidden motif: {motif}")
+        motifs = sorted(set(motifs) | {reverse_complement_sequence(motif) for motif in motifs})
+        self.forbidden_motifs = motifs
+        self.beam_width = beam_width
+        self.change_penalty = change_penalty
+        self._context_length = max((len(motif) for motif in motifs), default=1) - 1
+        # Lookahead so overlapping matches are all seen, the group end tells where each ends. Shorter
+        # motifs go first, so each start is counted once, where its first motif ends.
+        self._pattern = re.compile("(?=(" + "|".join(
+            _motif_pattern(motif) for motif in sorted(motifs, key=len)) + "))") if motifs else None
+        # Patterns of the motif beginnings of every length, up to the longest motif less one
+        self._prefix_patterns = [None] + [
+            re.compile("|".join(_motif_pattern(motif[:length]) for motif in motifs if len(motif) > length))
+            for length in range(1, self._context_length + 1)
+        ]
+        self._steps = {}
+        table = codon_tables[table_id]
+        self._synonymous_codons = {}
+        self._codon_scores = {}
+        for codon, amino_acid in zip(("".join(codon) for codon in product(_codon_order_bases, repeat=3)),
+                                     table["amino_acids"]):
+            self._synonymous_codons.setdefault(amino_acid, []).append(codon)
+        for amino_acid, codons in self._synonymous_codons.items():
+            best = max(codon_usage.get(codon, 0) for codon in codons) or 1
+            for codon in codons:
+                self._codon_scores[codon] = math.log(max(codon_usage.get(codon, 0) / best, _min_weight))
+        self._amino_acids = {codon: amino_acid for amino_acid, codons in self._synonymous_codons.items()
+                             for codon in codons}
+
+    def _count_sites(self, window: str, new_start: int, start_before: Optional[int] = None) -> int:
+        # Number of starts of forbidden motifs in window ending after new_start
+        if not self._pattern:
+            return 0
+        return sum(match.end(1) > new_start for match in self._pattern.finditer(window)
+                   if start_before is None or match.start() < start_before)
+
+    def _state(self, sequence: str) -> str:
+        # The longest end of sequence that begins a forbidden motif, any motif later completed
+        # across it starts within it
+        for length in range(min(len(sequence), self._context_length), 0, -1):
+            if self._prefix_patterns[length].fullmatch(sequence, len(sequence) - length):
+                return sequence[len(sequence) - length:]
+        return ""
+
+    def _step(self, state: str, codon: str) -> Tuple[str, int]:
+        # The state after adding codon and the number of forbidden motifs that creates
+        key = (state, codon)
+        if key not in self._steps:
+            window = state + codon
+            self._steps[key] = (self._state(window), self._count_sites(window, len(state)))
+        return self._steps[key]
+
+    def optimize(self, coding_sequence: str, left_context: str = "", right_context: str = "",
+                 fixed_codons: Iterable[int] = (0,)) -> str:
+        """
+        Recodes a coding sequence, read 5'->3', see CodonOptimizer.
+
+        Parameters:
+        - coding_sequence (str): The coding sequence, its length a multiple of 3.
+        - left_context, right_context (str): The bases next to the coding sequence, motifs
+            across its ends are avoided too. Motifs only in the context are left alone.
+        - fixed_codons (iterable of int): Indexes of codons kept as they are, by default the
+            start codon. Codons with ambiguous bases are always kept.
+
+        Returns:
+        - str: The recoded sequence, encoding the same protein, with as few forbidden motifs as
+            the fixed codons and context allow.
+        """
+        coding_sequence = coding_sequence.upper().replace("U", "T")
+        if len(coding_sequence) % 3:
+            raise ValueError("Cannot optimize a coding sequence whose length is not a multiple of 3.")
+        fixed_codons = set(fixed_codons)
+        # Each state maps to its best (-forbidden motifs, codon score) and recoding, as nested
+        # (codon, previous) pairs. Fewer motifs always win, so motifs that cannot be avoided, e.g.
+        # across fixed codons, are left and the rest of the sequence is still recoded.
+        states = {self._state(left_context.upper().replace("U", "T")): ((0, 0.0), None)}
+        for index in range(0, len(coding_sequence), 3):
+            codon = coding_sequence[index:index + 3]
+            options = [codon]
+            if index // 3 not in fixed_codons and codon in self._amino_acids:
+                options = self._synonymous_codons[self._amino_acids[codon]]
+            next_states = {}
+            for state, ((sites, score), recoding) in states.items():
+                for option in options:
+                    next_state, new_sites = self._step(state, option)
+                    option_score = (sites - new_sites, score + self._codon_scores.get(option, 0.0)
+                                    - (self.change_penalty if option != codon else 0.0))
+                    if next_state not in next_states or next_states[next_state][0] < option_score:
+                        next_states[next_state] = (option_score, (option, recoding))
+            if len(next_states) > self.beam_width:
+                next_states = dict(sorted(next_states.items(), key=lambda item: item[1][0], reverse=True)[:self.beam_width])
+            states = next_states
+        right_context = right_context.upper().replace("U", "T")[:self._context_length]
+        if right_context:
+            # Motifs from the recoding into the right context, those only in the context are left
+            states = {state: ((sites - self._count_sites(state + right_context, len(state), len(state)), score),
+                              recoding)
+                      for state, ((sites, score), recoding) in states.items()}
+        _, recoding = max(states.values(), key=lambda value: value[0])
+        codons = []
+        while recoding is not None:
+            codon, recoding = recoding
+            codons.append(codon)
+        return "".join(reversed(codons))
+
+    def domesticate(
+        self,
+        strand: SingleStrandNucleicAcidSequence,
+        cds_names: Optional[List[str]] = None,
+        in_place: bool = False,
+    ) -> Tuple[SingleStrandNucleicAcidSequence, List[dict]]:
+        """
+        Recodes the coding annotations of a DNA strand, each read 5'->3' along the strand from its
+        first codon, with optimize. The recoded bases are substituted, so annotations and base
+        modifications are kept and cut sites are updated as for any substitution.
+
+        Parameters:
+        - strand (SingleStrandNucleicAcidSequence): The strand.
+        - cds_names (list of str): The annotations to recode, those whose note starts with "CDS"
+            if None.
+        - in_place (bool): If False, a copy of the strand is edited.
+
+        Returns:
+        - tuple: The edited strand and one dict per CDS with its name, the number of codons
+            changed and the (start, motif) of every forbidden motif left on the strand, e.g. in
+            fixed codons or outside of every CDS. Starts are indexes of the strand as stored.
+        """
+        if strand.nucleic_acid_type != NucleicAcidTypes.DNA.value:
+            raise ValueError("Only DNA strands can be domesticated.")
+        if cds_names is None:
+            cds_names = [name for name, annotation in strand.annotations.items()
+                         if annotation.note.upper().startswith("CDS")]
+        edited = strand if in_place else strand.copy()
+        annotations = edited.annotations
+        is_reverse = edited.strand_direction == StrandDirections.REV_STRAND.value
+        n = len(edited)
+        reports = []
+        for name in cds_names:
+            if name not in annotations:
+                raise KeyError(f"Annotation with name {name} does not exist.")
+            annotation = annotations[name]
+            if annotation.start > annotation.end:
+                raise ValueError(f"Cannot domesticate {name}, it spans the origin.")
+            # Start and end as read 5'->3'
+            start, end = annotation.start, annotation.end
+            if is_reverse:
+                start, end = n - 1 - end, n - 1 - start
+            read_sequence = edited._read_sequence()
+            coding_sequence = read_sequence[start:end + 1]
+            context_start = max(start - self._context_length, 0)
+            recoded = self.optimize(coding_sequence, read_sequence[context_start:start],
+                                    read_sequence[end + 1:end + 1 + self._context_length])
+            changed = [offset for offset in range(0, len(recoded), 3)
+                       if recoded[offset:offset + 3] != coding_sequence[offset:offset + 3]]
+            if changed:
+                # One substitution from the first to the last changed codon, so cut sites are
+                # rescanned once per CDS
+                first, last = changed[0], changed[-1] + 3
+                position, bases = start + first, recoded[first:last]
+                if is_reverse:
+                    position, bases = n - start - last, reverse_sequence(bases)
+                edited.substitute(position, bases)
+            reports.append({"name": name, "codons_changed": len(changed)})
+        remaining = self._forbidden_sites(edited._read_sequence())
+        if is_reverse:
+            remaining = sorted((n - site_start - len(motif), reverse_sequence(motif)) for site_start, motif in remaining)
+        for report in reports:
+            report["forbidden_sites"] = remaining
+        return edited, reports
+
+    def domesticate_all(
+        self,
+        strands: Iterable[SingleStrandNucleicAcidSequence],
+        cds_names: Optional[List[str]] = None,
+    ) -> Iterator[Tuple[SingleStrandNucleicAcidSequence, List[dict]]]:
+        # Lazily domesticates copies of many strands, sharing the codon steps this optimizer cached
+        for strand in strands:
+            yield self.domesticate(strand, cds_names)
+
+    def _forbidden_sites(self, sequence: str) -> List[Tuple[int, str]]:
+        if not self._pattern:
+            return []
+        return [(match.start(), match.group(1)) for match in self._pattern.finditer(sequence.upper())]
@@ -0,0 +1,172 @@
+import math
+import re
+from itertools import islice
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from src.double_stranded_nucleic_acids import DoubleStrandNucleicAcidSequence
+from src.nucleic_acids import complement_sequence
+from src.restriction_enzyme_cutsites import (
+    max_recognition_sequence_length,
+    restriction_enzyme_types,
+    RestrictionEnzymeCutSite,
+)
+from src.sequence_annotations import SequenceAnnotation
+from src.sequence_batches import _joined_sequences, _separator, _validate_joined_sequences
+from src.sequence_registry import _bulk_ids
+from src.single_stranded_nucleic_acids import SingleStrandNucleicAcidSequence
+from src.util_classes import NucleicAcidTypes, StrandDirections
+
+
+# Bases either side of a junction that a recognition sequence spanning it can cover
+_junction_length = max_recognition_sequence_length - 1
+_strand_directions = (StrandDirections.FWD_STRAND.value, StrandDirections.REV_STRAND.value)
+# Ids are drawn for this many strands at a time
+_id_batch_size = 1024
+
+
+class _Prefix(NamedTuple):
+    # A partial assembly: part names, the sequence of both strands, the candidate cut sites of
+    # both strands as (enzyme order, start, enzyme), and the part annotations
+    names: Tuple[str, ...]
+    sequences: Tuple[str, str]
+    cut_sites: Tuple[tuple, tuple]
+    annotations: tuple
+
+
+def _recognition_patterns(strand_direction: str) -> List[Tuple[int, str, int, "re.Pattern"]]:
+    return [
+        (order, restriction_enzyme, len(data["recognition_sequence"]), re.compile(
+            f"(?={SingleStrandNucleicAcidSequence._recognition_sequence(data, strand_direction)})"))
+        for order, (restriction_enzyme, data) in enumerate(restriction_enzyme_types.items())
+    ]
+
+
+def _find_cut_sites(sequence: str, patterns: list, shift: int = 0, spanning: Optional[int] = None) -> tuple:
+    # Every site as (enzyme order, start + shift, enzyme), only those covering both sides of
+    # index spanning if given
+    sites = []
+    for order, restriction_enzyme, length, pattern in patterns:
+        for match in pattern.finditer(sequence):
+            if spanning is None or match.start() < spanning < match.start() + length:
+                sites.append((order, match.start() + shift, restriction_enzyme))
+    return tuple(sites)
+
+
+def _junction_cut_sites(left: str, right: str, patterns: list, shift: int) -> tuple:
+    # Sites starting in left and ending in right, left starting at shift
+    left_tail = left[-_junction_length:]
+    return _find_cut_sites(left_tail + right[:_junction_length], patterns,
+                           shift + len(left) - len(left_tail), len(left_tail))
+
+
+def library_size(slots: Sequence[Dict[str, str]]) -> int:
+    return math.prod(len(parts) for parts in slots)
+
+
+def enumerate_library(
+    slots: Sequence[Dict[str, str]],
+    circular: bool = False,
+    annotate: bool = True,
+    scan_cut_sites: bool = True,
+) -> Iterator[DoubleStrandNucleicAcidSequence]:
+    """
+    Lazily builds every variant of a combinatorial DNA library, one part per slot joined in slot
+    order, e.g. promoters x RBSs x CDSs. Variants come in the order of itertools.product over
+    the slots. Parts are validated and scanned for cut sites once. Partial assemblies are built
+    depth first and shared by every variant with the same prefix, only the bases around each new
+    junction are scanned again. Memory does not grow with the number of variants.
+
+    Parameters:
+    - slots (list of dict): The parts of each slot, as {name: DNA sequence}.
+    - circular (bool): If True, the variants are circular and the last part joins the first.
+    - annotate (bool): If True, each part is annotated by name on both strands, parts of one
+        base excepted. A name used in more than one slot gets the slot number appended.
+    - scan_cut_sites (bool): If False, the variants have no cut sites.
+
+    Returns:
+    - generator (DoubleStrandNucleicAcidSequence): One fully double stranded variant per
+        combination, its note listing the part names.
+    """
+    if not slots or any(not parts for parts in slots):
+        raise ValueError("Every slot must have at least one part.")
+    SingleStrandNucleicAcidSequence.validate_circular(circular)
+    part_names = [list(parts) for parts in slots]
+    joined, starts, _ = _joined_sequences(sequence for parts in slots for sequence in parts.values())
+    _validate_joined_sequences(joined, starts, NucleicAcidTypes.DNA.value)
+    sequences = iter(joined.split(_separator))
+    patterns = [_recognition_patterns(strand_direction) for strand_direction in _strand_directions]
+    slot_parts = []
+    for slot, names in enumerate(part_names):
+        parts = []
+        for name in names:
+            sequence = next(sequences)
+            strand_sequences = (sequence, complement_sequence(sequence))
+            cut_sites = tuple(_find_cut_sites(strand_sequence, strand_patterns) if scan_cut_sites else ()
+                              for strand_sequence, strand_patterns in zip(strand_sequences, patterns))
+            repeated = sum(name in names for names in part_names) > 1
+            parts.append((f"{name}_{slot + 1}" if repeated else name, name, strand_sequences, cut_sites))
+        slot_parts.append(parts)
+    root = _Prefix((), ("", ""), ((), ()), ())
+    ids = iter(())
+    for prefix in _extend(root, slot_parts, patterns, annotate, scan_cut_sites):
+        strand_ids = list(islice(ids, 2))
+        if len(strand_ids) < 2:
+            ids = iter(_bulk_ids(_id_batch_size))
+            strand_ids = list(islice(ids, 2))
+        yield _build_variant(prefix, strand_ids, circular, patterns, scan_cut_sites)
+
+
+def _extend(prefix: _Prefix, slot_parts: list, patterns: list, annotate: bool, scan_cut_sites: bool):
+    slot = len(prefix.names)
+    if slot == len(slot_parts):
+        yield prefix
+        return
+    shift = len(prefix.sequences[0])
+    for annotation_name, name, strand_sequences, part_cut_sites in slot_parts[slot]:
+        cut_sites = prefix.cut_sites
+        if scan_cut_sites:
+            cut_sites = tuple(
+                prefix_sites + _junction_cut_sites(prefix_sequence, part_sequence, strand_patterns, 0) +
+                tuple((order, start + shift, enzyme) for order, start, enzyme in part_sites)
+                for prefix_sequence, part_sequence, strand_patterns, prefix_sites, part_sites
+                in zip(prefix.sequences, strand_sequences, patterns, prefix.cut_sites, part_cut_sites))
+        annotations = prefix.annotations
+        if annotate and len(strand_sequences[0]) > 1:
+            annotations += ((annotation_name, shift, shift + len(strand_sequences[0]) - 1),)
+        yield from _extend(_Prefix(
+            prefix.names + (name,),
+            tuple(prefix_sequence + part_sequence
+                  for prefix_sequence, part_sequence in zip(prefix.sequences, strand_sequences)),
+            cut_sites,
+            annotations,
+        ), slot_parts, patterns, annotate, scan_cut_sites)
+
+
+def _build_variant(prefix: _Prefix, strand_ids: List[str], circular: bool, patterns: list,
+                   scan_cut_sites: bool) -> DoubleStrandNucleicAcidSequence:
+    strands = []
+    for strand_id, sequence, strand_direction, strand_patterns, cut_sites in zip(
+            strand_ids, prefix.sequences, _strand_directions, patterns, prefix.cut_sites):
+        strand = SingleStrandNucleicAcidSequence._restore(
+            strand_id, sequence, NucleicAcidTypes.DNA.value, circular, strand_direction, "")
+        if scan_cut_sites and circular and len(sequence) <= _junction_length:
+            # Too short for the junction window to hold both ends apart
+            strand._add_all_cut_sites()
+        elif scan_cut_sites:
+            if circular:
+                cut_sites += _junction_cut_sites(sequence, sequence, strand_patterns, 0)
+            # As in _add_all_cut_sites, the first enzyme listed wins a start
+            for _, start, restriction_enzyme in sorted(cut_sites):
+                if start not in strand._cut_sites:
+                    strand._cut_sites[start] = RestrictionEnzymeCutSite(strand, start, restriction_enzyme)
+        for name, start, end in prefix.annotations:
+            strand._annotations[name] = SequenceAnnotation(strand, name, start, end)
+        strands.append(strand)
+    return DoubleStrandNucleicAcidSequence(
+        forward_sequence=strands[0],
+        reverse_sequence=strands[1],
+        reverse_sequence_start=0,
+        nucleic_acid_type=NucleicAcidTypes.DNA.value,
+        circular=circular,
+        note=" + ".join(prefix.names),
+    )
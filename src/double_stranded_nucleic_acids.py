@@ -1,9 +1,10 @@
+import copy
 import uuid
-from dna_features_viewer import CircularGraphicRecord, GraphicFeature, GraphicRecord
 
 from src.nucleic_acids import NucleicAcidSequence, complement_sequence
+from src.sequence_registry import content_hash, track_nucleic_acid
 from src.single_stranded_nucleic_acids import SingleStrandNucleicAcidSequence
-from src.util_classes import NucleicAcidTypes, StrandDirections, Colors
+from src.util_classes import NucleicAcidTypes, StrandDirections
 
 
 class DoubleStrandNucleicAcidSequence(NucleicAcidSequence):
@@ -22,6 +23,7 @@ class DoubleStrandNucleicAcidSequence(NucleicAcidSequence):
 
         super().__init__(nucleic_acid_type, circular)
         self._id = str(uuid.uuid4())
+        self._frozen = False
         self.note = note
         (self._forward_sequence,
          self._reverse_sequence,
@@ -30,6 +32,8 @@ class DoubleStrandNucleicAcidSequence(NucleicAcidSequence):
                                                                           reverse_sequence_start,
                                                                           nucleic_acid_type,
                                                                           circular)
+        self._content_hash = (None, None)
+        track_nucleic_acid(self)
 
     def __repr__(self):
         return (f"DoubleStrandNucleicAcidSequence(id='{self.id}', "
@@ -56,6 +60,20 @@ class DoubleStrandNucleicAcidSequence(NucleicAcidSequence):
     def reverse_sequence_start(self):
         return self._reverse_sequence_start
 
+    @property
+    def content_hash(self):
+        # Cached until either strand, the reverse sequence start or topology change
+        state = (self._forward_sequence._buffer, self._forward_sequence._buffer.version,
+                 self._reverse_sequence._buffer, self._reverse_sequence._buffer.version,
+                 self.reverse_sequence_start, self.circular)
+        if self._content_hash[0] == state:
+            return self._content_hash[1]
+        if self._frozen:
+            # Snapshots are never written to, they keep the hash the double strand had cached, if any
+            return content_hash(self)
+        self._content_hash = (state, content_hash(self))
+        return self._content_hash[1]
+
     @property
     def nucleic_acid_type(self):
         return self._nucleic_acid_type
@@ -70,6 +88,8 @@ class DoubleStrandNucleicAcidSequence(NucleicAcidSequence):
 
     @note.setter
     def note(self, value):
+        if self._frozen:
+            raise Exception("Snapshots are read-only, make a copy to edit.")
         self.validate_note(value)
         self._note = value
 
@@ -121,8 +141,8 @@ class DoubleStrandNucleicAcidSequence(NucleicAcidSequence):
     def _validate_and_set_sequences(self, fwd_seq, rev_seq, rev_seq_start, nuc_acid_type, circ):
         fwd_seq_obj = self._create_or_validate_strand(fwd_seq, StrandDirections.FWD_STRAND.value, nuc_acid_type, circ)
         rev_seq_obj, rev_seq_start_value = self._handle_reverse_sequence(rev_seq, rev_seq_start, nuc_acid_type, circ, fwd_seq_obj)
-        fwd_seq_obj._set_is_part_of_dsDNA_true
-        rev_seq_obj._set_is_part_of_dsDNA_true
+        fwd_seq_obj._set_is_part_of_dsDNA_true()
+        rev_seq_obj._set_is_part_of_dsDNA_true()
         return fwd_seq_obj, rev_seq_obj, rev_seq_start_value
 
     def _handle_reverse_sequence(self, rev_seq, rev_seq_start, nuc_acid_type, circ, fwd_seq_obj):
@@ -182,16 +202,28 @@ class DoubleStrandNucleicAcidSequence(NucleicAcidSequence):
             raise TypeError("Cannot make sequence, note must be a string.")
     
     def copy(self):
+        # Both strands are copied in O(1), see SingleStrandNucleicAcidSequence.copy
         new_ds_seq = DoubleStrandNucleicAcidSequence(
-            forward_sequence=self.forward_sequence,
-            reverse_sequence=self.reverse_sequence,
-            rev_sequence_start=self.reverse_sequence_start,
+            forward_sequence=self.forward_sequence.copy(),
+            reverse_sequence=self.reverse_sequence.copy(),
+            reverse_sequence_start=self.reverse_sequence_start,
             nucleic_acid_type=self.nucleic_acid_type,
             circular=self.circular,
             note=self.note,
         )
         return new_ds_seq
 
+    def snapshot(self):
+        """
+        Makes a read-only view of the double strand as it is now, with the same id, from snapshots
+        of both strands. See SingleStrandNucleicAcidSequence.snapshot.
+        """
+        snapshot = copy.copy(self)
+        snapshot._forward_sequence = self._forward_sequence.snapshot()
+        snapshot._reverse_sequence = self._reverse_sequence.snapshot()
+        snapshot._frozen = True
+        return snapshot
+
     def reverse(self):
         with self._forward_sequence._unlocked(), self._reverse_sequence._unlocked():
             self._forward_sequence.reverse()
@@ -211,6 +243,100 @@ class DoubleStrandNucleicAcidSequence(NucleicAcidSequence):
             self._reverse_sequence_start = -1 * (self.reverse_sequence_start - (
                 len(self.forward_sequence.sequence) - len(self.reverse_sequence.sequence)))
 
+    def add_methylation(self, methylation_type_list, processes=1):
+        # Motif rules apply to both strands, palindromic motifs such as GATC are marked on both
+        self._forward_sequence.add_methylation(methylation_type_list, processes)
+        self._reverse_sequence.add_methylation(methylation_type_list, processes)
+
+    def scan_cut_sites(self, processes=None, chunk_size=1000000):
+        # Both strands in turn, each across the whole pool
+        self._forward_sequence.scan_cut_sites(processes, chunk_size)
+        self._reverse_sequence.scan_cut_sites(processes, chunk_size)
+
+    def translate(self, frame=1, table_id=1, to_stop=False):
+        # Frames 1 to 3 read the forward strand, -1 to -3 the reverse strand, each 5'->3'
+        if frame not in (1, 2, 3, -1, -2, -3):
+            raise ValueError(f"Invalid frame: {frame}. Options are [1, 2, 3, -1, -2, -3]")
+        strand = self._forward_sequence if frame > 0 else self._reverse_sequence
+        return strand.translate(abs(frame), table_id, to_stop)
+
+    def find_orfs(self, min_protein_length=30, table_id=1, add_annotations=False, name_prefix="ORF"):
+        """
+        Finds the open reading frames of both strands, each read 5'->3' on its own sequence so
+        overhangs and mismatches are respected. Forward ORFs have strand 1 and coordinates of the
+        forward strand, reverse ORFs strand -1 and coordinates of the reverse strand as stored.
+        With add_annotations, each ORF is annotated on its own strand.
+        """
+        forward_orfs = self._forward_sequence.find_orfs(min_protein_length, table_id, False, False, f"{name_prefix}_fwd")
+        reverse_orfs = self._reverse_sequence.find_orfs(min_protein_length, table_id, False, False, f"{name_prefix}_rev")
+        for orf in reverse_orfs:
+            orf["strand"] = -1
+            orf["note"] = self._reverse_sequence._orf_note(orf)
+        if add_annotations:
+            self._forward_sequence._add_found_annotations(forward_orfs)
+            self._reverse_sequence._add_found_annotations(reverse_orfs)
+        return forward_orfs + reverse_orfs
+
+    def rotate(self, offset):
+        """
+        Moves the origin of a circular double strand so the base pair at offset becomes the
+        first. Both strands only move their origin, features are remapped when next accessed.
+        """
+        with self._forward_sequence._unlocked(), self._reverse_sequence._unlocked():
+            self._forward_sequence.rotate(offset)
+            self._reverse_sequence.rotate(offset)
+
+    def linearize(self, position=0):
+        # Opens a circular double strand before position with blunt ends
+        with self._forward_sequence._unlocked(), self._reverse_sequence._unlocked():
+            self._forward_sequence.linearize(position)
+            self._reverse_sequence.linearize(position)
+            self._circular = False
+
+    def insert(self, position, sequence):
+        """
+        Inserts bases, and their complement on the reverse strand, before position in forward
+        strand coordinates. The position must be within the double stranded region.
+        """
+        rev_position = self._validate_edit_range(position, 0)
+        with self._forward_sequence._unlocked(), self._reverse_sequence._unlocked():
+            self._forward_sequence.insert(position, sequence)
+            self._reverse_sequence.insert(
+                rev_position, complement_sequence(sequence.upper(), nuc_type=self.nucleic_acid_type))
+
+    def delete(self, position, length=1):
+        """
+        Deletes length base pairs starting at position in forward strand coordinates. The deleted
+        bases must be within the double stranded region.
+        """
+        rev_position = self._validate_edit_range(position, length)
+        with self._forward_sequence._unlocked(), self._reverse_sequence._unlocked():
+            self._forward_sequence.delete(position, length)
+            self._reverse_sequence.delete(rev_position, length)
+
+    def substitute(self, position, sequence):
+        """
+        Replaces the base pairs starting at position in forward strand coordinates with sequence
+        and its complement. The replaced bases must be within the double stranded region.
+        """
+        rev_position = self._validate_edit_range(position, len(sequence))
+        with self._forward_sequence._unlocked(), self._reverse_sequence._unlocked():
+            self._forward_sequence.substitute(position, sequence)
+            self._reverse_sequence.substitute(
+                rev_position, complement_sequence(sequence.upper(), nuc_type=self.nucleic_acid_type))
+
+    def _validate_edit_range(self, position, length):
+        # Returns the reverse strand index matching position
+        ds_start = max(0, self.reverse_sequence_start)
+        ds_end = min(len(self.forward_sequence), self.reverse_sequence_start + len(self.reverse_sequence))
+        if not isinstance(position, int):
+            raise TypeError("Position must be an integer.")
+        if position < ds_start or position + length > ds_end:
+            raise ValueError(
+                f"Cannot edit positions {position} to {position + length}, edits must be within the "
+                f"double stranded region {ds_start} to {ds_end}.")
+        return position - self.reverse_sequence_start
+
     def set_circular(self):
         with self._forward_sequence._unlocked(), self._reverse_sequence._unlocked():
             if self.circular is True:
@@ -234,35 +360,11 @@ class DoubleStrandNucleicAcidSequence(NucleicAcidSequence):
                 self._reverse_sequence.remove_circular()
                 self._circular = False
 
-    def view(self):
-        features = []
-        for annotation in self.forward_sequence.annotations.values():
-            label=annotation.name
-            if annotation.note:
-                label=f"{annotation.name}, {annotation.note}"
-            features.append(GraphicFeature(
-                label=label,
-                start=annotation.start,
-                end=annotation.end,
-                strand=+1,
-                color=Colors.random_color(),
-            ))
-        for annotation in self.reverse_sequence.annotations.values():
-            label=annotation.name
-            if annotation.note:
-                label=f"{annotation.name}, {annotation.note}"
-            features.append(GraphicFeature(
-                label=label,
-                start=annotation.start,
-                end=annotation.end,
-                strand=-1,
-                color=Colors.random_color(),
-            ))
-        seq_length = len(self.forward_sequence.sequence)
-        if seq_length < len(self.reverse_sequence.sequence):
-            seq_length = len(self.reverse_sequence.sequence)
-        if self.circular:
-            record = CircularGraphicRecord(sequence_length=seq_length, features=features)
-        else:
-            record = GraphicRecord(sequence_length=seq_length, features=features)
-        record.plot(figure_width=5)
\ No newline at end of file
+    def view(self, region=None, resolution=1000, max_features=150):
+        """
+        Plots the annotations of both strands, see SingleStrandNucleicAcidSequence.view.
+        """
+        # Imported here as drawing pulls in matplotlib, which only plotting needs
+        from src.sequence_maps import plot_map, sequence_map
+
+        plot_map(sequence_map(self, region, resolution, max_features), figure_width=5)
\ No newline at end of file
@@ -0,0 +1,132 @@
+from typing import Dict, Iterable, List
+
+import numpy as np
+import pandas as pd
+
+from src.double_stranded_nucleic_acids import DoubleStrandNucleicAcidSequence
+from src.restriction_enzyme_cutsites import RestrictionEnzymeCutSite
+from src.single_stranded_nucleic_acids import SingleStrandNucleicAcidSequence
+
+
+annotation_columns = ["strand_id", "name", "start", "end", "note"]
+base_modification_columns = ["strand_id", "position", "base", "modification_type"]
+cut_site_columns = ["strand_id", "start", "end", "cut_position", "recognition_sequence", "restriction_enzyme"]
+# Columns holding positions, stored as int64 even when a table has no rows
+_integer_columns = {"start", "end", "position", "cut_position"}
+
+
+def _strands(nucleic_acids: Iterable) -> List[SingleStrandNucleicAcidSequence]:
+    strands = []
+    for nucleic_acid in nucleic_acids:
+        if isinstance(nucleic_acid, DoubleStrandNucleicAcidSequence):
+            strands += [nucleic_acid.forward_sequence, nucleic_acid.reverse_sequence]
+        elif isinstance(nucleic_acid, SingleStrandNucleicAcidSequence):
+            strands.append(nucleic_acid)
+        else:
+            raise ValueError("Features can only be exported from SingleStrandNucleicAcidSequence or "
+                             "DoubleStrandNucleicAcidSequence objects.")
+    return strands
+
+
+def _features_frame(strands, feature_store_name, attributes, columns) -> pd.DataFrame:
+    # One column at a time over the feature stores themselves, no per row dicts are built
+    feature_stores = [getattr(strand, feature_store_name).values() for strand in strands]
+    counts = np.fromiter((len(features) for features in feature_stores), dtype=np.int64, count=len(strands))
+    features = [feature for features in feature_stores for feature in features]
+    data = {"strand_id": pd.Categorical(np.repeat(np.array([strand.id for strand in strands], dtype=object), counts))}
+    for column, attribute in zip(columns[1:], attributes):
+        values = [getattr(feature, attribute) for feature in features]
+        if column in _integer_columns:
+            data[column] = np.array(values, dtype=np.int64)
+        else:
+            data[column] = np.array(values, dtype=object)
+    return pd.DataFrame(data, columns=columns)
+
+
+def annotations_to_frame(nucleic_acids: Iterable) -> pd.DataFrame:
+    """
+    Exports the annotations of every strand, both strands for double strands, into one table
+    with a row per annotation and the columns in annotation_columns.
+    """
+    return _features_frame(_strands(nucleic_acids), "_annotations",
+                           ["name", "start", "end", "note"], annotation_columns)
+
+
+def base_modifications_to_frame(nucleic_acids: Iterable) -> pd.DataFrame:
+    return _features_frame(_strands(nucleic_acids), "_base_modifications",
+                           ["position", "base", "modification_type"], base_modification_columns)
+
+
+def cut_sites_to_frame(nucleic_acids: Iterable) -> pd.DataFrame:
+    return _features_frame(_strands(nucleic_acids), "_cut_sites",
+                           ["start", "end", "cut_position", "recognition_sequence", "restriction_enzyme"],
+                           cut_site_columns)
+
+
+def features_to_frames(nucleic_acids: Iterable) -> Dict[str, pd.DataFrame]:
+    """
+    Exports every feature type of a collection of nucleic acids, one table per feature type.
+
+    Parameters:
+    - nucleic_acids (iterable): SingleStrandNucleicAcidSequence or DoubleStrandNucleicAcidSequence objects.
+
+    Returns:
+    - dict (pd.DataFrame): The annotations, base_modifications and cut_sites tables.
+    """
+    strands = _strands(nucleic_acids)
+    return {
+        "annotations": annotations_to_frame(strands),
+        "base_modifications": base_modifications_to_frame(strands),
+        "cut_sites": cut_sites_to_frame(strands),
+    }
+
+
+def features_to_arrow(nucleic_acids: Iterable) -> dict:
+    # pyarrow is optional, it is only needed for this export
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("pyarrow must be installed to export features to Arrow tables.") from None
+    return {name: pyarrow.Table.from_pandas(frame, preserve_index=False)
+            for name, frame in features_to_frames(nucleic_acids).items()}
+
+
+def _rows_by_strand(nucleic_acids, frame, columns):
+    strands_by_id = {strand.id: strand for strand in _strands(nucleic_acids)}
+    missing_columns = [column for column in columns if column not in frame.columns]
+    if missing_columns:
+        raise KeyError(f"Missing required columns: {', '.join(missing_columns)}.")
+    missing_ids = set(frame["strand_id"].unique()) - set(strands_by_id)
+    if missing_ids:
+        raise KeyError(f"Strands with ids {', '.join(sorted(missing_ids))} were not provided.")
+    for strand_id, group in frame.groupby("strand_id", sort=False, observed=True):
+        rows = zip(*(group[column].tolist() for column in columns[1:]))
+        yield strands_by_id[strand_id], rows
+
+
+def add_annotations_from_frame(nucleic_acids: Iterable, frame: pd.DataFrame) -> None:
+    """
+    Adds the annotations in a table with the annotation_columns layout to the strands whose ids
+    appear in its strand_id column. Each strand gets all its annotations in one bulk add.
+    """
+    for strand, rows in _rows_by_strand(nucleic_acids, frame, annotation_columns):
+        strand.add_annotations([{"name": name, "start": int(start), "end": int(end), "note": note}
+                                for name, start, end, note in rows])
+
+
+def add_base_modifications_from_frame(nucleic_acids: Iterable, frame: pd.DataFrame) -> None:
+    columns = ["strand_id", "position", "modification_type"]
+    for strand, rows in _rows_by_strand(nucleic_acids, frame, columns):
+        strand.add_base_modifications([{"position": int(position), "modification_type": modification_type}
+                                       for position, modification_type in rows])
+
+
+def add_cut_sites_from_frame(nucleic_acids: Iterable, frame: pd.DataFrame) -> None:
+    """
+    Restores cut sites from a table instead of scanning for them, e.g. for strands rebuilt from
+    stored data. Each site is still checked against the strand sequence.
+    """
+    columns = ["strand_id", "start", "restriction_enzyme"]
+    for strand, rows in _rows_by_strand(nucleic_acids, frame, columns):
+        for start, restriction_enzyme in rows:
+            strand._cut_sites[int(start)] = RestrictionEnzymeCutSite(strand, int(start), restriction_enzyme)
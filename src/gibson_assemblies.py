@@ -0,0 +1,254 @@
+import uuid
+from typing import Dict, List, Sequence, Tuple
+
+from src.double_stranded_nucleic_acids import DoubleStrandNucleicAcidSequence
+from src.nucleic_acids import complement_sequence, reverse_complement_sequence
+from src.single_stranded_nucleic_acids import SingleStrandNucleicAcidSequence
+from src.util_classes import NucleicAcidTypes, StrandDirections
+
+
+# Polynomial rolling hash modulo a Mersenne prime
+_hash_base = 257
+_hash_modulus = (1 << 61) - 1
+
+
+def _window_hashes(sequence: str, k: int) -> List[int]:
+    # Hash of every k base window of the sequence, updated in O(1) per base
+    if len(sequence) < k:
+        return []
+    top_power = pow(_hash_base, k - 1, _hash_modulus)
+    value = 0
+    for base in sequence[:k]:
+        value = (value * _hash_base + ord(base)) % _hash_modulus
+    hashes = [value]
+    for i in range(k, len(sequence)):
+        value = ((value - ord(sequence[i - k]) * top_power) * _hash_base + ord(sequence[i])) % _hash_modulus
+        hashes.append(value)
+    return hashes
+
+
+def find_terminal_overlaps(
+    sequences: Sequence[str],
+    min_overlap: int = 15,
+    max_overlap: int = 60,
+) -> Dict[Tuple[int, int], List[Tuple[int, int, int]]]:
+    """
+    Finds every exact overlap between the 3' end of one sequence and the 5' end of another, in
+    both orientations, in time linear in the number of sequences and max_overlap. The first
+    min_overlap bases of every oriented sequence are indexed by hash, then a rolling hash over
+    the last max_overlap bases of every oriented sequence looks up candidates, which are checked
+    base by base.
+
+    Parameters:
+    - sequences (list of str): The sequences, read 5'->3'.
+    - min_overlap (int): The shortest overlap reported.
+    - max_overlap (int): The longest overlap reported, overlaps never cover a whole sequence.
+
+    Returns:
+    - dict: For every (index, orientation) with overlaps, orientation 1 for the sequence and -1
+        for its reverse complement, the (index, orientation, overlap length) of each sequence
+        its 3' end overlaps. A sequence only overlaps itself in the same orientation, the end of
+        a sequence that circularizes.
+    """
+    if not isinstance(min_overlap, int) or min_overlap < 1:
+        raise ValueError("Minimum overlap must be a positive integer.")
+    if not isinstance(max_overlap, int) or max_overlap < min_overlap:
+        raise ValueError("Maximum overlap must be an integer no less than the minimum overlap.")
+    oriented = {}
+    for index, sequence in enumerate(sequences):
+        sequence = sequence.upper()
+        oriented[(index, 1)] = sequence
+        oriented[(index, -1)] = reverse_complement_sequence(sequence)
+    prefixes = {}
+    for node, sequence in oriented.items():
+        if len(sequence) > min_overlap:
+            prefixes.setdefault(_window_hashes(sequence[:min_overlap], min_overlap)[0], []).append(node)
+    overlaps = {}
+    for node, sequence in oriented.items():
+        n = len(sequence)
+        # Windows start where overlaps of max_overlap, down to min_overlap, bases would start
+        tail_start = max(n - max_overlap, 1)
+        for offset, value in enumerate(_window_hashes(sequence[tail_start:], min_overlap)):
+            length = n - tail_start - offset
+            for other_node in prefixes.get(value, ()):
+                if other_node[0] == node[0] and other_node != node:
+                    continue
+                other_sequence = oriented[other_node]
+                if length < len(other_sequence) and sequence.endswith(other_sequence[:length]):
+                    overlaps.setdefault(node, []).append((other_node[0], other_node[1], length))
+    return overlaps
+
+
+def _links(overlaps: Dict[Tuple[int, int], List[Tuple[int, int, int]]]) -> Dict[Tuple[int, int], tuple]:
+    # The one (next node, overlap length) of every oriented sequence, the longest overlap to it
+    links = {}
+    for node, node_overlaps in overlaps.items():
+        best = {}
+        for index, orientation, length in node_overlaps:
+            best[(index, orientation)] = max(length, best.get((index, orientation), 0))
+        if len(best) > 1:
+            raise ValueError(f"Ambiguous assembly, the end of fragment {node[0]} overlaps fragments "
+                             f"{sorted({index for index, _ in best})}.")
+        links[node] = next(iter(best.items()))
+    return links
+
+
+def _assembly_paths(links: Dict[Tuple[int, int], tuple], count: int) -> List[tuple]:
+    # Follows the links into chains and rings, an overlap A -> B is also rc(B) -> rc(A)
+    paths = []
+    used = set()
+    for index in range(count):
+        if index in used:
+            continue
+        head, circular = (index, 1), False
+        seen = {index}
+        while True:
+            previous = links.get((head[0], -head[1]))
+            if previous is None:
+                break
+            previous_node = (previous[0][0], -previous[0][1])
+            if previous_node == (index, 1):
+                # Rings start at their first fragment, in its own orientation
+                head, circular = (index, 1), True
+                break
+            if previous_node[0] in seen or previous_node[0] in used:
+                raise ValueError(f"Ambiguous assembly, fragment {previous_node[0]} is joined in both orientations.")
+            seen.add(previous_node[0])
+            head = previous_node
+        nodes, lengths = [head], []
+        while True:
+            link = links.get(nodes[-1])
+            if link is None:
+                break
+            next_node, length = link
+            if next_node == head:
+                lengths.append(length)
+                break
+            if next_node[0] in used or any(node[0] == next_node[0] for node in nodes):
+                raise ValueError(f"Ambiguous assembly, fragment {next_node[0]} is joined in both orientations.")
+            nodes.append(next_node)
+            lengths.append(length)
+        used.update(node[0] for node in nodes)
+        if len(nodes) > 1 or circular:
+            paths.append((nodes, lengths, circular))
+    return paths
+
+
+def _fragment_annotations(fragment: DoubleStrandNucleicAcidSequence, orientation: int) -> tuple:
+    # Annotations of both strands in forward strand coordinates of the oriented fragment, split by
+    # the strand of the product they land on
+    n = len(fragment.forward_sequence)
+    forward_annotations, reverse_annotations = [], []
+    strands = [(fragment.forward_sequence, 0, orientation == 1),
+               (fragment.reverse_sequence, fragment.reverse_sequence_start, orientation == -1)]
+    for strand, shift, lands_forward in strands:
+        for annotation in strand.annotations.values():
+            start, end = annotation.start + shift, annotation.end + shift
+            if start < 0 or end >= n:
+                continue
+            if orientation == -1:
+                start, end = n - 1 - end, n - 1 - start
+            target = forward_annotations if lands_forward else reverse_annotations
+            target.append({"name": annotation.name, "start": start, "end": end, "note": annotation.note})
+    return forward_annotations, reverse_annotations
+
+
+def _add_carried_annotations(strand, annotations: List[tuple], circular: bool) -> None:
+    n = len(strand)
+    carried = {}
+    for fragment_number, annotation in annotations:
+        start, end = annotation["start"], annotation["end"]
+        if circular:
+            start, end = start % n, end % n
+        # Annotations cannot start on the last base or end on the first
+        if start >= n - 1 or end <= 0 or (start > end and not circular):
+            continue
+        name = annotation["name"]
+        if name in carried:
+            if (carried[name]["start"], carried[name]["end"]) == (start, end):
+                # The same feature carried by both fragments of an overlap
+                continue
+            name = f"{name}_{fragment_number}"
+        carried[name] = {"name": name, "start": start, "end": end, "note": annotation["note"]}
+    strand.add_annotations(list(carried.values()))
+
+
+def gibson_assembly(
+    fragments: Sequence[DoubleStrandNucleicAcidSequence],
+    min_overlap: int = 15,
+    max_overlap: int = 60,
+) -> List[dict]:
+    """
+    Assembles linear double stranded fragments at their homologous ends, as a Gibson or HiFi
+    assembly would. Overlaps are found with rolling hashes, see find_terminal_overlaps, and
+    fragments are used in whichever orientation they overlap in. Every chain of overlapping
+    fragments becomes a linear product, every ring of them a circular one. Fragments that
+    overlap nothing are left out. Annotations of both strands of every fragment are carried to
+    the product, an annotation carried by both fragments of an overlap is kept once.
+
+    Parameters:
+    - fragments (list): Linear DNA DoubleStrandNucleicAcidSequence objects. Their forward strands
+        are assembled, overhangs are chewed back and filled in.
+    - min_overlap (int): The shortest overlap that joins two fragments.
+    - max_overlap (int): The longest overlap looked for.
+
+    Returns:
+    - list (dict): One dict per product with the fragment ids and orientations (1 or -1) in
+        order, the overlap lengths of the junctions, whether it is circular and the product.
+    """
+    for index, fragment in enumerate(fragments):
+        if not isinstance(fragment, DoubleStrandNucleicAcidSequence):
+            raise ValueError(f"Fragment {index} must be a DoubleStrandNucleicAcidSequence object.")
+        if fragment.nucleic_acid_type != NucleicAcidTypes.DNA.value:
+            raise ValueError(f"Fragment {index} cannot be RNA, it must be DNA.")
+        if fragment.circular:
+            raise ValueError(f"Fragment {index} cannot be circular, it must be linear.")
+    sequences = [fragment.forward_sequence.sequence.upper() for fragment in fragments]
+    links = _links(find_terminal_overlaps(sequences, min_overlap, max_overlap))
+    assemblies = []
+    for nodes, lengths, circular in _assembly_paths(links, len(fragments)):
+        pieces, offsets = [], []
+        offset = 0
+        for position, (index, orientation) in enumerate(nodes):
+            sequence = sequences[index] if orientation == 1 else reverse_complement_sequence(sequences[index])
+            trimmed = lengths[position - 1] if position else 0
+            pieces.append(sequence[trimmed:])
+            offsets.append(offset - trimmed)
+            offset += len(sequence) - trimmed
+        product_sequence = "".join(pieces)
+        if circular:
+            product_sequence = product_sequence[:len(product_sequence) - lengths[-1]]
+        # The bases come from validated fragments, so the strands are built without revalidating
+        strands = []
+        for strand_sequence, strand_direction in [
+                (product_sequence, StrandDirections.FWD_STRAND.value),
+                (complement_sequence(product_sequence), StrandDirections.REV_STRAND.value)]:
+            strand = SingleStrandNucleicAcidSequence._restore(
+                uuid.uuid4().hex, strand_sequence, NucleicAcidTypes.DNA.value, circular, strand_direction, "")
+            strand._add_all_cut_sites()
+            strands.append(strand)
+        product = DoubleStrandNucleicAcidSequence(
+            forward_sequence=strands[0],
+            reverse_sequence=strands[1],
+            reverse_sequence_start=0,
+            nucleic_acid_type=NucleicAcidTypes.DNA.value,
+            circular=circular,
+            note=f"Gibson assembly of {len(nodes)} fragments",
+        )
+        forward_annotations, reverse_annotations = [], []
+        for position, (index, orientation) in enumerate(nodes):
+            for source, target in zip(_fragment_annotations(fragments[index], orientation),
+                                      (forward_annotations, reverse_annotations)):
+                for annotation in source:
+                    annotation["start"] += offsets[position]
+                    annotation["end"] += offsets[position]
+                    target.append((position + 1, annotation))
+        _add_carried_annotations(product.forward_sequence, forward_annotations, circular)
+        _add_carried_annotations(product.reverse_sequence, reverse_annotations, circular)
+        assemblies.append({
+            "fragments": [(fragments[index].id, orientation) for index, orientation in nodes],
+            "overlaps": lengths,
+            "circular": circular,
+            "product": product,
+        })
+    return assemblies
@@ -0,0 +1,200 @@
+from bisect import bisect_left, bisect_right
+from functools import partial
+from typing import Iterable, Iterator, List, Optional
+
+from src.double_stranded_nucleic_acids import DoubleStrandNucleicAcidSequence
+from src.nucleic_acids import reverse_sequence, reverse_complement_sequence
+from src.single_stranded_nucleic_acids import SingleStrandNucleicAcidSequence
+from src.util_functions import circular_find, imap_windows, ring_slice, validate_chunk_size
+
+
+def find_binding_sites(template_seq: str, anchor_seq: str, circular: bool = False) -> List[int]:
+    """
+    Finds every (overlapping) exact occurrence of an anchor sequence on a template sequence.
+
+    Parameters:
+    - template_seq (str): The DNA sequence of the template.
+    - anchor_seq (str): The sequence that must match the template exactly.
+    - circular (bool): If True, occurrences that span the origin of the template are reported too.
+
+    Returns:
+    - list (int): The start index of every occurrence. Indexes are always within the template.
+    """
+    find = partial(circular_find, template_seq) if circular else template_seq.find
+    starts = []
+    start = find(anchor_seq)
+    while start != -1:
+        starts.append(start)
+        start = find(anchor_seq, start + 1)
+    return starts
+
+
+def find_pcr_products(
+    template_seq: str,
+    forward_primer_seq: str,
+    reverse_primer_seq: str,
+    min_amplicon_size: int,
+    max_amplicon_size: int,
+    circular: bool = False,
+    anchor_length: Optional[int] = None,
+    include_single_primer_products: bool = False,
+    include_sequences: bool = True,
+) -> List[dict]:
+    """
+    Finds every PCR product a primer pair can make on a template within an amplicon size range.
+
+    Primers follow the same conventions as NucleicAcidReaction._perform_pcr: the forward primer
+    is written 5'->3' and the reverse primer is written as it aligns to the template reverse strand.
+    Only the 3' terminal anchor_length bases of each primer have to bind, anything 5' of the anchor
+    becomes an overhang of the product.
+
+    Parameters:
+    - template_seq (str): The forward strand DNA sequence of the template.
+    - forward_primer_seq (str): The DNA sequence of the forward primer.
+    - reverse_primer_seq (str): The DNA sequence of the reverse primer.
+    - min_amplicon_size (int): The smallest product length, including primer overhangs, to report.
+    - max_amplicon_size (int): The largest product length, including primer overhangs, to report.
+    - circular (bool): If True, products spanning the origin of the template are reported too.
+    - anchor_length (int): Number of 3' bases of each primer that must match the template exactly.
+        Defaults to the full primer length.
+    - include_single_primer_products (bool): If True, products primed from both ends by the same
+        primer, or by the pair in swapped orientation, are reported too.
+    - include_sequences (bool): If True, the forward strand sequence of each product is reported.
+
+    Returns:
+    - list (dict): One dict per product with the primers used, the template start and end index of
+        the bound region, the product size, whether it spans the origin and optionally its sequence.
+    """
+    template_seq = template_seq.upper()
+    n = len(template_seq)
+    # Oligos are handled 5'->3', the reverse primer is stored aligned to the reverse strand
+    oligos = {
+        "forward_primer": forward_primer_seq.upper(),
+        "reverse_primer": reverse_sequence(reverse_primer_seq.upper()),
+    }
+    pairings = [("forward_primer", "reverse_primer")]
+    if include_single_primer_products:
+        pairings += [("reverse_primer", "forward_primer"),
+                     ("forward_primer", "forward_primer"),
+                     ("reverse_primer", "reverse_primer")]
+
+    # Anchor end index on the forward strand for oligos priming the forward strand, and
+    # anchor start index for oligos priming the reverse strand
+    top_sites, bottom_sites, anchors = {}, {}, {}
+    for name, oligo in oligos.items():
+        anchor_len = min(anchor_length or len(oligo), len(oligo))
+        anchors[name] = anchor_len
+        top_sites[name] = [start + anchor_len - 1 for start in
+                           find_binding_sites(template_seq, oligo[-anchor_len:], circular)]
+        bottom_starts = find_binding_sites(
+            template_seq, reverse_complement_sequence(oligo)[:anchor_len], circular)
+        if circular:
+            # Extended copies let a forward site pair with a reverse site past the origin
+            bottom_starts = bottom_starts + [s + n for s in bottom_starts] + [s + 2 * n for s in bottom_starts]
+        bottom_sites[name] = bottom_starts
+
+    products = []
+    for top_name, bottom_name in pairings:
+        top_oligo, bottom_oligo = oligos[top_name], oligos[bottom_name]
+        overhangs = len(top_oligo) + len(bottom_oligo)
+        min_gap = max(min_amplicon_size - overhangs, 0)
+        max_gap = max_amplicon_size - overhangs
+        if max_gap < 0:
+            continue
+        q_sites = bottom_sites[bottom_name]
+        for anchor_end in top_sites[top_name]:
+            low = bisect_left(q_sites, anchor_end + 1 + min_gap)
+            high = bisect_right(q_sites, anchor_end + 1 + max_gap)
+            for q_site in q_sites[low:high]:
+                gap = q_site - anchor_end - 1
+                bound_start = anchor_end - anchors[top_name] + 1
+                bound_end = q_site + anchors[bottom_name] - 1
+                if circular and bound_end - bound_start + 1 > n:
+                    continue
+                product = {
+                    "forward_oligo": top_name,
+                    "reverse_oligo": bottom_name,
+                    "start": bound_start % n,
+                    "end": bound_end % n,
+                    "size": overhangs + gap,
+                    "spans_origin": circular and bound_end >= n,
+                }
+                if include_sequences:
+                    gap_start = (anchor_end + 1) % n
+                    gap_seq = ring_slice(template_seq, gap_start, gap_start + gap)
+                    product["sequence"] = top_oligo + gap_seq + reverse_complement_sequence(bottom_oligo)
+                products.append(product)
+    return products
+
+
+def _template_job(index_and_template) -> tuple:
+    index, template = index_and_template
+    if isinstance(template, DoubleStrandNucleicAcidSequence):
+        return index, template.id, template.forward_sequence.sequence, template.circular
+    if isinstance(template, SingleStrandNucleicAcidSequence):
+        return index, template.id, template.sequence, template.circular
+    raise ValueError("Each template must be a SingleStrandNucleicAcidSequence or "
+                     "DoubleStrandNucleicAcidSequence object.")
+
+
+def _run_template_job(job: tuple, **search_kwargs) -> List[dict]:
+    index, template_id, template_seq, circular = job
+    products = find_pcr_products(template_seq, circular=circular, **search_kwargs)
+    for product in products:
+        product["template_index"] = index
+        product["template_id"] = template_id
+    return products
+
+
+def electronic_pcr(
+    templates: Iterable,
+    forward_primer: SingleStrandNucleicAcidSequence,
+    reverse_primer: SingleStrandNucleicAcidSequence,
+    min_amplicon_size: int = 1,
+    max_amplicon_size: int = 10000,
+    anchor_length: Optional[int] = None,
+    include_single_primer_products: bool = False,
+    include_sequences: bool = True,
+    processes: Optional[int] = 1,
+    chunksize: int = 16,
+) -> Iterator[dict]:
+    """
+    Runs an in-silico PCR of one primer pair against a collection of templates, streaming every
+    product found. Products are yielded in template order.
+
+    Parameters:
+    - templates (iterable): SingleStrandNucleicAcidSequence or DoubleStrandNucleicAcidSequence objects.
+        Circular templates also report products spanning their origin.
+    - forward_primer (SingleStrandNucleicAcidSequence): The forward primer.
+    - reverse_primer (SingleStrandNucleicAcidSequence): The reverse primer.
+    - processes (int): Number of worker processes, None uses every core and 1 runs in process.
+    - chunksize (int): Number of templates sent to a worker at a time.
+    - The remaining parameters are passed on to find_pcr_products.
+
+    Returns:
+    - generator (dict): One dict per product, see find_pcr_products, with the template_index and
+        template_id of the template it was found on.
+    """
+    run_job = partial(
+        _run_template_job,
+        forward_primer_seq=forward_primer.sequence,
+        reverse_primer_seq=reverse_primer.sequence,
+        min_amplicon_size=min_amplicon_size,
+        max_amplicon_size=max_amplicon_size,
+        anchor_length=anchor_length,
+        include_single_primer_products=include_single_primer_products,
+        include_sequences=include_sequences,
+    )
+    validate_chunk_size(chunksize)
+    jobs = map(_template_job, enumerate(templates))
+    if processes == 1:
+        for job in jobs:
+            yield from run_job(job)
+        return
+    # Imported here so in-process runs, and importing this module, never load multiprocessing
+    from multiprocessing import Pool
+
+    with Pool(processes) as pool:
+        # Submit templates a window at a time so huge collections are never fully queued
+        for products in imap_windows(pool, run_job, jobs, processes, chunksize):
+            yield from products
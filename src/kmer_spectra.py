@@ -0,0 +1,254 @@
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+
+
+# 2-bit code of every base, 4 for ambiguous bases, which no k-mer may contain. U is read as T.
+_base_codes = np.full(256, 4, dtype=np.uint8)
+for _code, _bases in enumerate(["Aa", "Cc", "Gg", "TtUu"]):
+    for _base in _bases:
+        _base_codes[ord(_base)] = _code
+_code_bases = np.frombuffer(b"ACGT", dtype=np.uint8)
+max_k = 32
+
+
+def _encode(sequence: str, circular: bool = False, wrap: int = 0) -> Tuple[np.ndarray, np.ndarray]:
+    # 2-bit codes and, for every window start, the number of ambiguous bases before it. Circular
+    # sequences get their first wrap bases repeated after the end.
+    encoded = _base_codes[np.frombuffer(sequence.encode("ascii"), dtype=np.uint8)]
+    if circular and wrap:
+        encoded = np.concatenate((encoded, encoded[:min(wrap, encoded.size)]))
+    ambiguous = np.zeros(encoded.size + 1, dtype=np.int64)
+    np.cumsum(encoded == 4, out=ambiguous[1:])
+    return np.minimum(encoded, 3).astype(np.uint64), ambiguous
+
+
+def _window_hashes(codes: np.ndarray, k: int) -> np.ndarray:
+    # 2-bit hash of every k base window, first base in the highest bits. Hashes of 2^j base
+    # windows are doubled into 2^(j+1) base windows, and those matching the bits of k joined, so
+    # the whole rolling hash takes O(n log k) vectorized work instead of O(n k).
+    n = codes.size
+    if k > n:
+        return np.zeros(0, dtype=np.uint64)
+    result, result_k = None, 0
+    power, power_k = codes, 1
+    while True:
+        if k & power_k:
+            if result is None:
+                result, result_k = power, power_k
+            else:
+                count = n - result_k - power_k + 1
+                result = (result[:count] << np.uint64(2 * power_k)) | power[result_k:result_k + count]
+                result_k += power_k
+        if 2 * power_k > k:
+            return result[:n - k + 1]
+        count = n - 2 * power_k + 1
+        power = (power[:count] << np.uint64(2 * power_k)) | power[power_k:power_k + count]
+        power_k *= 2
+
+
+def _validate_k(k: int) -> None:
+    if not isinstance(k, int) or not 1 <= k <= max_k:
+        raise ValueError(f"k must be an integer from 1 to {max_k}.")
+
+
+def kmer_hashes(sequence: str, k: int, canonical: bool = False, circular: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Rolling 2-bit hashes of every k-mer of a sequence, the hash of a k-mer being its bases as a
+    base 4 number (A=0, C=1, G=2, T=3), so it is also the k-mer itself, see decode_kmers. K-mers
+    with ambiguous bases are left out.
+
+    Parameters:
+    - sequence (str): The sequence.
+    - k (int): The k-mer length, up to max_k.
+    - canonical (bool): If True, each k-mer is hashed as the smaller of itself and its reverse
+        complement, so both strands count as one.
+    - circular (bool): If True, k-mers spanning the origin are hashed too.
+
+    Returns:
+    - tuple (np.ndarray, np.ndarray): The start of every k-mer and its hash.
+    """
+    _validate_k(k)
+    n = len(sequence)
+    codes, ambiguous = _encode(sequence, circular, k - 1)
+    hashes = _window_hashes(codes, k)
+    if canonical and hashes.size:
+        reverse_hashes = _window_hashes(np.uint64(3) - codes[::-1], k)[::-1]
+        hashes = np.minimum(hashes, reverse_hashes)
+    if circular and n >= k:
+        hashes = hashes[:n]
+    starts = np.arange(hashes.size)
+    unambiguous = ambiguous[starts + k] == ambiguous[starts]
+    return starts[unambiguous], hashes[unambiguous]
+
+
+def decode_kmers(hashes: np.ndarray, k: int) -> List[str]:
+    _validate_k(k)
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    shifts = np.arange(2 * (k - 1), -1, -2, dtype=np.uint64)
+    codes = (hashes[:, None] >> shifts) & np.uint64(3)
+    return [row.tobytes().decode("ascii") for row in _code_bases[codes]]
+
+
+def kmer_counts(sequence: str, k: int, canonical: bool = False, circular: bool = False) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Counts the k-mers of a sequence, see kmer_hashes.
+
+    Returns:
+    - tuple (np.ndarray, np.ndarray): Every distinct k-mer hash, sorted, and its count.
+    """
+    _, hashes = kmer_hashes(sequence, k, canonical, circular)
+    return np.unique(hashes, return_counts=True)
+
+
+def kmer_spectrum(sequence: str, k: int, canonical: bool = False, circular: bool = False) -> np.ndarray:
+    """
+    The k-mer spectrum of a sequence, how many distinct k-mers occur how often.
+
+    Returns:
+    - np.ndarray: The number of distinct k-mers occurring i times at index i.
+    """
+    _, counts = kmer_counts(sequence, k, canonical, circular)
+    return np.bincount(counts, minlength=1)
+
+
+def kmer_spectra(sequence: str, ks: Iterable[int], canonical: bool = False, circular: bool = False) -> Dict[int, np.ndarray]:
+    return {k: kmer_spectrum(sequence, k, canonical, circular) for k in ks}
+
+
+def collection_kmer_counts(sequences: Iterable[str], k: int, canonical: bool = True) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Counts the k-mers of a whole collection of sequences, e.g. to find k-mers shared between
+    constructs or primers that would bind more than one template. Sequences are hashed one by
+    one and counted together in one sort.
+
+    Returns:
+    - tuple (np.ndarray, np.ndarray, np.ndarray): Every distinct k-mer hash, sorted, its count
+        over all sequences and the number of sequences it occurs in.
+    """
+    all_hashes, distinct_hashes = [], []
+    for sequence in sequences:
+        _, hashes = kmer_hashes(sequence.upper(), k, canonical)
+        all_hashes.append(hashes)
+        distinct_hashes.append(np.unique(hashes))
+    if not all_hashes:
+        empty = np.zeros(0, dtype=np.int64)
+        return np.zeros(0, dtype=np.uint64), empty, empty
+    kmers, counts = np.unique(np.concatenate(all_hashes), return_counts=True)
+    present = np.concatenate(distinct_hashes)
+    sequence_counts = np.bincount(np.searchsorted(kmers, present), minlength=kmers.size)
+    return kmers, counts, sequence_counts
+
+
+def _regions(starts: np.ndarray, k: int, n: int, circular: bool) -> np.ndarray:
+    # Merges the overlapping or adjacent k base windows at sorted starts into (start, end) regions,
+    # ends inclusive
+    if not starts.size:
+        return np.zeros((0, 2), dtype=np.int64)
+    breaks = np.flatnonzero(np.diff(starts) > k)
+    region_starts = np.concatenate(([starts[0]], starts[breaks + 1]))
+    region_ends = np.concatenate((starts[breaks], [starts[-1]])) + k - 1
+    regions = np.stack((region_starts, region_ends), axis=1).astype(np.int64)
+    if circular and regions[-1, 1] >= n:
+        # The last region runs over the origin, maybe into the first or around the whole ring
+        end = regions[-1, 1] - n
+        if regions.shape[0] > 1 and regions[0, 0] <= end + 1:
+            end = max(end, regions[0, 1])
+            regions = regions[1:]
+        if end >= regions[-1, 0] - 1 or regions[-1, 1] - regions[-1, 0] >= n - 1:
+            return np.array([[0, n - 1]], dtype=np.int64)
+        regions[-1, 1] = end
+    return regions
+
+
+def find_repeats(sequence: str, k: int = 16, min_copies: int = 2, canonical: bool = True,
+                 circular: bool = False) -> np.ndarray:
+    """
+    Finds the regions made of k-mers occurring at least min_copies times, such as repeats that a
+    primer of k bases or more could bind more than once. With canonical k-mers inverted repeats
+    are found too.
+
+    Returns:
+    - np.ndarray: One (start, end) row per repeat region, ends inclusive. Regions of circular
+        sequences spanning the origin end before they start.
+    """
+    if not isinstance(min_copies, int) or min_copies < 2:
+        raise ValueError("Minimum copies must be an integer of at least 2.")
+    starts, hashes = kmer_hashes(sequence, k, canonical, circular)
+    _, inverse, counts = np.unique(hashes, return_inverse=True, return_counts=True)
+    return _regions(starts[counts[inverse] >= min_copies], k, len(sequence), circular)
+
+
+def low_complexity_regions(sequence: str, window: int = 64, threshold: float = 20,
+                           circular: bool = False) -> np.ndarray:
+    """
+    Finds low complexity regions with the DUST score of every window of window bases, the number
+    of pairs of equal trinucleotides in it divided by the number of trinucleotides minus one.
+    Windows scoring above threshold are merged into regions, as DustMasker does with a window of
+    64 and a level of 20. Trinucleotides with ambiguous bases are not counted.
+
+    Returns:
+    - np.ndarray: One (start, end) row per region, ends inclusive.
+    """
+    if not isinstance(window, int) or window < 4:
+        raise ValueError("Window must be an integer of at least 4.")
+    n = len(sequence)
+    window = min(window, n)
+    if window < 4:
+        return np.zeros((0, 2), dtype=np.int64)
+    codes, ambiguous = _encode(sequence, circular, window - 1)
+    triplets = _window_hashes(codes, 3).astype(np.int64)
+    triplet_starts = np.arange(triplets.size)
+    triplets[ambiguous[triplet_starts + 3] != ambiguous[triplet_starts]] = -1
+    # Windows are scored incrementally, each step drops the pairs of its first trinucleotide and
+    # adds those of the next one. Pairs are counted by binary search over trinucleotides sorted
+    # by (trinucleotide, position), so the whole scan is O(n log n).
+    triplet_window = window - 2
+    window_count = n if circular else n - window + 1
+    valid_starts = np.flatnonzero(triplets >= 0)
+    keys = triplets[valid_starts] * (triplets.size + triplet_window) + valid_starts
+    order = np.argsort(keys, kind="stable")
+    sorted_keys = keys[order]
+    # Queries in sorted order keep each binary search next to the previous one
+    ranks = np.arange(sorted_keys.size)
+    earlier = np.zeros(triplets.size, dtype=np.int64)
+    later = np.zeros(triplets.size, dtype=np.int64)
+    earlier[valid_starts[order]] = ranks - np.searchsorted(sorted_keys, sorted_keys - triplet_window + 1)
+    later[valid_starts[order]] = np.searchsorted(sorted_keys, sorted_keys + triplet_window - 1, side="right") - ranks - 1
+    steps = earlier[triplet_window:triplet_window + window_count - 1] - later[:window_count - 1]
+    pairs = np.empty(window_count, dtype=np.int64)
+    pairs[0] = earlier[:triplet_window].sum()
+    np.cumsum(steps, out=pairs[1:])
+    pairs[1:] += pairs[0]
+    masked = pairs > threshold * (triplet_window - 1)
+    # Every base of a window above the threshold is masked
+    coverage = np.zeros(window_count + window, dtype=np.int64)
+    np.add.at(coverage, np.flatnonzero(masked), 1)
+    np.add.at(coverage, np.flatnonzero(masked) + window, -1)
+    covered = np.cumsum(coverage)[:window_count + window - 1] > 0
+    if circular:
+        folded = covered[:n].copy()
+        folded[:covered.size - n] |= covered[n:]
+        covered = folded
+    positions = np.flatnonzero(covered[:n])
+    if circular and positions.size == n:
+        return np.array([[0, n - 1]], dtype=np.int64)
+    regions = _regions(positions, 1, n, False)
+    if circular and regions.shape[0] > 1 and regions[0, 0] == 0 and regions[-1, 1] == n - 1:
+        # The regions at both ends are one, spanning the origin
+        regions[0, 0] = regions[-1, 0]
+        regions = regions[:-1]
+    return regions
+
+
+def mask_regions(sequence: str, regions: np.ndarray, mask_base: str = "N") -> str:
+    # Replaces the bases of every (start, end) region, ends inclusive, with mask_base
+    encoded = bytearray(sequence.encode("ascii"))
+    n = len(encoded)
+    for start, end in np.asarray(regions).tolist():
+        if start <= end:
+            encoded[start:end + 1] = mask_base.encode("ascii") * (end - start + 1)
+        else:
+            encoded[start:] = mask_base.encode("ascii") * (n - start)
+            encoded[:end + 1] = mask_base.encode("ascii") * (end + 1)
+    return encoded.decode("ascii")
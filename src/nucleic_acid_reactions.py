@@ -2,7 +2,10 @@ import uuid
 
 from src.nucleic_acids import reverse_sequence, complement_sequence
 from src.double_stranded_nucleic_acids import DoubleStrandNucleicAcidSequence
+from src.gibson_assemblies import gibson_assembly
+from src.in_silico_pcr import electronic_pcr
 from src.single_stranded_nucleic_acids import SingleStrandNucleicAcidSequence, transfer_annotations
+from src.smrtbell_library_preps import smrtbell_constructs, write_smrtbell_constructs
 from src.util_classes import NucleicAcidTypes, StrandDirections
 from src.util_functions import kmer_trimming_search
 
@@ -103,6 +106,45 @@ class NucleicAcidReaction:
         )
         return {"pcr_construct": pcr_construct}
 
+    def _perform_electronic_pcr(
+        self,
+        min_amplicon_size=1,
+        max_amplicon_size=10000,
+        anchor_length=None,
+        include_single_primer_products=False,
+        include_sequences=True,
+        processes=1,
+    ):
+        """
+        Runs the primer pair against every template in self.inputs["templates"] and reports every
+        product within the amplicon size bounds, including several products per template and
+        products spanning the origin of circular templates. See in_silico_pcr.electronic_pcr.
+        """
+        self._validate_electronic_pcr()
+        pcr_products = electronic_pcr(
+            self.inputs["templates"],
+            self.inputs["forward_primer"],
+            self.inputs["reverse_primer"],
+            min_amplicon_size=min_amplicon_size,
+            max_amplicon_size=max_amplicon_size,
+            anchor_length=anchor_length,
+            include_single_primer_products=include_single_primer_products,
+            include_sequences=include_sequences,
+            processes=processes,
+        )
+        return {"pcr_products": list(pcr_products)}
+
+    def _perform_gibson_assembly(self, min_overlap=15, max_overlap=60):
+        """
+        Joins the fragments in self.inputs["fragments"] at their homologous ends into linear and
+        circular products, see gibson_assemblies.gibson_assembly. Ambiguous overlaps raise a
+        ValueError.
+        """
+        self._validate_input_keys(["fragments"])
+        assemblies = gibson_assembly(self.inputs["fragments"], min_overlap=min_overlap, max_overlap=max_overlap)
+        return {"assembly_products": [assembly["product"] for assembly in assemblies],
+                "assemblies": assemblies}
+
     # TODO: Fill this out
     def _perform_ligation(self):
         # Implement ligation logic here
@@ -125,6 +167,31 @@ class NucleicAcidReaction:
         )
         return {"smrtbell_library_construct": smrtbell_library_construct}
 
+    def _perform_pacbio_smrtbell_library_prep_batch(
+        self,
+        annotate=False,
+        scan_cut_sites=False,
+        writer=None,
+        chunk_size=10000,
+    ):
+        """
+        Builds the SMRTbell construct of every insert in self.inputs["templates"] lazily, see
+        smrtbell_library_preps.smrtbell_constructs. Without a writer the constructs are returned
+        as a generator. With a writer, a callable such as SequenceStore.add or FastaWriter.write,
+        they are streamed to it in chunks of chunk_size and only their number is returned.
+        """
+        self._validate_pacbio_smrtbell_library_prep_batch()
+        constructs = smrtbell_constructs(
+            self.inputs["templates"],
+            self.inputs["front_adapter"].sequence,
+            self.inputs["back_adapter"].sequence,
+            annotate=annotate,
+            scan_cut_sites=scan_cut_sites,
+        )
+        if writer is None:
+            return {"smrtbell_library_constructs": constructs}
+        return {"smrtbell_library_construct_count": write_smrtbell_constructs(constructs, writer, chunk_size)}
+
     def _validate_pcr(self):
         self._validate_input_keys(["template", "forward_primer", "reverse_primer"])
         if not isinstance(self.inputs["template"], (SingleStrandNucleicAcidSequence, DoubleStrandNucleicAcidSequence)):
@@ -134,6 +201,13 @@ class NucleicAcidReaction:
             raise ValueError("The template cannot be RNA, it must be DNA.")
         if isinstance(self.inputs["template"], SingleStrandNucleicAcidSequence) and self.inputs["template"].strand_direction != StrandDirections.FWD_STRAND.value:
             raise ValueError("Currently, if the template is ssDNA, it must have forward (5->3) strand direction.")
+        self._validate_primers()
+
+    def _validate_electronic_pcr(self):
+        self._validate_input_keys(["templates", "forward_primer", "reverse_primer"])
+        self._validate_primers()
+
+    def _validate_primers(self):
         if not isinstance(self.inputs["forward_primer"], SingleStrandNucleicAcidSequence):
             raise ValueError("The forward primer must be a SingleStrandNucleicAcidSequence object.")
         if self.inputs["forward_primer"].circular:
@@ -153,6 +227,14 @@ class NucleicAcidReaction:
             raise ValueError("The template must be a DoubleStrandNucleicAcidSequence object.")
         if self.inputs["template"].nucleic_acid_type != NucleicAcidTypes.DNA.value:
             raise ValueError("The template cannot be RNA, it must be DNA.")
+        self._validate_adapters()
+
+    def _validate_pacbio_smrtbell_library_prep_batch(self):
+        # Templates are checked one by one as they are consumed
+        self._validate_input_keys(["templates", "front_adapter", "back_adapter"])
+        self._validate_adapters()
+
+    def _validate_adapters(self):
         if not isinstance(self.inputs["front_adapter"], SingleStrandNucleicAcidSequence):
             raise ValueError("The front adapter must be a SingleStrandNucleicAcidSequence object.")
         if self.inputs["front_adapter"].circular:
@@ -33,6 +33,14 @@ def reverse_sequence(input_sequence: str) -> str:
     return "".join(reversed(input_sequence))
 
 def complement_sequence(input_sequence: str, nuc_type: str = "DNA") -> str:
+    comp_map = _complement_map(nuc_type)
+    return "".join(comp_map[nuc] for nuc in input_sequence)
+
+def complement_translation_table(nuc_type: str = "DNA") -> dict:
+    # str.translate table equivalent to complement_sequence, without its per base validation
+    return str.maketrans(_complement_map(nuc_type))
+
+def _complement_map(nuc_type: str) -> dict:
     if nuc_type not in (NucleicAcidTypes.DNA.value, NucleicAcidTypes.RNA.value):
         raise ValueError(f"Incorrect nuc type, must be DNA or RNA, not {nuc_type}.")
     comp_map = {
@@ -55,7 +63,7 @@ def complement_sequence(input_sequence: str, nuc_type: str = "DNA") -> str:
     }
     if nuc_type == "RNA":
         comp_map["A"] = "U"
-    return "".join(comp_map[nuc] for nuc in input_sequence)
+    return comp_map
 
 def reverse_complement_sequence(input_sequence: str, nuc_type: str = "DNA") -> str:
     rev_seq = reverse_sequence(input_sequence)
@@ -0,0 +1,153 @@
+import re
+from multiprocessing import Pool, shared_memory
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from src.nucleic_acids import complement_sequence
+from src.restriction_enzyme_cutsites import max_recognition_sequence_length, restriction_enzyme_types
+from src.util_classes import StrandDirections
+from src.util_functions import _motif_starts, find_motif_positions, validate_chunk_size
+
+
+def _recognition_sequences(strand_direction: str, restriction_enzymes: Optional[List[str]]) -> List[tuple]:
+    # (order, restriction enzyme, recognition sequence as read on the strand), in the order of
+    # restriction_enzyme_types, which decides which enzyme a start goes to
+    recognitions = []
+    for order, (restriction_enzyme, data) in enumerate(restriction_enzyme_types.items()):
+        if restriction_enzymes is not None and restriction_enzyme not in restriction_enzymes:
+            continue
+        recognition_seq = data["recognition_sequence"]
+        if strand_direction == StrandDirections.REV_STRAND.value:
+            recognition_seq = complement_sequence(recognition_seq)
+        recognitions.append((order, restriction_enzyme, recognition_seq))
+    return recognitions
+
+
+def _chunk_cut_sites(chunk, own_length: int, recognitions: List[tuple]) -> List[tuple]:
+    # Sites starting in the first own_length bases of the chunk, the rest is overlap
+    sites = []
+    for order, restriction_enzyme, recognition_seq in recognitions:
+        for match in re.finditer(b"(?=" + recognition_seq.encode("ascii") + b")", chunk):
+            if match.start() >= own_length:
+                break
+            sites.append((match.start(), order, restriction_enzyme))
+    return sites
+
+
+def _scan_cut_site_chunk(job) -> List[tuple]:
+    shared_name, start, end, stop, recognitions = job
+    shared = shared_memory.SharedMemory(name=shared_name)
+    try:
+        chunk = shared.buf[start:stop]
+        sites = _chunk_cut_sites(chunk, end - start, recognitions)
+        chunk.release()
+    finally:
+        shared.close()
+    return [(start + offset, order, restriction_enzyme) for offset, order, restriction_enzyme in sites]
+
+
+def _scan_motif_chunk(job) -> np.ndarray:
+    shared_name, start, end, stop, motif = job
+    shared = shared_memory.SharedMemory(name=shared_name)
+    try:
+        chunk = shared.buf[start:stop]
+        starts = _motif_starts(np.frombuffer(chunk, dtype=np.uint8), motif)
+        chunk.release()
+    finally:
+        shared.close()
+    return starts[starts < end - start] + start
+
+
+def _scan_shared(sequence: str, circular: bool, overlap: int, chunk_size: int, processes: Optional[int],
+                 worker, payload) -> list:
+    # Copies the sequence once into shared memory, with the first bases repeated after the end
+    # for circular sequences, and scans chunks of it that overlap by overlap bases
+    n = len(sequence)
+    encoded = sequence.upper().encode("ascii")
+    if circular:
+        encoded += encoded[:overlap]
+    shared = shared_memory.SharedMemory(create=True, size=max(len(encoded), 1))
+    try:
+        shared.buf[:len(encoded)] = encoded
+        jobs = [(shared.name, start, min(start + chunk_size, n), min(start + chunk_size + overlap, len(encoded)),
+                 payload) for start in range(0, n, chunk_size)]
+        with Pool(processes) as pool:
+            return pool.map(worker, jobs)
+    finally:
+        shared.close()
+        shared.unlink()
+
+
+def scan_cut_sites(
+    sequence: str,
+    strand_direction: str = StrandDirections.FWD_STRAND.value,
+    circular: bool = False,
+    restriction_enzymes: Optional[List[str]] = None,
+    processes: Optional[int] = None,
+    chunk_size: int = 1000000,
+) -> Dict[int, str]:
+    """
+    Finds the cut sites of a chromosome-scale sequence across a process pool. The sequence is
+    copied once into shared memory and split into chunks of chunk_size bases, each read with the
+    longest recognition sequence of overlap so no site is missed. Each site is kept by the chunk
+    it starts in. Sites are matched as in SingleStrandNucleicAcidSequence._add_all_cut_sites,
+    including sites across the origin of circular sequences.
+
+    Parameters:
+    - sequence (str): The sequence of the strand, as stored.
+    - strand_direction (str): The direction of the strand, recognition sequences of reverse
+        strands are complemented.
+    - circular (bool): If True, sites spanning the origin are found too.
+    - restriction_enzymes (list of str): The enzymes to look for, all of them if None.
+    - processes (int): Number of worker processes, None for one per CPU. With 1, or a sequence of
+        one chunk, the scan runs in this process.
+    - chunk_size (int): Number of bases each task scans.
+
+    Returns:
+    - dict: The restriction enzyme of every cut site start, sorted by start. Where several
+        enzymes match at one start the first in restriction_enzyme_types wins.
+    """
+    validate_chunk_size(chunk_size)
+    recognitions = _recognition_sequences(strand_direction, restriction_enzymes)
+    n = len(sequence)
+    overlap = max_recognition_sequence_length - 1
+    if processes == 1 or n <= chunk_size:
+        encoded = sequence.upper().encode("ascii")
+        if circular:
+            encoded += encoded[:overlap]
+        chunk_sites = [_chunk_cut_sites(encoded, n, recognitions)]
+    else:
+        chunk_sites = _scan_shared(sequence, circular, overlap, chunk_size, processes,
+                                   _scan_cut_site_chunk, recognitions)
+    recognition_lengths = {restriction_enzyme: len(recognition_seq)
+                           for _, restriction_enzyme, recognition_seq in recognitions}
+    cut_sites = {}
+    for start, _, restriction_enzyme in sorted(site for sites in chunk_sites for site in sites):
+        # Recognition sequences longer than a circular sequence cannot span its origin
+        if start not in cut_sites and recognition_lengths[restriction_enzyme] <= n:
+            cut_sites[start] = restriction_enzyme
+    return cut_sites
+
+
+def scan_motif_positions(
+    sequence: str,
+    motif: str,
+    circular: bool = False,
+    processes: Optional[int] = None,
+    chunk_size: int = 1000000,
+) -> np.ndarray:
+    """
+    The parallel form of util_functions.find_motif_positions, chunked and shared as in
+    scan_cut_sites.
+
+    Returns:
+    - np.ndarray: The sorted start index of every occurrence.
+    """
+    validate_chunk_size(chunk_size)
+    motif = motif.upper()
+    if processes == 1 or len(sequence) <= chunk_size or len(motif) > len(sequence):
+        return find_motif_positions(sequence, motif, circular)
+    chunk_starts = _scan_shared(sequence, circular, len(motif) - 1, chunk_size, processes,
+                                _scan_motif_chunk, motif)
+    return np.concatenate(chunk_starts)
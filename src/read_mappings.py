@@ -0,0 +1,407 @@
+from collections import Counter
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from src.double_stranded_nucleic_acids import DoubleStrandNucleicAcidSequence
+from src.kmer_spectra import kmer_hashes
+from src.nucleic_acids import reverse_complement_sequence
+from src.single_stranded_nucleic_acids import SingleStrandNucleicAcidSequence
+from src.util_classes import StrandDirections
+from src.util_functions import imap_windows, validate_chunk_size
+
+
+# Cost above any alignment, for cells outside of the band
+_unreachable = np.iinfo(np.int32).max // 2
+# Traceback moves: read and construct base aligned, read base inserted, construct base deleted
+_aligned, _inserted, _deleted = 0, 1, 2
+# Most alignment cells of a group of reads aligned together
+_max_group_cells = 1 << 24
+
+
+class Variant(NamedTuple):
+    """
+    A difference between a read and its construct, in forward strand coordinates of the
+    construct. Insertions are placed before position, observed bases are read along the forward
+    strand whatever the strand of the read.
+    """
+    position: int
+    kind: str
+    reference: str
+    observed: str
+    annotations: Tuple[str, ...]
+    quality: Optional[int] = None
+
+
+class ReadMapping(NamedTuple):
+    read_name: str
+    construct_id: Optional[str]
+    strand: int = 0
+    start: int = -1
+    end: int = -1
+    edit_distance: int = -1
+    identity: float = 0.0
+    variants: Tuple[Variant, ...] = ()
+    ambiguous: bool = False
+
+
+class ConstructIndex:
+    """
+    K-mer index of the forward strands of expected constructs, which reads are mapped against.
+    Only k-mers starting every stride bases are indexed, reads are looked up with all of theirs,
+    and k-mers occurring more than max_occurrences times, such as those of a backbone shared by
+    a whole library, are dropped as they cannot tell constructs apart.
+
+    Parameters:
+    - constructs (iterable): DoubleStrandNucleicAcidSequence objects or forward
+        SingleStrandNucleicAcidSequence objects.
+    - k (int): The k-mer length.
+    - stride (int): Distance between indexed k-mers.
+    - max_occurrences (int): The most places a k-mer is indexed at.
+    """
+
+    def __init__(
+        self,
+        constructs: Iterable,
+        k: int = 15,
+        stride: int = 4,
+        max_occurrences: int = 64,
+    ):
+        if not isinstance(stride, int) or stride < 1:
+            raise ValueError("Stride must be a positive integer.")
+        if not isinstance(max_occurrences, int) or max_occurrences < 1:
+            raise ValueError("Maximum occurrences must be a positive integer.")
+        self.k = k
+        self.ids: List[str] = []
+        self._sequences: List[np.ndarray] = []
+        self._circular: List[bool] = []
+        self._annotations: List[List[Tuple[int, int, str]]] = []
+        all_hashes, all_constructs, all_positions = [], [], []
+        for construct in constructs:
+            forward_strand, annotations = self._construct_features(construct)
+            sequence = forward_strand.sequence.upper()
+            starts, hashes = kmer_hashes(sequence, k, circular=forward_strand.circular)
+            sampled = starts % stride == 0
+            all_hashes.append(hashes[sampled])
+            all_positions.append(starts[sampled])
+            all_constructs.append(np.full(int(sampled.sum()), len(self.ids), dtype=np.int32))
+            self.ids.append(construct.id)
+            self._sequences.append(np.frombuffer(sequence.encode("ascii"), dtype=np.uint8))
+            self._circular.append(forward_strand.circular)
+            self._annotations.append(annotations)
+        hashes = np.concatenate(all_hashes) if all_hashes else np.zeros(0, dtype=np.uint64)
+        order = np.argsort(hashes, kind="stable")
+        hashes = hashes[order]
+        _, counts = np.unique(hashes, return_counts=True)
+        kept = np.repeat(counts <= max_occurrences, counts)
+        self._hashes = hashes[kept]
+        self._constructs = np.concatenate(all_constructs)[order][kept] if all_constructs else np.zeros(0, dtype=np.int32)
+        self._positions = np.concatenate(all_positions)[order][kept] if all_positions else np.zeros(0, dtype=np.int64)
+
+    def __repr__(self) -> str:
+        return f"ConstructIndex(constructs={len(self.ids)}, k={self.k}, kmers={self._hashes.size})"
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @staticmethod
+    def _construct_features(construct) -> Tuple[SingleStrandNucleicAcidSequence, List[Tuple[int, int, str]]]:
+        # The forward strand and every annotation as (start, end, name) in its coordinates
+        if isinstance(construct, DoubleStrandNucleicAcidSequence):
+            forward_strand = construct.forward_sequence
+            offset = construct.reverse_sequence_start or 0
+            annotations = [(annotation.start, annotation.end, annotation.name)
+                           for annotation in forward_strand.annotations.values()]
+            annotations += [(annotation.start + offset, annotation.end + offset, annotation.name)
+                            for annotation in construct.reverse_sequence.annotations.values()]
+            return forward_strand, annotations
+        if isinstance(construct, SingleStrandNucleicAcidSequence) and \
+                construct.strand_direction == StrandDirections.FWD_STRAND.value:
+            return construct, [(annotation.start, annotation.end, annotation.name)
+                               for annotation in construct.annotations.values()]
+        raise ValueError("Constructs must be DoubleStrandNucleicAcidSequence or forward "
+                         "SingleStrandNucleicAcidSequence objects.")
+
+    def _seed_hits(self, sequence: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # (construct, diagonal, read position) of every k-mer of the read found in the index
+        read_starts, read_hashes = kmer_hashes(sequence, self.k)
+        low = np.searchsorted(self._hashes, read_hashes, side="left")
+        counts = np.searchsorted(self._hashes, read_hashes, side="right") - low
+        total = int(counts.sum())
+        hit_reads = np.repeat(np.arange(read_hashes.size), counts)
+        hits = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts) + np.repeat(low, counts)
+        read_positions = read_starts[hit_reads]
+        return self._constructs[hits], self._positions[hits] - read_positions, read_positions
+
+    def _annotations_at(self, construct: int, start: int, end: int) -> Tuple[str, ...]:
+        # Names of the annotations overlapping the bases start to end, end inclusive
+        names = []
+        for annotation_start, annotation_end, name in self._annotations[construct]:
+            if annotation_start <= annotation_end:
+                if annotation_start <= end and start <= annotation_end:
+                    names.append(name)
+            elif start <= annotation_end or end >= annotation_start:
+                names.append(name)
+        return tuple(names)
+
+    def _window(self, construct: int, window_start: int, length: int) -> np.ndarray:
+        # Construct bases from window_start on, read around circular constructs and padded with
+        # zeros, which match no base, past the ends of linear ones
+        sequence = self._sequences[construct]
+        positions = np.arange(window_start, window_start + length)
+        if self._circular[construct]:
+            return sequence[positions % sequence.size]
+        window = np.zeros(length, dtype=np.uint8)
+        inside = (positions >= 0) & (positions < sequence.size)
+        window[inside] = sequence[positions[inside]]
+        return window
+
+    def map_read(self, name: str, sequence: str, qualities: Optional[str] = None,
+                 min_seeds: int = 2, band_margin: int = 16) -> ReadMapping:
+        # Maps one read, see map_reads
+        return self.map_batch([(name, sequence, qualities)], min_seeds, band_margin)[0]
+
+    def map_batch(self, reads: List[Tuple[str, str, Optional[str]]], min_seeds: int = 2,
+                  band_margin: int = 16) -> List[ReadMapping]:
+        """
+        Maps a batch of (name, sequence, qualities) reads, see map_reads. Seeds vote for a
+        construct and strand, the construct is then aligned to each read within the band of
+        diagonals its seeds span. Reads of similar length are aligned together, so every step of
+        the alignment is one vectorized operation over a whole group of reads.
+        """
+        mappings: List[Optional[ReadMapping]] = [None] * len(reads)
+        placements = []
+        for number, (name, sequence, qualities) in enumerate(reads):
+            placement = self._place(sequence.upper(), qualities, min_seeds, band_margin)
+            if placement is None:
+                mappings[number] = ReadMapping(name, None)
+            else:
+                placements.append((number, placement))
+        # Groups are capped in cells, so long reads with wide bands are aligned a few at a time
+        placements.sort(key=lambda item: len(item[1][2]))
+        group, band = [], 0
+        for item in placements + [None]:
+            if item is not None:
+                band = max(band, item[1][5])
+            if group and (item is None or (len(group) + 1) * (len(item[1][2]) + 1) * (band + 1) > _max_group_cells):
+                for (number, placement), mapping in zip(group, self._align_group([placement for _, placement in group])):
+                    strand, ambiguous = placement[0], placement[6]
+                    mappings[number] = mapping._replace(read_name=reads[number][0], strand=strand, ambiguous=ambiguous)
+                group, band = [], item[1][5] if item is not None else 0
+            if item is not None:
+                group.append(item)
+        return mappings
+
+    def _place(self, sequence: str, qualities: Optional[str], min_seeds: int, band_margin: int):
+        # (strand, construct, read sequence and qualities along the construct, window start, band,
+        # ambiguous) of the construct and strand with the most seeds, None if too few
+        best, runner_up = None, 0
+        for strand, read_sequence in ((1, sequence), (-1, reverse_complement_sequence(sequence))):
+            constructs, diagonals, _ = self._seed_hits(read_sequence)
+            if not constructs.size:
+                continue
+            votes = np.bincount(constructs)
+            for construct in np.argsort(votes)[::-1][:2]:
+                candidate = (int(votes[construct]), strand, int(construct), read_sequence,
+                             diagonals[constructs == construct])
+                if best is None or candidate[0] > best[0]:
+                    best, runner_up = candidate, (best[0] if best else 0)
+                elif candidate[0] > runner_up:
+                    runner_up = candidate[0]
+        if best is None or best[0] < min_seeds:
+            return None
+        seeds, strand, construct, read_sequence, diagonals = best
+        if qualities is not None and strand == -1:
+            qualities = qualities[::-1]
+        n = self._sequences[construct].size
+        median = int(np.median(diagonals))
+        if self._circular[construct]:
+            # Reads across the origin have diagonals n apart
+            diagonals = (diagonals - median + n // 2) % n - n // 2 + median
+        # Seeds far off the median diagonal are repeats, those within reach are indels drifting
+        reach = len(read_sequence) // 4 + band_margin
+        diagonals = diagonals[np.abs(diagonals - median) <= reach]
+        window_start = int(diagonals.min()) - band_margin
+        band = int(diagonals.max()) + band_margin - window_start
+        return strand, construct, read_sequence, qualities, window_start, band, runner_up == seeds
+
+    def _align_group(self, placements: list) -> List[ReadMapping]:
+        # Banded semi-global alignment, the whole read against any stretch of the construct, cost
+        # one per edit. Cells are (read base i, diagonal t), t being the construct base j minus i,
+        # so each row is one vectorized step over every read of the group and the whole band:
+        # aligned and inserted moves come from the row above and deleted moves along the row,
+        # which is a running minimum. The group shares the widest band.
+        lengths = [len(read_sequence) for _, _, read_sequence, _, _, _, _ in placements]
+        m = max(lengths)
+        band = max(placement[5] for placement in placements)
+        reads = np.ones((len(placements), m), dtype=np.uint8)
+        windows = np.empty((len(placements), m + band), dtype=np.uint8)
+        for row, (_, construct, read_sequence, _, window_start, _, _) in enumerate(placements):
+            reads[row, :len(read_sequence)] = np.frombuffer(read_sequence.encode("ascii"), dtype=np.uint8)
+            windows[row] = self._window(construct, window_start, m + band)
+        offsets = np.arange(band + 1, dtype=np.int32)
+        mismatches = np.lib.stride_tricks.sliding_window_view(windows, band + 1, axis=1)[:, :m] != reads[:, :, None]
+        insertions = np.zeros((len(placements), m + 1, band + 1), dtype=bool)
+        deletions = np.zeros((len(placements), m + 1, band + 1), dtype=bool)
+        costs = np.zeros((len(placements), band + 1), dtype=np.int32)
+        inserted = np.full((len(placements), band + 1), _unreachable, dtype=np.int32)
+        final_costs = np.zeros((len(placements), band + 1), dtype=np.int32)
+        ends = {}
+        for row, length in enumerate(lengths):
+            ends.setdefault(length, []).append(row)
+        for i in range(1, m + 1):
+            aligned = costs + mismatches[:, i - 1]
+            np.add(costs[:, 1:], 1, out=inserted[:, :-1])
+            best = np.minimum(aligned, inserted)
+            costs = np.minimum.accumulate(best - offsets, axis=1) + offsets
+            np.less(inserted, aligned, out=insertions[:, i])
+            np.less(costs, best, out=deletions[:, i])
+            if i in ends:
+                final_costs[ends[i]] = costs[ends[i]]
+        mappings = []
+        for row, (_, construct, read_sequence, qualities, window_start, _, _) in enumerate(placements):
+            moves = insertions[row].astype(np.uint8)
+            moves[deletions[row]] = _deleted
+            t = int(np.argmin(final_costs[row]))
+            mappings.append(self._traceback(construct, read_sequence, qualities, windows[row], window_start,
+                                            moves, t, int(final_costs[row, t])))
+        return mappings
+
+    def _traceback(self, construct: int, read_sequence: str, qualities: Optional[str], window: np.ndarray,
+                   window_start: int, moves: np.ndarray, t: int, edit_distance: int) -> ReadMapping:
+        n = self._sequences[construct].size
+        circular = self._circular[construct]
+        window_bases = window.tobytes().decode("latin-1")
+        i = len(read_sequence)
+        end = window_start + i + t - 1
+        columns = 0
+        # Each variant as [kind, window index, reference, observed, read indexes], built backwards
+        variants = []
+        while i > 0:
+            move = moves[i, t]
+            j = i + t
+            columns += 1
+            if move == _aligned:
+                if window_bases[j - 1] != read_sequence[i - 1]:
+                    variants.append(["mismatch", j - 1, window_bases[j - 1], read_sequence[i - 1], [i - 1]])
+                i -= 1
+            elif move == _inserted:
+                if variants and variants[-1][0] == "insertion" and variants[-1][1] == j:
+                    variants[-1][3] = read_sequence[i - 1] + variants[-1][3]
+                    variants[-1][4].append(i - 1)
+                else:
+                    variants.append(["insertion", j, "", read_sequence[i - 1], [i - 1]])
+                i -= 1
+                t += 1
+            else:
+                if variants and variants[-1][0] == "deletion" and variants[-1][1] == j:
+                    variants[-1][1] = j - 1
+                    variants[-1][2] = window_bases[j - 1] + variants[-1][2]
+                else:
+                    variants.append(["deletion", j - 1, window_bases[j - 1], "", []])
+                t -= 1
+        start = window_start + t
+        found = []
+        for kind, window_index, reference, observed, read_indexes in reversed(variants):
+            position = window_start + window_index
+            if not circular and not 0 <= position < n + (kind == "insertion"):
+                # Read bases past the ends of a linear construct are clipped
+                continue
+            if circular:
+                position %= n
+            last = position + max(len(reference), 1) - 1 if kind != "insertion" else position
+            quality = min(ord(qualities[index]) - 33 for index in read_indexes) \
+                if qualities is not None and read_indexes else None
+            found.append(Variant(position, kind, reference, observed,
+                                 self._annotations_at(construct, position, last % n), quality))
+        if circular:
+            start, end = start % n, end % n
+        else:
+            start, end = max(start, 0), min(end, n - 1)
+        identity = 1 - edit_distance / columns if columns else 0.0
+        return ReadMapping("", self.ids[construct], 0, start, end, edit_distance, identity, tuple(found))
+
+
+def _read_fields(read) -> Tuple[str, str, Optional[str]]:
+    # Reads are FastqRecord or SimulatedRead objects, or (name, sequence) tuples as read_fasta yields
+    return read[0], read[1], read[2] if len(read) > 2 and isinstance(read[2], str) else None
+
+
+# The index of each worker process, set once when the pool starts instead of sent with every task
+_worker_index: Optional[ConstructIndex] = None
+
+
+def _set_worker_index(index: ConstructIndex) -> None:
+    global _worker_index
+    _worker_index = index
+
+
+def _map_chunk(job) -> List[ReadMapping]:
+    reads, min_seeds, band_margin = job
+    return _worker_index.map_batch(reads, min_seeds, band_margin)
+
+
+def map_reads(
+    reads: Iterable,
+    index: ConstructIndex,
+    min_seeds: int = 2,
+    band_margin: int = 16,
+    processes: Optional[int] = 1,
+    chunksize: int = 64,
+) -> Iterator[ReadMapping]:
+    """
+    Maps reads to the constructs of an index to verify clones, e.g. Sanger reads or long reads
+    streamed from sequence_io.read_fastq. Each read and its reverse complement are looked up by
+    k-mer, the construct and strand with the most seeds win and the read is aligned to them with
+    a vectorized banded alignment over the diagonals the seeds span, which follows the indels of
+    long reads. Mismatches and indels are reported in construct coordinates with the annotations
+    they hit.
+
+    Parameters:
+    - reads (iterable): FastqRecord or SimulatedRead objects, or (name, sequence) tuples,
+        consumed lazily.
+    - index (ConstructIndex): The expected constructs.
+    - min_seeds (int): The fewest k-mer seeds a read needs to be mapped.
+    - band_margin (int): Diagonals searched beyond those the seeds span.
+    - processes (int): Number of worker processes, None for one per CPU. Each worker gets the
+        index once.
+    - chunksize (int): Number of reads mapped per task.
+
+    Returns:
+    - generator (ReadMapping): One mapping per read, in the order of reads. Unmapped reads
+        have no construct_id, ambiguous ones had as many seeds on another construct or strand.
+    """
+    validate_chunk_size(chunksize)
+    read_fields = (_read_fields(read) for read in reads)
+    jobs = ((chunk, min_seeds, band_margin) for chunk in iter(lambda: list(islice(read_fields, chunksize)), []))
+    if processes == 1:
+        for reads_chunk, _, _ in jobs:
+            yield from index.map_batch(reads_chunk, min_seeds, band_margin)
+        return
+    # Imported here as only parallel mapping needs it
+    from multiprocessing import Pool
+
+    with Pool(processes, initializer=_set_worker_index, initargs=(index,)) as pool:
+        for mappings in imap_windows(pool, _map_chunk, jobs, processes):
+            yield from mappings
+
+
+def construct_variants(mappings: Iterable[ReadMapping], min_reads: int = 1) -> Dict[str, Counter]:
+    """
+    Tallies the variants of mapped reads per construct, so variants seen in most reads of a clone
+    can be told from sequencing errors seen in one.
+
+    Returns:
+    - dict: A Counter of (position, kind, reference, observed) per construct id, keeping those
+        seen in at least min_reads reads.
+    """
+    tallies: Dict[str, Counter] = {}
+    for mapping in mappings:
+        if mapping.construct_id is None:
+            continue
+        tally = tallies.setdefault(mapping.construct_id, Counter())
+        tally.update({(variant.position, variant.kind, variant.reference, variant.observed)
+                      for variant in mapping.variants})
+    return {construct_id: Counter({variant: count for variant, count in tally.items() if count >= min_reads})
+            for construct_id, tally in tallies.items()}
@@ -0,0 +1,214 @@
+import math
+from itertools import islice
+from multiprocessing import Pool
+from typing import Iterable, Iterator, List, NamedTuple, Optional
+
+import numpy as np
+
+from src.single_stranded_nucleic_acids import SingleStrandNucleicAcidSequence
+from src.util_functions import imap_windows, validate_chunk_size
+
+
+_bases = np.frombuffer(b"ACGT", dtype=np.uint8)
+# Index of each base in _bases, 4 for any other IUPAC code, which is never substituted
+_base_codes = np.full(256, 4, dtype=np.uint8)
+_base_codes[_bases] = np.arange(4, dtype=np.uint8)
+
+
+class SimulatedRead(NamedTuple):
+    name: str
+    sequence: str
+    qualities: str
+    construct_id: str
+    kind: str
+
+
+class ReadModel(NamedTuple):
+    """
+    Parameters of the polymerase and its errors, shared by every ZMW of a simulation.
+    Polymerase read lengths are lognormal with the given mean and shape.
+    """
+    mean_read_length: float = 20000
+    read_length_sigma: float = 0.5
+    substitution_rate: float = 0.01
+    insertion_rate: float = 0.06
+    deletion_rate: float = 0.03
+    min_subread_length: int = 50
+    min_ccs_passes: int = 3
+
+
+def _phred_qualities(error_rate: float, length: int) -> str:
+    quality = 93 if error_rate <= 0 else min(max(round(-10 * math.log10(error_rate)), 1), 93)
+    return chr(quality + 33) * length
+
+
+def _consensus_error_rate(error_rate: float, passes: int) -> float:
+    # A consensus base is wrong when more than half of the independent passes are wrong
+    return sum(math.comb(passes, k) * error_rate ** k * (1 - error_rate) ** (passes - k)
+               for k in range(passes // 2 + 1, passes + 1))
+
+
+def _apply_errors(bases: np.ndarray, rng: np.random.Generator, substitution_rate: float,
+                  insertion_rate: float, deletion_rate: float):
+    # Returns the observed bases and, for every true base index plus the end, its observed index
+    draws = rng.random(bases.size)
+    substituted = draws < substitution_rate
+    inserted = (draws >= substitution_rate) & (draws < substitution_rate + insertion_rate)
+    deleted = ((draws >= substitution_rate + insertion_rate) &
+               (draws < substitution_rate + insertion_rate + deletion_rate))
+    observed = bases.copy()
+    codes = _base_codes[observed]
+    substituted_indexes = np.flatnonzero(substituted & (codes < 4))
+    observed[substituted_indexes] = _bases[
+        (codes[substituted_indexes] + rng.integers(1, 4, substituted_indexes.size)) % 4]
+    counts = np.ones(bases.size, dtype=np.int64)
+    counts[inserted] = 2
+    counts[deleted] = 0
+    positions = np.zeros(bases.size + 1, dtype=np.int64)
+    np.cumsum(counts, out=positions[1:])
+    observed = np.repeat(observed, counts)
+    # The inserted base lands before the true base
+    inserted_indexes = positions[:-1][inserted]
+    observed[inserted_indexes] = _bases[rng.integers(0, 4, inserted_indexes.size)]
+    return observed, positions
+
+
+def _construct_layout(sequence: str, front_adapter_length: int, back_adapter_length: int):
+    # Labels every base of the construct: 0 adapter, 1 insert forward strand, 2 insert reverse strand
+    insert_length, remainder = divmod(len(sequence) - front_adapter_length - back_adapter_length, 2)
+    if insert_length < 1 or remainder:
+        raise ValueError("Construct does not have the SMRTbell layout of the given adapters.")
+    labels = np.zeros(len(sequence), dtype=np.uint8)
+    labels[front_adapter_length:front_adapter_length + insert_length] = 1
+    labels[len(sequence) - insert_length:] = 2
+    return np.frombuffer(sequence.encode("ascii"), dtype=np.uint8), labels, insert_length
+
+
+def _simulate_zmw(rng, zmw, construct_id, encoded, labels, insert_length, model, movie_name, ccs):
+    reads = []
+    n = encoded.size
+    sigma = model.read_length_sigma
+    read_length = max(int(rng.lognormal(math.log(model.mean_read_length) - sigma ** 2 / 2, sigma)), 1)
+    ring_indexes = (rng.integers(n) + np.arange(read_length)) % n
+    true_labels = labels[ring_indexes]
+    observed, positions = _apply_errors(encoded[ring_indexes], rng, model.substitution_rate,
+                                        model.insertion_rate, model.deletion_rate)
+    subread_error_rate = model.substitution_rate + model.insertion_rate + model.deletion_rate
+    bounds = np.concatenate(([0], np.flatnonzero(np.diff(true_labels)) + 1, [read_length])).tolist()
+    full_passes = 0
+    for start, end in zip(bounds[:-1], bounds[1:]):
+        if not true_labels[start]:
+            continue
+        if end - start == insert_length and 0 < start and end < read_length:
+            full_passes += 1
+        query_start, query_end = int(positions[start]), int(positions[end])
+        if query_end - query_start < model.min_subread_length:
+            continue
+        reads.append(SimulatedRead(
+            f"{movie_name}/{zmw}/{query_start}_{query_end}",
+            observed[query_start:query_end].tobytes().decode("ascii"),
+            _phred_qualities(subread_error_rate, query_end - query_start),
+            construct_id,
+            "subread",
+        ))
+    if ccs and full_passes >= model.min_ccs_passes:
+        # The consensus keeps the error profile of the subreads at a lower rate
+        scale = _consensus_error_rate(subread_error_rate, full_passes) / subread_error_rate if subread_error_rate else 0
+        insert_bases = encoded[labels == 1]
+        consensus, _ = _apply_errors(insert_bases, rng, model.substitution_rate * scale,
+                                     model.insertion_rate * scale, model.deletion_rate * scale)
+        reads.append(SimulatedRead(
+            f"{movie_name}/{zmw}/ccs",
+            consensus.tobytes().decode("ascii"),
+            _phred_qualities(subread_error_rate * scale, consensus.size),
+            construct_id,
+            "ccs",
+        ))
+    return reads
+
+
+def _simulate_chunk(job) -> List[SimulatedRead]:
+    first_zmw, constructs, seed_sequence, adapter_lengths, zmws_per_construct, model, movie_name, ccs = job
+    rng = np.random.Generator(np.random.PCG64(seed_sequence))
+    reads = []
+    zmw = first_zmw
+    for construct_id, sequence in constructs:
+        encoded, labels, insert_length = _construct_layout(sequence, *adapter_lengths)
+        for _ in range(zmws_per_construct):
+            reads += _simulate_zmw(rng, zmw, construct_id, encoded, labels, insert_length, model, movie_name, ccs)
+            zmw += 1
+    return reads
+
+
+def _chunk_jobs(constructs, chunksize, seed_sequence, adapter_lengths, zmws_per_construct, model, movie_name, ccs):
+    constructs = iter(constructs)
+    first_zmw = 0
+    while True:
+        chunk = []
+        for construct in islice(constructs, chunksize):
+            if not isinstance(construct, SingleStrandNucleicAcidSequence) or not construct.circular:
+                raise ValueError("Reads can only be simulated from circular SingleStrandNucleicAcidSequence "
+                                 "SMRTbell constructs.")
+            chunk.append((construct.id, construct.sequence))
+        if not chunk:
+            return
+        # One child seed per chunk, so the reads never depend on how chunks are spread over workers
+        yield (first_zmw, chunk, seed_sequence.spawn(1)[0], adapter_lengths, zmws_per_construct, model,
+               movie_name, ccs)
+        first_zmw += len(chunk) * zmws_per_construct
+
+
+def simulate_reads(
+    constructs: Iterable[SingleStrandNucleicAcidSequence],
+    front_adapter_seq: str,
+    back_adapter_seq: str,
+    model: ReadModel = ReadModel(),
+    zmws_per_construct: int = 1,
+    ccs: bool = False,
+    seed: Optional[int] = None,
+    movie_name: str = "m00000_000000_000000",
+    processes: Optional[int] = 1,
+    chunksize: int = 256,
+) -> Iterator[SimulatedRead]:
+    """
+    Simulates PacBio reads from circular SMRTbell constructs, such as those built by
+    smrtbell_library_preps.smrtbell_constructs. In every ZMW a polymerase starts at a random
+    base and walks the construct for a lognormal read length. The polymerase read is split at the
+    adapters into subreads, which carry the errors of ReadModel. Reads are streamed in the order
+    of the constructs and are the same for the same seed and chunksize, whatever the number of
+    processes.
+
+    Parameters:
+    - constructs (iterable): Circular SingleStrandNucleicAcidSequence objects, consumed lazily.
+    - front_adapter_seq (str): The sequence of the front adapter the constructs were built with.
+    - back_adapter_seq (str): The sequence of the back adapter the constructs were built with.
+    - model (ReadModel): Read length distribution and per base error rates.
+    - zmws_per_construct (int): Number of ZMWs, and so polymerase reads, per construct.
+    - ccs (bool): If True, a CCS read is also made for every ZMW with at least model.min_ccs_passes
+        full passes. Its error rate is that of a majority vote over the passes.
+    - seed (int): Seed of the simulation, a random one is used if None.
+    - movie_name (str): Prefix of the read names, which follow {movie}/{zmw}/{start}_{end} or
+        {movie}/{zmw}/ccs.
+    - processes (int): Number of worker processes, None for one per CPU.
+    - chunksize (int): Number of constructs simulated per task, each task has its own seed.
+
+    Returns:
+    - generator (SimulatedRead): The name, sequence, qualities, construct id and kind of each read.
+    """
+    if not isinstance(zmws_per_construct, int) or zmws_per_construct < 1:
+        raise ValueError("ZMWs per construct must be a positive integer.")
+    validate_chunk_size(chunksize)
+    if model.substitution_rate + model.insertion_rate + model.deletion_rate >= 1:
+        raise ValueError("The error rates must add up to less than 1.")
+    if model.mean_read_length <= 0:
+        raise ValueError("The mean read length must be positive.")
+    jobs = _chunk_jobs(constructs, chunksize, np.random.SeedSequence(seed),
+                       (len(front_adapter_seq), len(back_adapter_seq)), zmws_per_construct, model, movie_name, ccs)
+    if processes == 1:
+        for job in jobs:
+            yield from _simulate_chunk(job)
+        return
+    # Jobs are handed to the pool a window at a time, so constructs are only read as needed
+    with Pool(processes) as pool:
+        for reads in imap_windows(pool, _simulate_chunk, jobs, processes):
+            yield from reads
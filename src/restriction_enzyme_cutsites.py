@@ -1,3 +1,5 @@
+import copy
+
 from src.nucleic_acids import complement_sequence
 from src.util_classes import StrandDirections
 
@@ -19,6 +21,9 @@ restriction_enzyme_types = {
     "SphI": {"recognition_sequence": "GCATGC", "cut_position": 5}  # Cuts after the G
 }
 
+max_recognition_sequence_length = max(
+    len(data["recognition_sequence"]) for data in restriction_enzyme_types.values())
+
 
 class RestrictionEnzymeCutSite:
 
@@ -35,6 +40,10 @@ class RestrictionEnzymeCutSite:
             self._cut_position = self._start + cut_site_data["cut_position"] - 1
         else:
             self._cut_position = self._end - cut_site_data["cut_position"]
+        if parent_ss_nucleic_acid.circular:
+            # Sites spanning the origin of circular sequences end before they start
+            self._end %= len(parent_ss_nucleic_acid)
+            self._cut_position %= len(parent_ss_nucleic_acid)
 
     def __repr__(self):
         return (f"RestrictionEnzymeCutSite(start='{self.start}, end='{self.end}', "
@@ -66,6 +75,22 @@ class RestrictionEnzymeCutSite:
     def restriction_enzyme(self):
         return self._restriction_enzyme
 
+    def _moved(self, offset):
+        # Copy shifted by offset bases, used by the parent strand when its sequence is edited
+        moved_cut_site = copy.copy(self)
+        moved_cut_site._start += offset
+        moved_cut_site._end += offset
+        moved_cut_site._cut_position += offset
+        return moved_cut_site
+
+    def _reparented(self, parent_id):
+        # Copy belonging to another strand, used when a copied strand takes its own features
+        if parent_id == self._parent_nucleic_acid_sequence_id:
+            return self
+        reparented_cut_site = copy.copy(self)
+        reparented_cut_site._parent_nucleic_acid_sequence_id = parent_id
+        return reparented_cut_site
+
     def validate_restriction_site(self, parent_ss_nucleic_acid, start, restriction_enzyme_type):
         if not isinstance(start, int):
             raise TypeError("Cannot add restriction site, start must be an integer.")
@@ -76,7 +101,10 @@ class RestrictionEnzymeCutSite:
                              f"Options are {restriction_enzyme_types.keys()}")
         cut_site_data = restriction_enzyme_types[restriction_enzyme_type]
         exp_cut_site_sequence = cut_site_data["recognition_sequence"]
-        found_cut_site_sequence = parent_ss_nucleic_acid.sequence[start:start + len(exp_cut_site_sequence)]
+        end = start + len(exp_cut_site_sequence)
+        found_cut_site_sequence = parent_ss_nucleic_acid.subsequence(start, end)
+        if parent_ss_nucleic_acid.circular and end > len(parent_ss_nucleic_acid):
+            found_cut_site_sequence += parent_ss_nucleic_acid.subsequence(0, end - len(parent_ss_nucleic_acid))
         if parent_ss_nucleic_acid.strand_direction == StrandDirections.REV_STRAND.value:
             exp_cut_site_sequence = complement_sequence(exp_cut_site_sequence)
         if found_cut_site_sequence != exp_cut_site_sequence:
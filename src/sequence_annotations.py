@@ -1,3 +1,6 @@
+import copy
+
+
 class SequenceAnnotation:
 
   def __init__(self, parent_ss_nucleic_acid, name, start, end, note=""):
@@ -34,6 +37,21 @@ class SequenceAnnotation:
   def note(self):
     return self._note
 
+  def _moved(self, start, end):
+    # Copy at new coordinates, used by the parent strand when its sequence is edited
+    moved_annot = copy.copy(self)
+    moved_annot._start = start
+    moved_annot._end = end
+    return moved_annot
+
+  def _reparented(self, parent_id):
+    # Copy belonging to another strand, used when a copied strand takes its own features
+    if parent_id == self._parent_ss_nucleic_acid_id:
+      return self
+    reparented_annot = copy.copy(self)
+    reparented_annot._parent_ss_nucleic_acid_id = parent_id
+    return reparented_annot
+
   def validate_annotation(self, parent_ss_nucleic_acid, name, start, end,
                           note):
     if not isinstance(name, str):
@@ -44,9 +62,14 @@ class SequenceAnnotation:
       raise TypeError("Cannot add annotation, end must be an integer.")
     if not isinstance(note, str):
       raise TypeError("Cannot add annotation, note must be a string.")
-    if (start == end) or (start < 0) or (end <= 0) or (
-        start >= len(parent_ss_nucleic_acid.sequence) - 1) or (
-            end > len(parent_ss_nucleic_acid.sequence) - 1):
+    # On circular sequences an annotation may start on the last base or end on
+    # the first, wrapping around the origin, as rotated annotations do
+    last_index = len(parent_ss_nucleic_acid) - 1
+    if parent_ss_nucleic_acid.circular:
+      out_of_bounds = not (0 <= start <= last_index and 0 <= end <= last_index)
+    else:
+      out_of_bounds = start < 0 or end <= 0 or start >= last_index or end > last_index
+    if start == end or out_of_bounds:
       raise ValueError(
           "Cannot add annotation, start and end must be within index bounds of the "
           "parent nucleic acid sequence.")
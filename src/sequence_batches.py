@@ -0,0 +1,210 @@
+import re
+from bisect import bisect_right
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.restriction_enzyme_cutsites import (
+    max_recognition_sequence_length,
+    restriction_enzyme_types,
+    RestrictionEnzymeCutSite,
+)
+from src.sequence_registry import _bulk_ids
+from src.single_stranded_nucleic_acids import SingleStrandNucleicAcidSequence
+from src.util_classes import IUPACCodes, NucleicAcidTypes, StrandDirections
+
+
+# Never a valid base, so no recognition sequence can match across two joined sequences
+_separator = "|"
+
+_valid_bytes = np.zeros(256, dtype=bool)
+_valid_bytes[[ord(code) for code in IUPACCodes.list_names()]] = True
+_valid_bytes[ord(_separator)] = True
+
+
+def _joined_sequences(sequences: Iterable[str]) -> Tuple[str, np.ndarray, np.ndarray]:
+    sequences = list(sequences)
+    if not sequences:
+        raise ValueError("Cannot make sequences from an empty collection.")
+    lengths = np.fromiter((len(sequence) for sequence in sequences), dtype=np.int64, count=len(sequences))
+    if not lengths.all():
+        raise ValueError(f"Cannot make sequence from an empty string, at index {int(np.argmin(lengths))}.")
+    joined = _separator.join(sequences).upper()
+    # Start of each sequence within joined
+    starts = np.zeros(len(sequences), dtype=np.int64)
+    np.cumsum(lengths[:-1] + 1, out=starts[1:])
+    return joined, starts, lengths
+
+
+def _index_at(starts: np.ndarray, position: int) -> int:
+    return int(np.searchsorted(starts, position, side="right")) - 1
+
+
+def _validate_joined_sequences(joined: str, starts: np.ndarray, nucleic_acid_type: str) -> None:
+    try:
+        encoded = np.frombuffer(joined.encode("ascii"), dtype=np.uint8)
+    except UnicodeEncodeError:
+        encoded = np.frombuffer(joined.encode("ascii", errors="replace"), dtype=np.uint8)
+        invalid = np.flatnonzero(~_valid_bytes[encoded] | (encoded == ord("?")))
+    else:
+        invalid = np.flatnonzero(~_valid_bytes[encoded])
+    separators = np.flatnonzero(encoded == ord(_separator))
+    if separators.size != starts.size - 1:
+        # A separator inside one of the sequences
+        invalid = np.union1d(invalid, np.setdiff1d(separators, starts[1:] - 1)[:1])
+    if invalid.size:
+        index = _index_at(starts, int(invalid[0]))
+        raise ValueError(f"Cannot make sequence, invalid nucleotide found in sequence at index {index}: "
+                         f"{joined[starts[index]:].split(_separator, 1)[0]}")
+    forbidden = {NucleicAcidTypes.DNA.value: "U", NucleicAcidTypes.RNA.value: "T"}.get(nucleic_acid_type)
+    if forbidden:
+        position = np.flatnonzero(encoded == ord(forbidden))
+        if position.size:
+            raise ValueError(f"Cannot be nucleic acid type {nucleic_acid_type} when {forbidden} in sequence, "
+                             f"at index {_index_at(starts, int(position[0]))}.")
+
+
+def _scan_joined_cut_sites(
+    joined: str,
+    starts: np.ndarray,
+    strand_direction: str,
+    lengths: Optional[np.ndarray] = None,
+) -> Iterator[Tuple[int, int, str]]:
+    # Same matching as SingleStrandNucleicAcidSequence._add_all_cut_sites, once for all sequences.
+    # With lengths, the sequences are circular and sites spanning their origins are found too.
+    starts = starts.tolist()
+    junctions = []
+    if lengths is not None:
+        # Last and first bases of each sequence, the only place a site can span the origin
+        for index, (start, length) in enumerate(zip(starts, lengths.tolist())):
+            junction_start = max(length - max_recognition_sequence_length + 1, 0)
+            junctions.append((index, length, junction_start,
+                              joined[start + junction_start:start + length] +
+                              joined[start:start + min(length, max_recognition_sequence_length - 1)]))
+    for restriction_enzyme, data in restriction_enzyme_types.items():
+        recognition_seq = SingleStrandNucleicAcidSequence._recognition_sequence(data, strand_direction)
+        for match in re.finditer(f"(?={recognition_seq})", joined):
+            index = bisect_right(starts, match.start()) - 1
+            yield index, match.start() - starts[index], restriction_enzyme
+        for index, length, junction_start, junction in junctions:
+            if len(recognition_seq) > length:
+                continue
+            for match in re.finditer(f"(?={recognition_seq})", junction):
+                start = junction_start + match.start()
+                if start < length < start + len(recognition_seq):
+                    yield index, start, restriction_enzyme
+
+
+class SequenceBatch:
+    """
+    Compact collection of many single strands sharing nucleic acid type, topology and strand
+    direction. The sequences are validated together and stored as one joined string with
+    offsets, strand objects are only built when asked for.
+    """
+
+    def __init__(
+        self,
+        sequences: Iterable[str],
+        nucleic_acid_type: Optional[str] = NucleicAcidTypes.DNA.value,
+        circular: Optional[bool] = False,
+        strand_direction: Optional[str] = StrandDirections.FWD_STRAND.value,
+        note: Optional[str] = "",
+    ):
+        SingleStrandNucleicAcidSequence.validate_nucleic_acid_type(nucleic_acid_type)
+        SingleStrandNucleicAcidSequence.validate_circular(circular)
+        if strand_direction not in StrandDirections.list_values():
+            raise ValueError(
+                f"Invalid strand direction: {strand_direction}. "
+                f"Options are {StrandDirections.list_values()}")
+        if not isinstance(note, str):
+            raise TypeError("Note must be a string.")
+
+        self._joined, self._starts, self._lengths = _joined_sequences(sequences)
+        _validate_joined_sequences(self._joined, self._starts, nucleic_acid_type)
+        self._ids = _bulk_ids(len(self))
+        self._nucleic_acid_type = nucleic_acid_type
+        self._circular = circular
+        self._strand_direction = strand_direction
+        self._note = note
+        self._cut_sites = None
+
+    def __repr__(self):
+        return (f"SequenceBatch(size={len(self)}, nucleic_acid_type='{self._nucleic_acid_type}', "
+                f"circular={self._circular}, strand_direction='{self._strand_direction}')")
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def __getitem__(self, index: int) -> str:
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("Sequence index out of range.")
+        start = int(self._starts[index])
+        return self._joined[start:start + int(self._lengths[index])]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._joined.split(_separator))
+
+    @property
+    def ids(self) -> List[str]:
+        return list(self._ids)
+
+    @property
+    def lengths(self) -> np.ndarray:
+        return self._lengths.copy()
+
+    def cut_sites(self) -> List[List[Tuple[int, str]]]:
+        """
+        Finds the cut sites of all sequences in one scan over the joined sequences.
+
+        Returns:
+        - list (list of tuples): The (start, restriction enzyme) pairs of each sequence.
+        """
+        if self._cut_sites is None:
+            self._cut_sites = [[] for _ in range(len(self))]
+            for index, start, restriction_enzyme in _scan_joined_cut_sites(
+                    self._joined, self._starts, self._strand_direction,
+                    self._lengths if self._circular else None):
+                self._cut_sites[index].append((start, restriction_enzyme))
+        return self._cut_sites
+
+    def strand(self, index: int, scan_cut_sites: bool = True) -> SingleStrandNucleicAcidSequence:
+        sequence = self[index]
+        if index < 0:
+            index += len(self)
+        strand = SingleStrandNucleicAcidSequence._restore(
+            self._ids[index], sequence, self._nucleic_acid_type, self._circular, self._strand_direction, self._note)
+        if scan_cut_sites:
+            for start, restriction_enzyme in self.cut_sites()[index]:
+                # As in _add_all_cut_sites, the first enzyme listed wins a start
+                if start not in strand._cut_sites:
+                    strand._cut_sites[start] = RestrictionEnzymeCutSite(strand, start, restriction_enzyme)
+        return strand
+
+    def strands(self, scan_cut_sites: bool = True) -> List[SingleStrandNucleicAcidSequence]:
+        return [self.strand(index, scan_cut_sites) for index in range(len(self))]
+
+
+def make_single_strands(
+    sequences: Sequence[str],
+    nucleic_acid_type: Optional[str] = NucleicAcidTypes.DNA.value,
+    circular: Optional[bool] = False,
+    strand_direction: Optional[str] = StrandDirections.FWD_STRAND.value,
+    note: Optional[str] = "",
+    scan_cut_sites: Optional[bool] = True,
+) -> List[SingleStrandNucleicAcidSequence]:
+    """
+    Builds many SingleStrandNucleicAcidSequence objects at once. All sequences are validated in
+    one vectorized pass and the cut sites of all of them are found in a single scan.
+
+    Parameters:
+    - sequences (list of str): The sequences, upper or lower case.
+    - nucleic_acid_type, circular, strand_direction, note: As for SingleStrandNucleicAcidSequence,
+      shared by all strands.
+    - scan_cut_sites (bool): If False, no cut sites are added. They can be added later per strand.
+
+    Returns:
+    - list (SingleStrandNucleicAcidSequence): The strands, in the order of the sequences.
+    """
+    return SequenceBatch(sequences, nucleic_acid_type, circular, strand_direction, note).strands(scan_cut_sites)
@@ -0,0 +1,302 @@
+from bisect import bisect_right
+from typing import List, Optional, Tuple
+
+
+class SequenceBuffer:
+    """
+    Piece table holding the bases of a strand. Edits only split and splice pieces, which
+    reference immutable strings, and the full sequence string is only built when asked for.
+    Reversing and complementing only flip how the stored pieces are read, and rotating only
+    moves the origin the stored pieces are read from.
+    """
+
+    # Pieces are joined back into one once an edit leaves more than this many
+    max_pieces = 512
+
+    def __init__(self, sequence: str):
+        self._pieces: List[Tuple[str, int, int]] = [(sequence, 0, len(sequence))] if sequence else []
+        self._piece_starts: List[int] = [0] if sequence else []
+        self._length = len(sequence)
+        self._cache = sequence
+        self._reversed = False
+        self._complement_table = None
+        # Stored index of the first base, before reversing
+        self._origin = 0
+        self._version = 0
+
+    def __len__(self) -> int:
+        return self._length
+
+    @property
+    def version(self) -> int:
+        # Increases whenever the sequence read from the buffer changes
+        return self._version
+
+    def __str__(self) -> str:
+        if self._cache is None:
+            self._bake_origin()
+            stored_sequence = "".join(source[start:end] for source, start, end in self._pieces)
+            self._pieces = [(stored_sequence, 0, self._length)] if self._length else []
+            self._piece_starts = [0] if self._length else []
+            self._cache = self._read(stored_sequence)
+        return self._cache
+
+    def __repr__(self) -> str:
+        return (f"SequenceBuffer(length={self._length}, pieces={len(self._pieces)}, origin={self._origin}, "
+                f"reversed={self._reversed}, complemented={self._complement_table is not None})")
+
+    def copy(self) -> "SequenceBuffer":
+        # Independent buffer in O(number of pieces), the pieces reference the same strings
+        buffer = SequenceBuffer.__new__(SequenceBuffer)
+        buffer.__dict__.update(self.__dict__)
+        buffer._pieces = list(self._pieces)
+        buffer._piece_starts = list(self._piece_starts)
+        return buffer
+
+    def reverse(self) -> None:
+        self._reversed = not self._reversed
+        self._cache = None
+        self._version += 1
+
+    def complement(self, complement_table: dict) -> None:
+        # complement_table is a str.translate table, complementing twice restores the sequence
+        self._complement_table = None if self._complement_table else complement_table
+        self._cache = None
+        self._version += 1
+
+    def rotate(self, offset: int) -> None:
+        # The base at offset becomes the first base, the sequence is read as a ring
+        if not self._length:
+            return
+        if self._reversed:
+            offset = -offset
+        self._origin = (self._origin + offset) % self._length
+        self._cache = None
+        self._version += 1
+
+    def slice(self, start: int, end: int) -> str:
+        start = max(start, 0)
+        end = min(end, self._length)
+        if start >= end:
+            return ""
+        if self._cache is not None:
+            return self._cache[start:end]
+        if self._reversed:
+            start, end = self._length - end, self._length - start
+        start += self._origin
+        end += self._origin
+        if end <= self._length:
+            return self._read(self._stored_slice(start, end))
+        if start >= self._length:
+            return self._read(self._stored_slice(start - self._length, end - self._length))
+        return self._read(self._stored_slice(start, self._length) + self._stored_slice(0, end - self._length))
+
+    def _stored_slice(self, start: int, end: int) -> str:
+        index = bisect_right(self._piece_starts, start) - 1
+        parts = []
+        while index < len(self._pieces) and self._piece_starts[index] < end:
+            source, piece_start, piece_end = self._pieces[index]
+            offset = self._piece_starts[index]
+            parts.append(source[piece_start + max(start - offset, 0):piece_start + min(end - offset, piece_end - piece_start)])
+            index += 1
+        return "".join(parts)
+
+    def insert(self, position: int, sequence: str) -> None:
+        self._validate_position(position, allow_end=True)
+        if not sequence:
+            return
+        self._bake_origin()
+        if self._reversed:
+            position = self._length - position
+        index = self._split(position)
+        sequence = self._read(sequence)
+        self._pieces.insert(index, (sequence, 0, len(sequence)))
+        self._length += len(sequence)
+        self._edited(index)
+
+    def delete(self, position: int, length: int) -> None:
+        self._validate_range(position, length)
+        if length == 0:
+            return
+        self._bake_origin()
+        if self._reversed:
+            position = self._length - position - length
+        start_index = self._split(position)
+        end_index = self._split(position + length)
+        del self._pieces[start_index:end_index]
+        self._length -= length
+        self._edited(start_index)
+
+    def substitute(self, position: int, sequence: str) -> None:
+        self._validate_range(position, len(sequence))
+        if not sequence:
+            return
+        self._bake_origin()
+        if self._reversed:
+            position = self._length - position - len(sequence)
+        start_index = self._split(position)
+        end_index = self._split(position + len(sequence))
+        sequence = self._read(sequence)
+        self._pieces[start_index:end_index] = [(sequence, 0, len(sequence))]
+        self._edited(start_index)
+
+    def _bake_origin(self) -> None:
+        # Reorders the pieces so they start at the origin, the sequence read is unchanged
+        if not self._origin:
+            return
+        index = self._split(self._origin)
+        self._pieces = self._pieces[index:] + self._pieces[:index]
+        self._origin = 0
+        self._piece_starts = []
+        offset = 0
+        for source, piece_start, piece_end in self._pieces:
+            self._piece_starts.append(offset)
+            offset += piece_end - piece_start
+
+    def _read(self, sequence: str) -> str:
+        # Converts between stored and read orientation, the conversion is its own inverse
+        if self._reversed:
+            sequence = sequence[::-1]
+        if self._complement_table:
+            sequence = sequence.translate(self._complement_table)
+        return sequence
+
+    def _split(self, position: int) -> int:
+        # Makes sure a piece starts at position and returns its index
+        if position == self._length:
+            return len(self._pieces)
+        index = bisect_right(self._piece_starts, position) - 1
+        offset = position - self._piece_starts[index]
+        if offset == 0:
+            return index
+        source, piece_start, piece_end = self._pieces[index]
+        self._pieces[index:index + 1] = [(source, piece_start, piece_start + offset),
+                                         (source, piece_start + offset, piece_end)]
+        self._piece_starts.insert(index + 1, position)
+        return index + 1
+
+    def _edited(self, first_changed_index: int) -> None:
+        self._cache = None
+        self._version += 1
+        if len(self._pieces) > self.max_pieces:
+            str(self)
+            return
+        del self._piece_starts[first_changed_index:]
+        offset = 0
+        if first_changed_index:
+            source, piece_start, piece_end = self._pieces[first_changed_index - 1]
+            offset = self._piece_starts[first_changed_index - 1] + piece_end - piece_start
+        for source, piece_start, piece_end in self._pieces[first_changed_index:]:
+            self._piece_starts.append(offset)
+            offset += piece_end - piece_start
+
+    def _validate_position(self, position: int, allow_end: bool = False) -> None:
+        if not isinstance(position, int):
+            raise TypeError("Position must be an integer.")
+        upper_bound = self._length if allow_end else self._length - 1
+        if position < 0 or position > upper_bound:
+            raise ValueError(f"Position {position} is outside of the sequence bounds.")
+
+    def _validate_range(self, position: int, length: int) -> None:
+        self._validate_position(position, allow_end=True)
+        if not isinstance(length, int) or length < 0:
+            raise ValueError("Length must be a non-negative integer.")
+        if position + length > self._length:
+            raise ValueError(f"Range {position} to {position + length} is outside of the sequence bounds.")
+
+
+class CoordinateMap:
+    """
+    Maps positions from before a run of edits to positions after them, kept as the segments
+    of the old coordinates that survived. An edit only splits and shifts segments, so features
+    can stay where they were stored and be moved once, when they are next read.
+    """
+
+    # Features are moved and the map started again once edits leave more segments than this
+    max_segments = 512
+
+    def __init__(self, length: int):
+        self._length = length
+        # (stored start, current start, length, bases replaced in place), sorted by both starts
+        self._segments: List[Tuple[int, int, int, bool]] = [(0, 0, length, False)] if length else []
+        self._index()
+
+    def __len__(self) -> int:
+        return len(self._segments)
+
+    def copy(self) -> "CoordinateMap":
+        coordinate_map = CoordinateMap.__new__(CoordinateMap)
+        coordinate_map._length = self._length
+        coordinate_map._segments = list(self._segments)
+        coordinate_map._index()
+        return coordinate_map
+
+    def edit(self, position: int, removed_length: int, inserted_length: int) -> None:
+        # removed_length bases at the current position were replaced with inserted_length bases,
+        # bases replaced by as many bases keep their segment but are marked as replaced
+        offset = inserted_length - removed_length
+        removed_end = position + removed_length
+        index = bisect_right(self._current_starts, position) - 1
+        if index < 0 or self._current_starts[index] + self._segments[index][2] <= position:
+            index += 1
+        segments = self._segments[:index]
+        for stored, current, length, replaced in self._segments[index:]:
+            if current < position:
+                segments.append((stored, current, position - current, replaced))
+            if not offset:
+                replaced_start, replaced_end = max(current, position), min(current + length, removed_end)
+                if replaced_start < replaced_end:
+                    segments.append((stored + replaced_start - current, replaced_start,
+                                     replaced_end - replaced_start, True))
+            kept_start = max(current, removed_end)
+            if current + length > kept_start:
+                segments.append((stored + kept_start - current, kept_start + offset,
+                                 current + length - kept_start, replaced))
+        self._segments = segments
+        self._index()
+
+    def to_current(self, stored_start: int, stored_end: Optional[int] = None) -> Optional[int]:
+        # Current position of a stored position, or of a stored range which must have survived
+        # in one piece, None if it was removed
+        index = bisect_right(self._stored_starts, stored_start) - 1
+        if index < 0:
+            return None
+        stored, current, length, replaced = self._segments[index]
+        if (stored_start if stored_end is None else stored_end) >= stored + length:
+            return None
+        return current + stored_start - stored
+
+    def to_stored(self, position: int) -> Optional[int]:
+        # Stored position of a current position, None for inserted bases
+        index = bisect_right(self._current_starts, position) - 1
+        if index < 0:
+            return None
+        stored, current, length, replaced = self._segments[index]
+        if position >= current + length:
+            return None
+        return stored + position - current
+
+    def changed_windows(self, length: int, margin: int) -> List[Tuple[int, int]]:
+        # Current ranges, merged and widened by margin on both sides, which hold new bases or
+        # join bases that were not next to each other before
+        windows = []
+        current_end = stored_end = 0
+        for stored, current, segment_length, replaced in self._segments:
+            if current != current_end or stored != stored_end:
+                windows.append((current_end - margin + 1, current + margin - 1))
+            if replaced:
+                windows.append((current - margin + 1, current + segment_length + margin - 1))
+            current_end, stored_end = current + segment_length, stored + segment_length
+        if current_end != length or stored_end != self._length:
+            windows.append((current_end - margin + 1, length + margin - 1))
+        merged = []
+        for start, end in sorted(windows):
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return merged
+
+    def _index(self) -> None:
+        self._stored_starts = [segment[0] for segment in self._segments]
+        self._current_starts = [segment[1] for segment in self._segments]
@@ -0,0 +1,335 @@
+from bisect import bisect_right
+from typing import List, NamedTuple, Optional, Tuple
+
+from src.base_modifications import base_modification_types
+from src.single_stranded_nucleic_acids import SingleStrandNucleicAcidSequence
+
+
+# Edits Myers' algorithm looks for before a region is split at shared k-mers instead
+max_myers_edits = 64
+# Longest k-mer used as anchor, shorter ones are used in shorter regions, where they are unique
+anchor_k = 20
+# Most anchors sampled per split, so splits stay O(n) however long the sequences
+_max_anchors = 1024
+
+
+class AlignedBlock(NamedTuple):
+    old_start: int
+    new_start: int
+    length: int
+
+
+class CoordinateChain:
+    """
+    The matching blocks of two versions of a sequence, ordered and non-overlapping in both, which
+    map each old base that is kept to its index in the new version. Bases outside of every block
+    were deleted or replaced, see changes.
+    """
+
+    def __init__(self, blocks: List[AlignedBlock], old_length: int, new_length: int):
+        self.blocks = blocks
+        self.old_length = old_length
+        self.new_length = new_length
+        self._old_starts = [block.old_start for block in blocks]
+
+    def __repr__(self) -> str:
+        return (f"CoordinateChain(blocks={len(self.blocks)}, old_length={self.old_length}, "
+                f"new_length={self.new_length})")
+
+    @property
+    def changes(self) -> List[Tuple[int, int, int, int]]:
+        # (old_start, old_end, new_start, new_end) of every region between blocks, ends exclusive.
+        # Insertions have old_start == old_end and deletions new_start == new_end.
+        changes = []
+        old_position, new_position = 0, 0
+        for block in self.blocks + [AlignedBlock(self.old_length, self.new_length, 0)]:
+            if block.old_start > old_position or block.new_start > new_position:
+                changes.append((old_position, block.old_start, new_position, block.new_start))
+            old_position, new_position = block.old_start + block.length, block.new_start + block.length
+        return changes
+
+    def _block_index(self, position: int) -> int:
+        # Index of the last block starting at or before position, -1 if none
+        return bisect_right(self._old_starts, position) - 1
+
+    def lift(self, position: int) -> Optional[int]:
+        # The new index of an old base, None if it was deleted or replaced
+        index = self._block_index(position)
+        if index < 0:
+            return None
+        block = self.blocks[index]
+        offset = position - block.old_start
+        return block.new_start + offset if offset < block.length else None
+
+    def lift_interval(self, start: int, end: int) -> Optional[Tuple[int, int]]:
+        """
+        Lifts the old bases start to end, end inclusive, to the first and last of them that are
+        kept, so intervals whose ends were edited are trimmed to what is left.
+
+        Returns:
+        - tuple (int, int): The new start and end, None if no base was kept or the bases kept
+            are no longer in order, as when the interval spans a rearrangement.
+        """
+        index = self._block_index(start)
+        if index < 0 or start >= self.blocks[index].old_start + self.blocks[index].length:
+            index += 1
+        if index >= len(self.blocks) or self.blocks[index].old_start > end:
+            return None
+        first = self.blocks[index]
+        new_start = first.new_start + max(start - first.old_start, 0)
+        last = self.blocks[self._block_index(end)]
+        new_end = last.new_start + min(end - last.old_start, last.length - 1)
+        return new_start, new_end
+
+
+def _match_length(a: str, i: int, b: str, j: int) -> int:
+    # Length of the common prefix of a[i:] and b[j:], compared in growing then shrinking chunks
+    limit = min(len(a) - i, len(b) - j)
+    length, step = 0, 16
+    while length < limit:
+        step = min(step, limit - length)
+        if a[i + length:i + length + step] == b[j + length:j + length + step]:
+            length += step
+            step *= 2
+        elif step == 1:
+            break
+        else:
+            step //= 2
+    return length
+
+
+def _myers(a: str, b: str, max_edits: Optional[int]) -> Optional[List[Tuple[int, int, int]]]:
+    # Myers' O(ND) greedy diff, the (i, j, length) snakes of a shortest edit script or None if it
+    # takes more than max_edits edits. Diagonals are followed with chunked string comparisons.
+    n, m = len(a), len(b)
+    furthest = {1: 0}
+    trace = []
+    for edits in range((n + m if max_edits is None else min(max_edits, n + m)) + 1):
+        trace.append(furthest.copy())
+        for k in range(-edits, edits + 1, 2):
+            if k == -edits or (k != edits and furthest[k - 1] < furthest[k + 1]):
+                x = furthest[k + 1]
+            else:
+                x = furthest[k - 1] + 1
+            x += _match_length(a, x, b, x - k)
+            furthest[k] = x
+            if x >= n and x - k >= m:
+                return _snakes(trace, n, m)
+    return None
+
+
+def _snakes(trace: List[dict], x: int, y: int) -> List[Tuple[int, int, int]]:
+    snakes = []
+    for edits in range(len(trace) - 1, -1, -1):
+        furthest = trace[edits]
+        k = x - y
+        if edits == 0:
+            previous_x, previous_y = 0, 0
+        else:
+            if k == -edits or (k != edits and furthest[k - 1] < furthest[k + 1]):
+                previous_k = k + 1
+                previous_x = furthest[previous_k]
+                previous_y = previous_x - previous_k + 1
+            else:
+                previous_k = k - 1
+                previous_x = furthest[previous_k] + 1
+                previous_y = previous_x - previous_k - 1
+        if x > previous_x:
+            snakes.append((previous_x, previous_y, x - previous_x))
+        if edits:
+            x, y = (previous_x, previous_y - 1) if previous_k == k + 1 else (previous_x - 1, previous_y)
+    return snakes[::-1]
+
+
+def _unique_kmers(sequence: str, k: int):
+    # The k-mers occurring once in sequence, sorted, and their starts
+    # Imported here as numpy is only needed for divergent regions
+    import numpy as np
+    from src.kmer_spectra import kmer_hashes
+
+    starts, hashes = kmer_hashes(sequence, k)
+    order = np.argsort(hashes)
+    hashes = hashes[order]
+    single = np.ones(hashes.size, dtype=bool)
+    repeated = hashes[1:] == hashes[:-1]
+    single[1:] &= ~repeated
+    single[:-1] &= ~repeated
+    return hashes[single], starts[order[single]]
+
+
+def _anchors(a: str, b: str) -> List[Tuple[int, int]]:
+    # (i, j) starts of k-mers occurring once in a and once in b, sampled in a, that keep their
+    # order in both, found as the longest increasing run of j as in patience diff
+    import numpy as np
+
+    k = min(anchor_k, max(len(a), len(b)).bit_length() // 2 + 4)
+    a_kmers, a_starts = _unique_kmers(a, k)
+    b_kmers, b_starts = _unique_kmers(b, k)
+    indexes = np.minimum(np.searchsorted(b_kmers, a_kmers), max(b_kmers.size - 1, 0))
+    shared = b_kmers[indexes] == a_kmers if b_kmers.size else np.zeros(a_kmers.size, dtype=bool)
+    pairs = np.stack((a_starts[shared], b_starts[indexes[shared]]), axis=1)
+    pairs = pairs[np.argsort(pairs[:, 0])]
+    if len(pairs) > _max_anchors:
+        pairs = pairs[::len(pairs) // _max_anchors]
+    # Longest increasing subsequence of j, O(m log m)
+    tails, tail_indexes, previous = [], [], [-1] * len(pairs)
+    for index, j in enumerate(pairs[:, 1].tolist()):
+        position = bisect_right(tails, j)
+        if position and tails[position - 1] == j:
+            continue
+        if position:
+            previous[index] = tail_indexes[position - 1]
+        if position == len(tails):
+            tails.append(j)
+            tail_indexes.append(index)
+        else:
+            tails[position] = j
+            tail_indexes[position] = index
+    anchors = []
+    index = tail_indexes[-1] if tail_indexes else -1
+    while index >= 0:
+        anchors.append((int(pairs[index, 0]), int(pairs[index, 1])))
+        index = previous[index]
+    return anchors[::-1]
+
+
+def _diff(a: str, b: str, a_offset: int, b_offset: int, blocks: List[AlignedBlock]) -> None:
+    prefix = _match_length(a, 0, b, 0)
+    if prefix:
+        blocks.append(AlignedBlock(a_offset, b_offset, prefix))
+        a, b = a[prefix:], b[prefix:]
+        a_offset += prefix
+        b_offset += prefix
+    suffix = _match_length(a[::-1], 0, b[::-1], 0) if a and b else 0
+    if suffix:
+        a, b = a[:-suffix], b[:-suffix]
+    if a and b:
+        snakes = _myers(a, b, max_myers_edits)
+        if snakes is not None:
+            blocks.extend(AlignedBlock(a_offset + i, b_offset + j, length) for i, j, length in snakes)
+        else:
+            anchors = [anchor for anchor in _anchors(a, b) if anchor != (0, 0)]
+            if len(a) + len(b) <= 4 * max_myers_edits and not anchors:
+                snakes = _myers(a, b, None)
+                blocks.extend(AlignedBlock(a_offset + i, b_offset + j, length) for i, j, length in snakes)
+            # Regions without shared k-mers are left as replaced
+            previous_i, previous_j = 0, 0
+            for i, j in anchors + ([(len(a), len(b))] if anchors else []):
+                _diff(a[previous_i:i], b[previous_j:j], a_offset + previous_i, b_offset + previous_j, blocks)
+                previous_i, previous_j = i, j
+    if suffix:
+        blocks.append(AlignedBlock(a_offset + len(a), b_offset + len(b), suffix))
+
+
+def diff_sequences(old_sequence: str, new_sequence: str) -> CoordinateChain:
+    """
+    Diffs two versions of a sequence into the chain of their matching blocks. Common ends are
+    stripped first, then Myers' O(ND) diff finds a shortest edit script, so versions differing
+    by a few edits diff in milliseconds however long. Regions with more than max_myers_edits
+    edits are split at k-mers the two share once, in order, and diffed piece by piece.
+
+    Returns:
+    - CoordinateChain: The matching blocks, ordered by old and new start.
+    """
+    old_sequence, new_sequence = old_sequence.upper(), new_sequence.upper()
+    blocks = []
+    _diff(old_sequence, new_sequence, 0, 0, blocks)
+    merged = []
+    for block in sorted(blocks):
+        if block.length == 0:
+            continue
+        if merged and merged[-1].old_start + merged[-1].length == block.old_start \
+                and merged[-1].new_start + merged[-1].length == block.new_start:
+            merged[-1] = merged[-1]._replace(length=merged[-1].length + block.length)
+        else:
+            merged.append(block)
+    return CoordinateChain(merged, len(old_sequence), len(new_sequence))
+
+
+def liftover(
+    source_strand: SingleStrandNucleicAcidSequence,
+    target_strand: SingleStrandNucleicAcidSequence,
+    chain: Optional[CoordinateChain] = None,
+) -> dict:
+    """
+    Carries the annotations and base modifications of a strand onto another version of it, e.g.
+    after an edit or resynthesis, through the chain of diff_sequences. Annotations whose ends
+    were edited are trimmed to the bases kept, base modifications are only lifted onto the same
+    base. Cut sites are compared, as the target finds its own. Both strands are read as stored,
+    so they must run in the same direction.
+
+    Parameters:
+    - source_strand (SingleStrandNucleicAcidSequence): The old version.
+    - target_strand (SingleStrandNucleicAcidSequence): The new version, the features are added
+        to it.
+    - chain (CoordinateChain): The chain from the source to the target sequence, diffed if None.
+
+    Returns:
+    - dict: The lifted annotations by name with their new (start, end), the names of those
+        trimmed, the lifted base modifications by old position with their new one, the features
+        that could not be lifted as (kind, name or position, reason) and the kept (old to new
+        start), lost and gained cut sites.
+    """
+    if source_strand.strand_direction != target_strand.strand_direction:
+        raise ValueError("Cannot lift features between strands of different directions.")
+    if chain is None:
+        chain = diff_sequences(source_strand.sequence, target_strand.sequence)
+    if (chain.old_length, chain.new_length) != (len(source_strand), len(target_strand)):
+        raise ValueError("The chain does not match the lengths of the strands.")
+    unmapped = []
+    lifted_annotations, trimmed = {}, []
+    target_annotations = target_strand.annotations
+    for annotation in source_strand.annotations.values():
+        if annotation.name in target_annotations:
+            unmapped.append(("annotation", annotation.name, "name exists on target"))
+            continue
+        if annotation.start > annotation.end:
+            # Spans the origin, so both ends must be kept as they are
+            lifted = (chain.lift(annotation.start), chain.lift(annotation.end))
+            lifted = None if None in lifted else lifted
+        else:
+            lifted = chain.lift_interval(annotation.start, annotation.end)
+        if lifted is None:
+            unmapped.append(("annotation", annotation.name, "deleted or rearranged"))
+            continue
+        if lifted[0] == lifted[1] or lifted[0] == len(target_strand) - 1 or lifted[1] == 0 or \
+                (lifted[0] > lifted[1] and not target_strand.circular):
+            unmapped.append(("annotation", annotation.name, "out of the target bounds"))
+            continue
+        if chain.lift(annotation.start) is None or chain.lift(annotation.end) is None:
+            trimmed.append(annotation.name)
+        lifted_annotations[annotation.name] = (lifted, annotation.note)
+    target_strand.add_annotations([{"name": name, "start": start, "end": end, "note": note}
+                                   for name, ((start, end), note) in lifted_annotations.items()])
+    lifted_base_mods = {}
+    target_base_mods = target_strand.base_modifications
+    target_sequence = target_strand.sequence.upper()
+    for position, base_mod in source_strand.base_modifications.items():
+        new_position = chain.lift(position)
+        if new_position is None:
+            unmapped.append(("base_modification", position, "deleted or replaced"))
+        elif target_sequence[new_position] != base_modification_types[base_mod.modification_type]:
+            unmapped.append(("base_modification", position, "base changed"))
+        elif new_position in target_base_mods:
+            unmapped.append(("base_modification", position, "position modified on target"))
+        else:
+            lifted_base_mods[position] = (new_position, base_mod.modification_type)
+    target_strand.add_base_modifications([{"position": new_position, "modification_type": modification_type}
+                                          for new_position, modification_type in lifted_base_mods.values()])
+    target_cut_sites = target_strand.cut_sites
+    kept_cut_sites = {}
+    for start, cut_site in source_strand.cut_sites.items():
+        new_start = chain.lift(start)
+        if new_start in target_cut_sites and \
+                target_cut_sites[new_start].restriction_enzyme == cut_site.restriction_enzyme:
+            kept_cut_sites[start] = new_start
+    kept_new_starts = set(kept_cut_sites.values())
+    return {
+        "annotations": {name: lifted for name, (lifted, _) in lifted_annotations.items()},
+        "trimmed_annotations": trimmed,
+        "base_modifications": {position: new_position for position, (new_position, _) in lifted_base_mods.items()},
+        "unmapped": unmapped,
+        "kept_cut_sites": kept_cut_sites,
+        "lost_cut_sites": sorted(start for start in source_strand.cut_sites if start not in kept_cut_sites),
+        "gained_cut_sites": sorted(start for start in target_cut_sites if start not in kept_new_starts),
+    }
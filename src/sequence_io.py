@@ -0,0 +1,159 @@
+from typing import IO, Iterable, Iterator, NamedTuple, Tuple, Union
+
+from src.double_stranded_nucleic_acids import DoubleStrandNucleicAcidSequence
+
+
+def _fasta_record(nucleic_acid, line_width: int) -> str:
+    # Double strands are written as their forward strand under the double strand id
+    if isinstance(nucleic_acid, DoubleStrandNucleicAcidSequence):
+        sequence = nucleic_acid.forward_sequence.sequence
+    else:
+        sequence = nucleic_acid.sequence
+    header = f">{nucleic_acid.id} {nucleic_acid.note}".rstrip()
+    lines = [sequence[i:i + line_width] for i in range(0, len(sequence), line_width)]
+    return "\n".join([header] + lines) + "\n"
+
+
+class FastaWriter:
+    """
+    Writes nucleic acids to a FASTA file, one record per nucleic acid with the id and note as
+    header. Can be given a path or an open text handle, which is not closed by the writer.
+    """
+
+    def __init__(self, path_or_handle: Union[str, IO[str]], line_width: int = 80):
+        if not isinstance(line_width, int) or line_width < 1:
+            raise ValueError("Line width must be a positive integer.")
+        self._owns_handle = isinstance(path_or_handle, str)
+        self._handle = open(path_or_handle, "w") if self._owns_handle else path_or_handle
+        self._line_width = line_width
+        self._count = 0
+
+    def __repr__(self):
+        return f"FastaWriter(records_written={self._count})"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def records_written(self) -> int:
+        return self._count
+
+    def write(self, nucleic_acids: Iterable) -> int:
+        # Same interface as SequenceStore.add, so either can consume streamed batches
+        count = 0
+        for nucleic_acid in nucleic_acids:
+            self._handle.write(_fasta_record(nucleic_acid, self._line_width))
+            count += 1
+        self._count += count
+        return count
+
+    def close(self) -> None:
+        if self._owns_handle:
+            self._handle.close()
+
+
+class FastqWriter(FastaWriter):
+    """
+    Writes reads to a FASTQ file. Reads are any objects with name, sequence and qualities, the
+    qualities as Phred+33 text, such as read_simulations.SimulatedRead.
+    """
+
+    def __init__(self, path_or_handle: Union[str, IO[str]]):
+        super().__init__(path_or_handle)
+
+    def __repr__(self):
+        return f"FastqWriter(records_written={self._count})"
+
+    def write(self, reads: Iterable) -> int:
+        lines = [f"@{read.name}\n{read.sequence}\n+\n{read.qualities}\n" for read in reads]
+        self._handle.write("".join(lines))
+        self._count += len(lines)
+        return len(lines)
+
+
+class SamWriter(FastaWriter):
+    """
+    Writes reads as unaligned SAM records, the text form of the unaligned BAM files PacBio
+    instruments produce. Takes the same reads as FastqWriter.
+    """
+
+    def __init__(self, path_or_handle: Union[str, IO[str]]):
+        super().__init__(path_or_handle)
+        self._handle.write("@HD\tVN:1.6\tSO:unknown\n")
+
+    def __repr__(self):
+        return f"SamWriter(records_written={self._count})"
+
+    def write(self, reads: Iterable) -> int:
+        lines = [f"{read.name}\t4\t*\t0\t255\t*\t*\t0\t0\t{read.sequence}\t{read.qualities}\n"
+                 for read in reads]
+        self._handle.write("".join(lines))
+        self._count += len(lines)
+        return len(lines)
+
+
+def read_fasta(path_or_handle: Union[str, IO[str]]) -> Iterator[Tuple[str, str]]:
+    """
+    Reads a FASTA file record by record.
+
+    Parameters:
+    - path_or_handle (str or file): The path of the FASTA file, or an open text handle.
+
+    Returns:
+    - generator (tuple): The (header, sequence) of each record, the header without its ">".
+    """
+    if isinstance(path_or_handle, str):
+        with open(path_or_handle) as handle:
+            yield from read_fasta(handle)
+        return
+    header, lines = None, []
+    for line in path_or_handle:
+        line = line.strip()
+        if line.startswith(">"):
+            if header is not None:
+                yield header, "".join(lines)
+            header, lines = line[1:], []
+        elif line:
+            if header is None:
+                raise ValueError("FASTA file must start with a header line.")
+            lines.append(line)
+    if header is not None:
+        yield header, "".join(lines)
+
+
+class FastqRecord(NamedTuple):
+    name: str
+    sequence: str
+    qualities: str
+
+
+def read_fastq(path_or_handle: Union[str, IO[str]]) -> Iterator[FastqRecord]:
+    """
+    Reads a FASTQ file record by record, four lines per record as FastqWriter writes them.
+
+    Parameters:
+    - path_or_handle (str or file): The path of the FASTQ file, or an open text handle.
+
+    Returns:
+    - generator (FastqRecord): The name, without its "@", sequence and Phred+33 qualities of
+        each record, which FastqWriter can write back.
+    """
+    if isinstance(path_or_handle, str):
+        with open(path_or_handle) as handle:
+            yield from read_fastq(handle)
+        return
+    lines = (line.rstrip("\r\n") for line in path_or_handle)
+    for header in lines:
+        if not header:
+            continue
+        if not header.startswith("@"):
+            raise ValueError(f"FASTQ record must start with an @ header line, not {header[:20]}.")
+        sequence, separator, qualities = next(lines, None), next(lines, None), next(lines, None)
+        if qualities is None or not separator.startswith("+"):
+            raise ValueError(f"FASTQ record {header[1:]} is incomplete.")
+        if len(qualities) != len(sequence):
+            raise ValueError(f"FASTQ record {header[1:]} has {len(sequence)} bases but {len(qualities)} qualities.")
+        yield FastqRecord(header[1:], sequence, qualities)
@@ -0,0 +1,266 @@
+import os
+import zlib
+from typing import Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from src.double_stranded_nucleic_acids import DoubleStrandNucleicAcidSequence
+from src.single_stranded_nucleic_acids import SingleStrandNucleicAcidSequence
+from src.util_classes import Colors, StrandDirections
+from src.util_functions import imap_windows, validate_chunk_size
+
+
+# White and light grey would not show on the map background, grey is kept for aggregates
+_palette = [color for color in Colors.list_values()
+            if color not in (Colors.white.value, Colors.light_grey.value, Colors.grey.value)]
+_aggregate_color = Colors.grey.value
+map_formats = ["svg", "png", "pdf"]
+
+
+class MapFeature(NamedTuple):
+    label: str
+    start: int
+    end: int
+    strand: int
+    color: str
+    # Number of annotations shown, more than one for an aggregate
+    count: int = 1
+
+
+class SequenceMap(NamedTuple):
+    """
+    What a map shows, independent of matplotlib, so maps can be built in one process and drawn
+    in another.
+    """
+    name: str
+    sequence_length: int
+    circular: bool
+    features: Tuple[MapFeature, ...]
+    region: Optional[Tuple[int, int]] = None
+
+
+def feature_color(name: str) -> str:
+    # The same name always gets the same color, across runs and across sequences
+    return _palette[zlib.crc32(name.encode("utf-8")) % len(_palette)]
+
+
+def _strand_features(strand: SingleStrandNucleicAcidSequence, strand_value: int) -> List[MapFeature]:
+    features = []
+    for annotation in strand._annotations.values():
+        label = f"{annotation.name}, {annotation.note}" if annotation.note else annotation.name
+        features.append(MapFeature(label, annotation.start, annotation.end, strand_value,
+                                   feature_color(annotation.name)))
+    return features
+
+
+def _map_contents(nucleic_acid) -> Tuple[int, List[MapFeature]]:
+    if isinstance(nucleic_acid, DoubleStrandNucleicAcidSequence):
+        sequence_length = max(len(nucleic_acid.forward_sequence), len(nucleic_acid.reverse_sequence))
+        features = (_strand_features(nucleic_acid.forward_sequence, +1) +
+                    _strand_features(nucleic_acid.reverse_sequence, -1))
+    elif isinstance(nucleic_acid, SingleStrandNucleicAcidSequence):
+        sequence_length = len(nucleic_acid)
+        strand_value = -1 if nucleic_acid.strand_direction == StrandDirections.REV_STRAND.value else +1
+        features = _strand_features(nucleic_acid, strand_value)
+    else:
+        raise ValueError("Maps can only be made of SingleStrandNucleicAcidSequence or "
+                         "DoubleStrandNucleicAcidSequence objects.")
+    return sequence_length, features
+
+
+def _aggregate(features: List[MapFeature], min_span: float) -> List[MapFeature]:
+    # Features spanning at least min_span bases are kept, runs of shorter ones on one strand that
+    # are less than min_span apart become one grey feature
+    kept, runs = [], {}
+    for feature in sorted(features, key=lambda feature: (feature.start, feature.end)):
+        if feature.end - feature.start + 1 >= min_span:
+            kept.append(feature)
+            continue
+        strand_runs = runs.setdefault(feature.strand, [])
+        if strand_runs and feature.start - strand_runs[-1][-1].end <= min_span:
+            strand_runs[-1].append(feature)
+        else:
+            strand_runs.append([feature])
+    for strand_runs in runs.values():
+        for run in strand_runs:
+            if len(run) == 1:
+                kept.append(run[0])
+            else:
+                # Counts are summed, so aggregating aggregates still counts the annotations
+                count = sum(feature.count for feature in run)
+                kept.append(MapFeature(f"{count} features", run[0].start, max(feature.end for feature in run),
+                                       run[0].strand, _aggregate_color, count))
+    return sorted(kept, key=lambda feature: (feature.start, feature.end))
+
+
+def level_of_detail(
+    features: List[MapFeature],
+    visible_length: int,
+    resolution: int = 1000,
+    max_features: int = 150,
+) -> List[MapFeature]:
+    """
+    Reduces features to what can be told apart at the scale of a map, in O(n log n). A feature
+    shorter than one visible unit, visible_length / resolution bases, is merged with its short
+    neighbours on the same strand into one feature labelled with their number. The unit doubles
+    until at most max_features are left, so large features always stay and stay labelled. Runs
+    on different strands are never merged, so at least one feature per strand is left. Features
+    wrapping around the origin of circular sequences are always kept as they are.
+
+    Parameters:
+    - features (list of MapFeature): The features to draw.
+    - visible_length (int): Number of bases the map shows.
+    - resolution (int): Number of units the map can show apart, about its width in pixels.
+    - max_features (int): The most features drawn.
+
+    Returns:
+    - list (MapFeature): The features to draw, sorted by start.
+    """
+    if not isinstance(max_features, int) or max_features < 1:
+        raise ValueError("Maximum features must be a positive integer.")
+    if not isinstance(resolution, int) or resolution < 1:
+        raise ValueError("Resolution must be a positive integer.")
+    min_span = max(visible_length / resolution, 1)
+    # Wrapped features end before they start, they have no span to merge by
+    wrapped = [feature for feature in features if feature.end < feature.start]
+    shown = _aggregate([feature for feature in features if feature.end >= feature.start], min_span)
+    # Doubling the unit eventually merges each strand into a single feature, no further
+    while len(shown) + len(wrapped) > max_features and len(shown) > len({feature.strand for feature in shown}):
+        min_span *= 2
+        shown = _aggregate(shown, min_span)
+    return sorted(shown + wrapped, key=lambda feature: (feature.start, feature.end))
+
+
+def sequence_map(
+    nucleic_acid,
+    region: Optional[Tuple[int, int]] = None,
+    resolution: int = 1000,
+    max_features: int = 150,
+) -> SequenceMap:
+    """
+    Builds the map of a single or double strand, see level_of_detail. Annotations are colored
+    by name, see feature_color.
+
+    Parameters:
+    - nucleic_acid: A SingleStrandNucleicAcidSequence or DoubleStrandNucleicAcidSequence.
+    - region (tuple of int): The (start, end) of the bases to show, features outside are culled
+        and the level of detail follows the region length. Linear sequences only.
+    - resolution (int): See level_of_detail.
+    - max_features (int): See level_of_detail.
+
+    Returns:
+    - SequenceMap: The map, ready to be drawn by plot_map or write_map.
+    """
+    sequence_length, features = _map_contents(nucleic_acid)
+    visible_length = sequence_length
+    if region is not None:
+        if nucleic_acid.circular:
+            raise ValueError("A region can only be shown of linear sequences.")
+        start, end = region
+        if not 0 <= start < end <= sequence_length:
+            raise ValueError(f"Region {start} to {end} is outside of the sequence bounds.")
+        features = [feature for feature in features if feature.end >= start and feature.start < end]
+        visible_length = end - start
+    features = level_of_detail(features, visible_length, resolution, max_features)
+    name = nucleic_acid.note or nucleic_acid.id
+    return SequenceMap(name, sequence_length, nucleic_acid.circular, tuple(features), region)
+
+
+def _graphic_record(sequence_map: SequenceMap):
+    # Imported here as it pulls in matplotlib, which only drawing needs
+    from dna_features_viewer import CircularGraphicRecord, GraphicFeature, GraphicRecord
+
+    features = [GraphicFeature(label=feature.label, start=feature.start, end=feature.end,
+                               strand=feature.strand, color=feature.color)
+                for feature in sequence_map.features]
+    if sequence_map.circular:
+        return CircularGraphicRecord(sequence_length=sequence_map.sequence_length, features=features)
+    record = GraphicRecord(sequence_length=sequence_map.sequence_length, features=features)
+    # Cropping also cuts the features crossing the region edges, so no label is drawn outside it
+    return record.crop(sequence_map.region) if sequence_map.region else record
+
+
+def plot_map(sequence_map: SequenceMap, ax=None, figure_width: float = 5):
+    """
+    Draws a map on a matplotlib axis, on a new pyplot figure when no axis is given.
+
+    Returns:
+    - The axis drawn on.
+    """
+    ax, _ = _graphic_record(sequence_map).plot(ax=ax, figure_width=figure_width)
+    return ax
+
+
+def write_map(sequence_map: SequenceMap, path: str, figure_width: float = 8, dpi: int = 150) -> str:
+    """
+    Draws a map into an SVG, PNG or PDF file, the format following the file extension. The
+    figure is drawn off screen with the Agg renderer, without pyplot or a display, so maps can be
+    written from scripts, servers and worker processes.
+    """
+    file_format = os.path.splitext(path)[1][1:].lower()
+    if file_format not in map_formats:
+        raise ValueError(f"Invalid map format: {file_format}. Options are {map_formats}")
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    # Linear maps are laid out on a short figure and then grown to fit their levels, as
+    # dna_features_viewer does for the pyplot figures it makes itself
+    figure = Figure(figsize=(figure_width, figure_width if sequence_map.circular else 2))
+    FigureCanvasAgg(figure)
+    ax = figure.add_subplot()
+    plot_map(sequence_map, ax=ax, figure_width=figure_width)
+    if not sequence_map.circular:
+        figure.set_size_inches(figure_width, 1 + 0.4 * ax.get_ylim()[1])
+    ax.set_title(sequence_map.name, loc="left")
+    figure.savefig(path, format=file_format, dpi=dpi, bbox_inches="tight")
+    return path
+
+
+def _write_map_job(job) -> str:
+    sequence_map, path, figure_width, dpi = job
+    return write_map(sequence_map, path, figure_width, dpi)
+
+
+def write_maps(
+    nucleic_acids: Iterable,
+    output_dir: str,
+    file_format: str = "svg",
+    resolution: int = 1000,
+    max_features: int = 150,
+    figure_width: float = 8,
+    dpi: int = 150,
+    processes: Optional[int] = 1,
+    chunksize: int = 4,
+) -> Iterator[str]:
+    """
+    Writes the map of every nucleic acid to output_dir, named by its id, e.g. for a nightly
+    report of a whole construct library. Maps are built lazily in this process and drawn across
+    a process pool, only a window of them is queued at a time.
+
+    Parameters:
+    - nucleic_acids (iterable): SingleStrandNucleicAcidSequence or DoubleStrandNucleicAcidSequence
+        objects.
+    - output_dir (str): The directory the files are written to, made if missing.
+    - file_format (str): One of map_formats.
+    - resolution, max_features (int): See level_of_detail.
+    - figure_width (float): Width of each figure in inches.
+    - dpi (int): Resolution of PNG files.
+    - processes (int): Number of worker processes, None for one per CPU and 1 to draw in process.
+    - chunksize (int): Number of maps drawn per task.
+
+    Returns:
+    - generator (str): The path of every file written, in the order of nucleic_acids.
+    """
+    if file_format not in map_formats:
+        raise ValueError(f"Invalid map format: {file_format}. Options are {map_formats}")
+    validate_chunk_size(chunksize)
+    os.makedirs(output_dir, exist_ok=True)
+    jobs = ((sequence_map(nucleic_acid, resolution=resolution, max_features=max_features),
+             os.path.join(output_dir, f"{nucleic_acid.id}.{file_format}"), figure_width, dpi)
+            for nucleic_acid in nucleic_acids)
+    if processes == 1:
+        for job in jobs:
+            yield _write_map_job(job)
+        return
+    from multiprocessing import Pool
+
+    with Pool(processes) as pool:
+        yield from imap_windows(pool, _write_map_job, jobs, processes, chunksize)
@@ -0,0 +1,127 @@
+import hashlib
+import os
+import weakref
+from typing import Iterable, Iterator, List, Optional
+
+from src.nucleic_acids import reverse_sequence, complement_sequence, reverse_complement_sequence
+from src.util_classes import StrandDirections
+from src.util_functions import least_rotation
+
+
+# Every SingleStrandNucleicAcidSequence and DoubleStrandNucleicAcidSequence alive, by id
+_nucleic_acids_by_id = weakref.WeakValueDictionary()
+
+
+def track_nucleic_acid(nucleic_acid) -> None:
+    _nucleic_acids_by_id[nucleic_acid.id] = nucleic_acid
+
+
+def _bulk_ids(count: int) -> List[str]:
+    # One call for all ids, each 128 random bits as hex like uuid4().hex
+    random_hex = os.urandom(16 * count).hex()
+    return [random_hex[i:i + 32] for i in range(0, 32 * count, 32)]
+
+
+def get_nucleic_acid(nucleic_acid_id: str):
+    """
+    Resolves an id, such as the parent_ss_nucleic_acid_id of a feature, to its nucleic acid.
+
+    Parameters:
+    - nucleic_acid_id (str): The id of a SingleStrandNucleicAcidSequence or DoubleStrandNucleicAcidSequence.
+
+    Returns:
+    - The nucleic acid object. Raises a KeyError if it does not exist (anymore).
+    """
+    try:
+        return _nucleic_acids_by_id[nucleic_acid_id]
+    except KeyError:
+        raise KeyError(f"Nucleic acid with id {nucleic_acid_id} does not exist.") from None
+
+
+def canonical_sequence(nucleic_acid) -> str:
+    """
+    Builds a canonical text form of a nucleic acid which is equal for identical molecules.
+    Single strands are read 5'->3'. Circular sequences are rotated to their smallest rotation
+    (Booth's algorithm). Double strands are also strand invariant, the smaller of both
+    orientations is used.
+
+    Parameters:
+    - nucleic_acid: A SingleStrandNucleicAcidSequence or DoubleStrandNucleicAcidSequence object.
+
+    Returns:
+    - str: The canonical form, including nucleic acid type and topology.
+    """
+    topology = "circular" if nucleic_acid.circular else "linear"
+    if hasattr(nucleic_acid, "forward_sequence"):
+        forms = _double_strand_forms(nucleic_acid)
+        kind = "ds"
+    else:
+        sequence = nucleic_acid.sequence
+        if nucleic_acid.strand_direction == StrandDirections.REV_STRAND.value:
+            sequence = reverse_sequence(sequence)
+        forms = [_rotated(sequence, nucleic_acid.circular)]
+        kind = "ss"
+    return f"{kind}|{nucleic_acid.nucleic_acid_type}|{topology}|{min(forms)}"
+
+
+def _double_strand_forms(ds_nucleic_acid) -> list:
+    fwd_seq = ds_nucleic_acid.forward_sequence.sequence
+    rev_seq = ds_nucleic_acid.reverse_sequence.sequence
+    rev_seq_start = ds_nucleic_acid.reverse_sequence_start
+    nuc_type = ds_nucleic_acid.nucleic_acid_type
+    if rev_seq_start == 0 and rev_seq == complement_sequence(fwd_seq, nuc_type=nuc_type):
+        # Fully paired, the molecule is described by either strand read 5'->3'
+        return [_rotated(fwd_seq, ds_nucleic_acid.circular),
+                _rotated(reverse_complement_sequence(fwd_seq, nuc_type=nuc_type), ds_nucleic_acid.circular)]
+    flipped_rev_seq_start = -1 * (rev_seq_start - (len(fwd_seq) - len(rev_seq)))
+    return [f"{fwd_seq}/{rev_seq}/{rev_seq_start}",
+            f"{reverse_sequence(rev_seq)}/{reverse_sequence(fwd_seq)}/{flipped_rev_seq_start}"]
+
+
+def _rotated(sequence: str, circular: bool) -> str:
+    if not circular:
+        return sequence
+    rotation = least_rotation(sequence)
+    return sequence[rotation:] + sequence[:rotation]
+
+
+def content_hash(nucleic_acid) -> str:
+    """
+    Hashes the canonical form of a nucleic acid, see canonical_sequence. Identical linear
+    molecules, and circular molecules identical up to rotation, share the same hash.
+    """
+    return hashlib.sha256(canonical_sequence(nucleic_acid).encode()).hexdigest()
+
+
+class SequenceRegistry:
+    """
+    Deduplicates nucleic acids by content hash. Only weak references are held, so registering
+    an object never keeps it alive.
+    """
+
+    def __init__(self):
+        self._by_hash = weakref.WeakValueDictionary()
+
+    def __len__(self) -> int:
+        return len(self._by_hash)
+
+    def __contains__(self, nucleic_acid) -> bool:
+        return self.find_duplicate(nucleic_acid) is not None
+
+    def register(self, nucleic_acid):
+        # Returns the already registered identical molecule if there is one
+        return self._by_hash.setdefault(nucleic_acid.content_hash, nucleic_acid)
+
+    def find_duplicate(self, nucleic_acid) -> Optional[object]:
+        return self._by_hash.get(nucleic_acid.content_hash)
+
+    def get(self, nucleic_acid_id: str):
+        return get_nucleic_acid(nucleic_acid_id)
+
+    def deduplicate(self, nucleic_acids: Iterable) -> Iterator:
+        """
+        Yields the registered molecule for each nucleic acid, the first of each set of identical
+        molecules is registered and yielded for all of them.
+        """
+        for nucleic_acid in nucleic_acids:
+            yield self.register(nucleic_acid)
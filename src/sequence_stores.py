@@ -0,0 +1,387 @@
+import sqlite3
+from typing import Iterable, Iterator, List, Optional
+
+from src.double_stranded_nucleic_acids import DoubleStrandNucleicAcidSequence
+from src.restriction_enzyme_cutsites import RestrictionEnzymeCutSite
+from src.sequence_registry import track_nucleic_acid
+from src.single_stranded_nucleic_acids import SingleStrandNucleicAcidSequence
+
+
+_schema = """
+CREATE TABLE IF NOT EXISTS strands (
+    id TEXT PRIMARY KEY,
+    sequence TEXT NOT NULL,
+    nucleic_acid_type TEXT NOT NULL,
+    circular INTEGER NOT NULL,
+    strand_direction TEXT NOT NULL,
+    note TEXT NOT NULL,
+    length INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    double_strand_id TEXT
+);
+CREATE TABLE IF NOT EXISTS double_strands (
+    id TEXT PRIMARY KEY,
+    forward_strand_id TEXT NOT NULL,
+    reverse_strand_id TEXT NOT NULL,
+    reverse_sequence_start INTEGER NOT NULL,
+    nucleic_acid_type TEXT NOT NULL,
+    circular INTEGER NOT NULL,
+    note TEXT NOT NULL,
+    content_hash TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS annotations (
+    strand_id TEXT NOT NULL,
+    name TEXT NOT NULL,
+    start INTEGER NOT NULL,
+    "end" INTEGER NOT NULL,
+    note TEXT NOT NULL,
+    PRIMARY KEY (strand_id, name)
+);
+CREATE TABLE IF NOT EXISTS base_modifications (
+    strand_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    modification_type TEXT NOT NULL,
+    base TEXT NOT NULL,
+    PRIMARY KEY (strand_id, position)
+);
+CREATE TABLE IF NOT EXISTS cut_sites (
+    strand_id TEXT NOT NULL,
+    start INTEGER NOT NULL,
+    "end" INTEGER NOT NULL,
+    cut_position INTEGER NOT NULL,
+    restriction_enzyme TEXT NOT NULL,
+    PRIMARY KEY (strand_id, start)
+);
+CREATE TABLE IF NOT EXISTS feature_spans (
+    feature_table TEXT PRIMARY KEY,
+    max_span INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS strands_content_hash ON strands (content_hash);
+CREATE INDEX IF NOT EXISTS double_strands_content_hash ON double_strands (content_hash);
+CREATE INDEX IF NOT EXISTS annotations_name ON annotations (name, strand_id);
+CREATE INDEX IF NOT EXISTS annotations_start ON annotations (start);
+CREATE INDEX IF NOT EXISTS annotations_strand_start ON annotations (strand_id, start);
+CREATE INDEX IF NOT EXISTS annotations_wrapped ON annotations (strand_id, start) WHERE start > "end";
+CREATE INDEX IF NOT EXISTS base_modifications_type ON base_modifications (modification_type, position);
+CREATE INDEX IF NOT EXISTS cut_sites_enzyme ON cut_sites (restriction_enzyme, strand_id, start);
+CREATE INDEX IF NOT EXISTS cut_sites_enzyme_start ON cut_sites (restriction_enzyme, start);
+CREATE INDEX IF NOT EXISTS cut_sites_start ON cut_sites (start);
+CREATE INDEX IF NOT EXISTS cut_sites_wrapped ON cut_sites (strand_id, start) WHERE start > "end";
+"""
+
+# Tables of features with a start and an end. The longest end - start of each is kept in
+# feature_spans, so an overlap query only has to scan starts from its start - max_span on.
+_spanned_tables = ["annotations", "cut_sites"]
+
+
+class SequenceStore:
+    """
+    Local SQLite store for SingleStrandNucleicAcidSequence and DoubleStrandNucleicAcidSequence
+    objects. Annotations, base modifications and cut sites are kept in indexed feature tables so
+    they can be queried without loading any sequence. Objects are only rebuilt when loaded.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self._path = path
+        self._connection = sqlite3.connect(path)
+        self._connection.row_factory = sqlite3.Row
+        if path != ":memory:":
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(_schema)
+        with self._connection:
+            for table in _spanned_tables:
+                # Stores made before spans were kept get theirs once, on first open
+                self._connection.execute(
+                    f'INSERT INTO feature_spans SELECT ?, COALESCE(MAX("end" - start), 0) FROM {table} '
+                    'WHERE NOT EXISTS (SELECT 1 FROM feature_spans WHERE feature_table = ?)', (table, table))
+
+    def __repr__(self):
+        return f"SequenceStore(path='{self._path}')"
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __len__(self):
+        return self._connection.execute(
+            "SELECT (SELECT COUNT(*) FROM strands WHERE double_strand_id IS NULL) + "
+            "(SELECT COUNT(*) FROM double_strands)").fetchone()[0]
+
+    def __contains__(self, nucleic_acid_id):
+        return self._kind(nucleic_acid_id) is not None
+
+    def close(self) -> None:
+        self._connection.close()
+
+    def add(self, nucleic_acids: Iterable) -> None:
+        """
+        Stores nucleic acids, replacing any stored under the same id, in a single transaction.
+        """
+        strand_rows, double_strand_rows, strands = [], [], []
+        for nucleic_acid in nucleic_acids:
+            if isinstance(nucleic_acid, DoubleStrandNucleicAcidSequence):
+                double_strand_rows.append((
+                    nucleic_acid.id,
+                    nucleic_acid.forward_sequence.id,
+                    nucleic_acid.reverse_sequence.id,
+                    nucleic_acid.reverse_sequence_start,
+                    nucleic_acid.nucleic_acid_type,
+                    int(nucleic_acid.circular),
+                    nucleic_acid.note,
+                    nucleic_acid.content_hash,
+                ))
+                strands += [(nucleic_acid.forward_sequence, nucleic_acid.id),
+                            (nucleic_acid.reverse_sequence, nucleic_acid.id)]
+            elif isinstance(nucleic_acid, SingleStrandNucleicAcidSequence):
+                strands.append((nucleic_acid, None))
+            else:
+                raise ValueError("Can only store SingleStrandNucleicAcidSequence or "
+                                 "DoubleStrandNucleicAcidSequence objects.")
+        for strand, double_strand_id in strands:
+            strand_rows.append((
+                strand.id,
+                strand.sequence,
+                strand.nucleic_acid_type,
+                int(strand.circular),
+                strand.strand_direction,
+                strand.note,
+                len(strand),
+                strand.content_hash,
+                double_strand_id,
+            ))
+        strand_ids = [(strand.id,) for strand, _ in strands]
+        # Features wrapping around the origin end before they start, they are found by a
+        # query of their own and never widen a span
+        spans = [("annotations", max((annot.end - annot.start for strand, _ in strands
+                                      for annot in strand._annotations.values()), default=0)),
+                 ("cut_sites", max((cut_site.end - cut_site.start for strand, _ in strands
+                                    for cut_site in strand._cut_sites.values()), default=0))]
+        with self._connection:
+            for table in ("annotations", "base_modifications", "cut_sites"):
+                self._connection.executemany(f"DELETE FROM {table} WHERE strand_id = ?", strand_ids)
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO strands VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", strand_rows)
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO double_strands VALUES (?, ?, ?, ?, ?, ?, ?, ?)", double_strand_rows)
+            self._connection.executemany(
+                "INSERT INTO annotations VALUES (?, ?, ?, ?, ?)",
+                ((strand.id, annot.name, annot.start, annot.end, annot.note)
+                 for strand, _ in strands for annot in strand._annotations.values()))
+            self._connection.executemany(
+                "INSERT INTO base_modifications VALUES (?, ?, ?, ?)",
+                ((strand.id, base_mod.position, base_mod.modification_type, base_mod.base)
+                 for strand, _ in strands for base_mod in strand._base_modifications.values()))
+            self._connection.executemany(
+                "INSERT INTO cut_sites VALUES (?, ?, ?, ?, ?)",
+                ((strand.id, cut_site.start, cut_site.end, cut_site.cut_position, cut_site.restriction_enzyme)
+                 for strand, _ in strands for cut_site in strand._cut_sites.values()))
+            # Spans only grow, the span of removed features is still a valid bound
+            self._connection.executemany(
+                "UPDATE feature_spans SET max_span = MAX(max_span, ?) WHERE feature_table = ?",
+                [(span, table) for table, span in spans])
+
+    def remove(self, nucleic_acid_ids: Iterable[str]) -> None:
+        with self._connection:
+            for nucleic_acid_id in nucleic_acid_ids:
+                strand_ids = [nucleic_acid_id]
+                row = self._connection.execute(
+                    "SELECT forward_strand_id, reverse_strand_id FROM double_strands WHERE id = ?",
+                    (nucleic_acid_id,)).fetchone()
+                if row:
+                    strand_ids = [row["forward_strand_id"], row["reverse_strand_id"]]
+                    self._connection.execute("DELETE FROM double_strands WHERE id = ?", (nucleic_acid_id,))
+                elif self._kind(nucleic_acid_id) is None:
+                    raise KeyError(f"Nucleic acid with id {nucleic_acid_id} is not stored.")
+                for table in ("annotations", "base_modifications", "cut_sites"):
+                    self._connection.executemany(
+                        f"DELETE FROM {table} WHERE strand_id = ?", [(strand_id,) for strand_id in strand_ids])
+                self._connection.executemany(
+                    "DELETE FROM strands WHERE id = ?", [(strand_id,) for strand_id in strand_ids])
+
+    def ids(self) -> Iterator[str]:
+        for row in self._connection.execute(
+                "SELECT id FROM strands WHERE double_strand_id IS NULL UNION ALL SELECT id FROM double_strands"):
+            yield row["id"]
+
+    def ids_with_content_hash(self, content_hash: str) -> List[str]:
+        rows = self._connection.execute(
+            "SELECT id FROM strands WHERE content_hash = ? AND double_strand_id IS NULL "
+            "UNION ALL SELECT id FROM double_strands WHERE content_hash = ?",
+            (content_hash, content_hash)).fetchall()
+        return [row["id"] for row in rows]
+
+    def load(self, nucleic_acid_id: str):
+        kind = self._kind(nucleic_acid_id)
+        if kind is None:
+            raise KeyError(f"Nucleic acid with id {nucleic_acid_id} is not stored.")
+        if kind == "double_strand":
+            return self._load_double_strand(nucleic_acid_id)
+        return self._load_strand(nucleic_acid_id)
+
+    def iter_load(self, nucleic_acid_ids: Iterable[str]) -> Iterator:
+        # Objects are only built as the generator is consumed
+        for nucleic_acid_id in nucleic_acid_ids:
+            yield self.load(nucleic_acid_id)
+
+    def find_annotations(
+        self,
+        name: Optional[str] = None,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        strand_id: Optional[str] = None,
+    ) -> List[dict]:
+        """
+        Finds annotations by name, and/or overlapping the start to end range, on any strand or
+        on strand_id. Each result includes the strand_id and double_strand_id it belongs to.
+        """
+        conditions, parameters = [], []
+        if name is not None:
+            conditions.append("f.name = ?")
+            parameters.append(name)
+        return self._find_overlapping("annotations", start, end, strand_id, conditions, parameters)
+
+    def find_base_modifications(
+        self,
+        modification_type: Optional[str] = None,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        strand_id: Optional[str] = None,
+    ) -> List[dict]:
+        conditions, parameters = self._range_conditions("f.position", "f.position", start, end, strand_id)
+        if modification_type is not None:
+            conditions.append("f.modification_type = ?")
+            parameters.append(modification_type)
+        return self._find("base_modifications", (conditions, parameters))
+
+    def find_base_modifications_near(self, modification_type: str, position: int, distance: int) -> List[dict]:
+        return self.find_base_modifications(modification_type, position - distance, position + distance)
+
+    def find_cut_sites(
+        self,
+        restriction_enzyme: Optional[str] = None,
+        start: Optional[int] = None,
+        end: Optional[int] = None,
+        strand_id: Optional[str] = None,
+    ) -> List[dict]:
+        conditions, parameters = [], []
+        if restriction_enzyme is not None:
+            conditions.append("f.restriction_enzyme = ?")
+            parameters.append(restriction_enzyme)
+        return self._find_overlapping("cut_sites", start, end, strand_id, conditions, parameters)
+
+    def find_cut_sites_in_annotation(self, restriction_enzyme: str, annotation_name: str) -> List[dict]:
+        """
+        Finds every cut site of an enzyme lying fully within an annotation of the given name on
+        the same strand. Annotations wrapping around the origin of circular strands are included.
+        """
+        rows = self._connection.execute(
+            'SELECT c.*, a.name AS annotation_name, s.double_strand_id FROM annotations a '
+            'JOIN cut_sites c ON c.strand_id = a.strand_id AND c.restriction_enzyme = ? '
+            'JOIN strands s ON s.id = a.strand_id '
+            'WHERE a.name = ? AND ('
+            '(a.start <= a."end" AND c.start >= a.start AND c."end" <= a."end") OR '
+            '(a.start > a."end" AND (c.start >= a.start OR c."end" <= a."end")))',
+            (restriction_enzyme, annotation_name)).fetchall()
+        return [dict(row) for row in rows]
+
+    @staticmethod
+    def _range_conditions(start_column, end_column, start, end, strand_id):
+        conditions, parameters = [], []
+        if start is not None:
+            conditions.append(f"{end_column} >= ?")
+            parameters.append(start)
+        if end is not None:
+            conditions.append(f"{start_column} <= ?")
+            parameters.append(end)
+        if strand_id is not None:
+            conditions.append("f.strand_id = ?")
+            parameters.append(strand_id)
+        return conditions, parameters
+
+    def _find_overlapping(self, table, start, end, strand_id, conditions, parameters):
+        # Features of a table in _spanned_tables overlapping the start to end range. Features
+        # wrapping around the origin of circular strands end before they start, they are found
+        # by a query of their own on the partial index of wrapped features.
+        if strand_id is not None:
+            conditions, parameters = ["f.strand_id = ?"] + conditions, [strand_id] + parameters
+        if start is None and end is None:
+            return self._find(table, (conditions, parameters))
+        linear_conditions, linear_parameters = self._range_conditions("f.start", 'f."end"', start, end, None)
+        if start is not None:
+            # No feature overlapping start begins more than max_span before it, so the overlap
+            # becomes a range scan on the start indexes
+            max_span = self._connection.execute(
+                "SELECT max_span FROM feature_spans WHERE feature_table = ?", (table,)).fetchone()[0]
+            linear_conditions.append("f.start >= ?")
+            linear_parameters.append(start - max_span)
+        # A wrapped feature covers the ends of the strand, so it overlaps any range reaching
+        # past its start or before its end
+        wrapped_conditions, wrapped_parameters = [], []
+        if start is not None and end is not None:
+            wrapped_conditions.append('(f."end" >= ? OR f.start <= ?)')
+            wrapped_parameters += [start, end]
+        return self._find(
+            table,
+            (conditions + ['f.start <= f."end"'] + linear_conditions, parameters + linear_parameters),
+            (conditions + ['f.start > f."end"'] + wrapped_conditions, parameters + wrapped_parameters))
+
+    def _find(self, table, *branches):
+        # Rows matching the conditions of any branch, each branch a (conditions, parameters) pair
+        queries, parameters = [], []
+        for branch_conditions, branch_parameters in branches:
+            where = f"WHERE {' AND '.join(branch_conditions)}" if branch_conditions else ""
+            queries.append(
+                f"SELECT f.*, s.double_strand_id FROM {table} f JOIN strands s ON s.id = f.strand_id {where}")
+            parameters += branch_parameters
+        rows = self._connection.execute(" UNION ALL ".join(queries), parameters).fetchall()
+        return [dict(row) for row in rows]
+
+    def _kind(self, nucleic_acid_id):
+        if self._connection.execute("SELECT 1 FROM double_strands WHERE id = ?", (nucleic_acid_id,)).fetchone():
+            return "double_strand"
+        if self._connection.execute("SELECT 1 FROM strands WHERE id = ?", (nucleic_acid_id,)).fetchone():
+            return "strand"
+        return None
+
+    def _load_strand(self, strand_id):
+        row = self._connection.execute("SELECT * FROM strands WHERE id = ?", (strand_id,)).fetchone()
+        strand = SingleStrandNucleicAcidSequence._restore(
+            id=row["id"],
+            sequence=row["sequence"],
+            nucleic_acid_type=row["nucleic_acid_type"],
+            circular=bool(row["circular"]),
+            strand_direction=row["strand_direction"],
+            note=row["note"],
+        )
+        annotations = self._connection.execute(
+            'SELECT name, start, "end", note FROM annotations WHERE strand_id = ?', (strand_id,)).fetchall()
+        if annotations:
+            strand.add_annotations([dict(annot) for annot in annotations])
+        base_mods = self._connection.execute(
+            "SELECT position, modification_type FROM base_modifications WHERE strand_id = ?",
+            (strand_id,)).fetchall()
+        if base_mods:
+            strand.add_base_modifications([dict(base_mod) for base_mod in base_mods])
+        # Cut sites were found when the strand was stored, they do not need to be rescanned
+        for cut_site in self._connection.execute(
+                "SELECT start, restriction_enzyme FROM cut_sites WHERE strand_id = ?", (strand_id,)):
+            strand._cut_sites[cut_site["start"]] = RestrictionEnzymeCutSite(
+                strand, cut_site["start"], cut_site["restriction_enzyme"])
+        return strand
+
+    def _load_double_strand(self, double_strand_id):
+        row = self._connection.execute("SELECT * FROM double_strands WHERE id = ?", (double_strand_id,)).fetchone()
+        double_strand = DoubleStrandNucleicAcidSequence(
+            forward_sequence=self._load_strand(row["forward_strand_id"]),
+            reverse_sequence=self._load_strand(row["reverse_strand_id"]),
+            reverse_sequence_start=row["reverse_sequence_start"],
+            nucleic_acid_type=row["nucleic_acid_type"],
+            circular=bool(row["circular"]),
+            note=row["note"],
+        )
+        double_strand._id = row["id"]
+        track_nucleic_acid(double_strand)
+        return double_strand
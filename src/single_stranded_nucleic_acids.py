@@ -1,15 +1,32 @@
+import copy
 import re
+import threading
 import uuid
+from bisect import bisect_left, bisect_right
 from contextlib import contextmanager
-from dna_features_viewer import CircularGraphicRecord, GraphicFeature, GraphicRecord
-from functools import reduce
+from types import MappingProxyType
 from typing import Optional, List
 
-from src.base_modifications import BaseModification
-from src.nucleic_acids import NucleicAcidSequence, reverse_sequence, complement_sequence
-from src.restriction_enzyme_cutsites import restriction_enzyme_types, RestrictionEnzymeCutSite
+from src.base_modifications import BaseModification, methylation_types
+from src.nucleic_acids import (
+    NucleicAcidSequence,
+    reverse_sequence,
+    complement_sequence,
+    complement_translation_table,
+)
+from src.restriction_enzyme_cutsites import (
+    max_recognition_sequence_length,
+    restriction_enzyme_types,
+    RestrictionEnzymeCutSite,
+)
 from src.sequence_annotations import SequenceAnnotation
-from src.util_classes import IUPACCodes, NucleicAcidTypes, StrandDirections, Colors
+from src.sequence_buffers import CoordinateMap, SequenceBuffer
+from src.sequence_registry import content_hash, track_nucleic_acid
+from src.util_classes import IUPACCodes, NucleicAcidTypes, StrandDirections
+
+
+# Ids of the dsDNA strands the current thread may edit, see _unlocked
+_unlocked_strands = threading.local()
 
 
 class SingleStrandNucleicAcidSequence(NucleicAcidSequence):
@@ -29,21 +46,49 @@ class SingleStrandNucleicAcidSequence(NucleicAcidSequence):
         self._validate_strand_direction(strand_direction)
         self._validate_note(note)
 
+        self._set_state(uuid.uuid4().hex, sequence.upper(), nucleic_acid_type, circular, strand_direction, note)
+
+        if annotations:
+            self.add_annotations(annotations)
+        if base_modifications:
+            self.add_base_modifications(base_modifications)
+        self._add_all_cut_sites()
+
+    @classmethod
+    def _restore(
+        cls,
+        id: str,
+        sequence: str,
+        nucleic_acid_type: str,
+        circular: bool,
+        strand_direction: str,
+        note: str,
+    ) -> "SingleStrandNucleicAcidSequence":
+        # Builds a strand with a known id from already validated data, without any features
+        # and without scanning for cut sites
+        strand = cls.__new__(cls)
+        strand._set_state(id, sequence, nucleic_acid_type, circular, strand_direction, note)
+        return strand
+
+    def _set_state(self, id, sequence, nucleic_acid_type, circular, strand_direction, note) -> None:
         super().__init__(nucleic_acid_type, circular)
-        self._id = uuid.uuid4().hex
+        self._id = id
         self._is_part_of_dsDNA = False
-        self._sequence = sequence.upper()
+        self._buffer = SequenceBuffer(sequence)
         self._strand_direction = strand_direction
+        self._frozen = False
         self.note = note
+        self._pending_rotation = None
+        # Edits cut sites and base modifications were not moved for yet, see _shift_features
+        self._pending_shifts = None
+        # Set on both sides of a copy or snapshot, cleared once this strand has its own buffer or stores
+        self._shared_buffer = False
+        self._shared_features = False
         self._annotations = {}
         self._base_modifications = {}
         self._cut_sites = {}
-
-        if annotations:
-            self.add_annotations(annotations)
-        if base_modifications:
-            self.add_base_modifications(base_modifications)
-        self._add_all_cut_sites()
+        self._content_hash = (None, None)
+        track_nucleic_acid(self)
 
     def __repr__(self):
         return (f"SingleStrandNucleicAcidSequence(id='{self.id}', "
@@ -65,9 +110,12 @@ class SingleStrandNucleicAcidSequence(NucleicAcidSequence):
     def is_part_of_dsDNA(self) -> bool:
         return self._is_part_of_dsDNA
 
+    def __len__(self) -> int:
+        return len(self._buffer)
+
     @property
     def sequence(self) -> str:
-        return self._sequence
+        return str(self._buffer)
 
     @property
     def nucleic_acid_type(self) -> str:
@@ -87,6 +135,8 @@ class SingleStrandNucleicAcidSequence(NucleicAcidSequence):
 
     @note.setter
     def note(self, value: str) -> None:
+        if self._frozen:
+            raise Exception("Snapshots are read-only, make a copy to edit.")
         self._validate_note(value)
         self._note = value
 
@@ -102,19 +152,97 @@ class SingleStrandNucleicAcidSequence(NucleicAcidSequence):
     def cut_sites(self):
         return self._cut_sites.copy()
 
+    # Feature stores, remapped on first access after the strand was rotated, linearized or had
+    # bases inserted or deleted, and made private on first access after a copy. Snapshots only
+    # ever hand out read-only views.
+    def _feature_store(self, store_name: str):
+        if self._frozen:
+            return MappingProxyType(getattr(self, store_name))
+        if self._shared_features:
+            self._own_features()
+        if self._pending_shifts is not None and store_name != "_annotation_store":
+            self._apply_shifts()
+        if self._pending_rotation is not None:
+            self._apply_rotation()
+        return getattr(self, store_name)
+
+    @property
+    def _annotations(self) -> dict:
+        return self._feature_store("_annotation_store")
+
+    @_annotations.setter
+    def _annotations(self, value: dict) -> None:
+        self._annotation_store = value
+
+    @property
+    def _base_modifications(self) -> dict:
+        return self._feature_store("_base_modification_store")
+
+    @_base_modifications.setter
+    def _base_modifications(self, value: dict) -> None:
+        self._base_modification_store = value
+
+    @property
+    def _cut_sites(self) -> dict:
+        return self._feature_store("_cut_site_store")
+
+    @_cut_sites.setter
+    def _cut_sites(self, value: dict) -> None:
+        self._cut_site_store = value
+
+    def _own_features(self) -> None:
+        # Features are never changed in place, so new dicts are enough, re-parented for a copy
+        self._shared_features = False
+        self._annotation_store = {name: annot._reparented(self.id) for name, annot in self._annotation_store.items()}
+        self._base_modification_store = {
+            pos: base_mod._reparented(self.id) for pos, base_mod in self._base_modification_store.items()}
+        self._cut_site_store = {start: cut_site._reparented(self.id) for start, cut_site in self._cut_site_store.items()}
+
+    def _own_buffer(self) -> None:
+        if self._shared_buffer:
+            self._buffer = self._buffer.copy()
+            self._shared_buffer = False
+
+    @property
+    def content_hash(self) -> str:
+        # Cached until the sequence, its direction or topology change
+        state = (self._buffer, self._buffer.version, self.strand_direction, self.circular)
+        if self._content_hash[0] == state:
+            return self._content_hash[1]
+        if self._frozen:
+            # Snapshots are never written to, they keep the hash the strand had cached, if any
+            return content_hash(self)
+        self._content_hash = (state, content_hash(self))
+        return self._content_hash[1]
+
+    def subsequence(self, start: int, end: int) -> str:
+        return self._buffer.slice(start, end)
+
     @contextmanager
     def _unlocked(self):
-        original_state = self._is_part_of_dsDNA
-        self._is_part_of_dsDNA = False
+        # Only unlocks for the calling thread, the strand itself is left untouched
+        if not hasattr(_unlocked_strands, "ids"):
+            _unlocked_strands.ids = set()
+        already_unlocked = id(self) in _unlocked_strands.ids
+        _unlocked_strands.ids.add(id(self))
         try:
             yield
         finally:
-            self._is_part_of_dsDNA = original_state
+            if not already_unlocked:
+                _unlocked_strands.ids.discard(id(self))
+
+    def _check_mutable(self, features: bool = False) -> None:
+        # Features of a strand in a dsDNA can be edited directly, its sequence cannot
+        if self._frozen:
+            raise Exception("Snapshots are read-only, make a copy to edit.")
+        if not features and self._is_part_of_dsDNA and id(self) not in getattr(_unlocked_strands, "ids", ()):
+            raise Exception("Operation not allowed directly on ssDNA part of dsDNA. "
+                            "Use dsDNA methods.")
 
     def _validate_sequence(self, sequence: str) -> None:
         if len(sequence) == 0:
             raise ValueError("Cannot make sequence from an empty string.")
-        if not all(nuc in IUPACCodes.list_names() for nuc in sequence.upper()):
+        if not set(sequence.upper()) <= set(IUPACCodes.list_names()):
             raise ValueError(
                 f"Cannot make sequence, invalid nucleotide found in sequence: {sequence}"
             )
@@ -162,7 +290,7 @@ class SingleStrandNucleicAcidSequence(NucleicAcidSequence):
                     "Cannot add base modification, multiple base modifications share the "
                     f"same position {pos} in the provided base modification list.")
             base_mod_pos_set.add(pos)
-            if pos in self.base_modifications:
+            if pos in self._base_modifications:
                 raise ValueError(
                     "Cannot add base modification, base modification already exists at "
                     f"position {pos}.")
@@ -174,6 +302,7 @@ class SingleStrandNucleicAcidSequence(NucleicAcidSequence):
         self._is_part_of_dsDNA = False
 
     def add_annotations(self, annot_list: List[dict]) -> None:
+        self._check_mutable(features=True)
         self._validate_annotations(annot_list)
         for annot in annot_list:
             name = annot["name"]
@@ -184,6 +313,7 @@ class SingleStrandNucleicAcidSequence(NucleicAcidSequence):
             self._annotations[name] = new_annot
 
     def edit_annotation(self, annot_name: str, **kwargs) -> None:
+        self._check_mutable(features=True)
         if annot_name not in self.annotations:
             raise KeyError(f"Annotation with name {annot_name} does not exist.")
         current_annot = self.annotations[annot_name]
@@ -203,6 +333,7 @@ class SingleStrandNucleicAcidSequence(NucleicAcidSequence):
         self._annotations[new_name] = updated_annot
 
     def remove_annotations(self, annot_names_list: List[str]) -> None:
+        self._check_mutable(features=True)
         for annot_name in annot_names_list:
             if annot_name in self.annotations:
                 del self._annotations[annot_name]
@@ -214,18 +345,61 @@ class SingleStrandNucleicAcidSequence(NucleicAcidSequence):
         self.remove_annotations(annot_names)
 
     def add_base_modifications(self, base_mod_list: List[dict]) -> None:
+        self._check_mutable(features=True)
         self._validate_base_modifications(base_mod_list)
         for base_mod in base_mod_list:
             base_mod_pos = base_mod["position"]
             base_mod_type = base_mod["modification_type"]
             new_base_mod = BaseModification(self, base_mod_pos, base_mod_type)
             self._base_modifications[base_mod_pos] = new_base_mod
-            if self.cut_sites:
-                for cut_site_data in self.cut_sites.values():
-                    if cut_site_data.start <= base_mod_pos <= cut_site_data.end:
-                        self._remove_cut_sites([cut_site_data.start])
+        self._remove_modified_cut_sites(sorted(base_mod["position"] for base_mod in base_mod_list))
+
+    def add_methylation(self, methylation_type_list: List[str], processes: Optional[int] = 1) -> None:
+        """
+        Marks every base methylated by the given motif rules, see methylation_types, e.g. Dam
+        (GATC to 6-mA), Dcm (CCWGG to 5-mC) and CpG (CG to 5-mC). Motifs are read 5'->3', so on
+        a reverse strand they are searched reversed. Bases already modified are left as they
+        are. All modifications are added at once and the cut sites they block are removed in a
+        single pass. Long strands can be searched across processes, see
+        parallel_scans.scan_motif_positions.
+        """
+        for methylation_type in methylation_type_list:
+            if methylation_type not in methylation_types:
+                raise ValueError(f"Invalid methylation type: {methylation_type}. "
+                                 f"Options are {list(methylation_types.keys())}")
+        self._check_mutable(features=True)
+        # Imported here, like the other numpy backed scans, to keep numpy out of the import path
+        from src.parallel_scans import scan_motif_positions
+
+        sequence = self.sequence
+        new_base_mods = {}
+        for methylation_type in methylation_type_list:
+            data = methylation_types[methylation_type]
+            motif, motif_position = data["motif"], data["position"]
+            if self.strand_direction == StrandDirections.REV_STRAND.value:
+                motif, motif_position = reverse_sequence(motif), len(motif) - 1 - motif_position
+            positions = (scan_motif_positions(sequence, motif, self.circular, processes) + motif_position) % len(self)
+            for pos in positions.tolist():
+                if pos not in self._base_modifications and pos not in new_base_mods:
+                    new_base_mods[pos] = BaseModification._restore(self, pos, data["modification_type"])
+        self._base_modifications.update(new_base_mods)
+        self._remove_modified_cut_sites(sorted(new_base_mods))
+
+    def _remove_modified_cut_sites(self, base_mod_positions: List[int]) -> None:
+        # Removes every cut site covering one of the sorted positions, one lookup per cut site
+        if not base_mod_positions:
+            return
+        blocked_starts = []
+        for start, cut_site in self._cut_sites.items():
+            # Sites spanning the origin of circular sequences cover both ends
+            ranges = [(start, cut_site.end)] if cut_site.end >= start else [(start, len(self) - 1), (0, cut_site.end)]
+            if any(bisect_left(base_mod_positions, range_start) < bisect_right(base_mod_positions, range_end)
+                   for range_start, range_end in ranges):
+                blocked_starts.append(start)
+        self._remove_cut_sites(blocked_starts)
 
     def edit_base_modification(self, base_mod_pos: int, **kwargs) -> None:
+        self._check_mutable(features=True)
         if base_mod_pos not in self.base_modifications:
             raise KeyError(f"Base modification with position {base_mod_pos} does not exist.")
         orig_base_mod = self.base_modifications[base_mod_pos]
@@ -251,6 +425,7 @@ class SingleStrandNucleicAcidSequence(NucleicAcidSequence):
         self._base_modifications[new_pos] = updated_base_mod
 
     def remove_base_modifications(self, base_mod_pos_list: List[int]) -> None:
+        self._check_mutable(features=True)
         for base_mod_pos in base_mod_pos_list:
             if base_mod_pos in self.base_modifications:
                 del self._base_modifications[base_mod_pos]
@@ -263,41 +438,81 @@ class SingleStrandNucleicAcidSequence(NucleicAcidSequence):
         self.remove_base_modifications(base_mod_pos_list)
         self._add_all_cut_sites()
 
-    def _add_all_cut_sites(self, search_positions: Optional[tuple[int, int]] = None) -> None:
-        search_sequence = self.sequence
+    def _add_all_cut_sites(
+        self,
+        search_positions: Optional[tuple[int, int]] = None,
+        restriction_enzymes: Optional[List[str]] = None,
+        processes: Optional[int] = 1,
+        chunk_size: int = 1000000,
+    ) -> None:
+        if processes != 1 and not search_positions:
+            from src.parallel_scans import scan_cut_sites
+
+            found_cut_sites = scan_cut_sites(self.sequence, self.strand_direction, self.circular,
+                                             restriction_enzymes, processes, chunk_size)
+            for start, restriction_enzyme in found_cut_sites.items():
+                length = len(restriction_enzyme_types[restriction_enzyme]["recognition_sequence"])
+                if start in self._cut_sites or any((start + offset) % len(self) in self._base_modifications
+                                                   for offset in range(length)):
+                    continue
+                self._cut_sites[start] = RestrictionEnzymeCutSite(self, start, restriction_enzyme)
+            return
         if search_positions:
-            search_sequence = search_sequence[search_positions[0]:search_positions[1]]
+            search_positions = (max(search_positions[0], 0), search_positions[1])
+            searches = [(self.subsequence(*search_positions), search_positions[0])]
+        else:
+            searches = [(self.sequence, 0)]
+        if self.circular:
+            # Sites spanning the origin are only found in the junction of both ends
+            junction_start = max(len(self) - max_recognition_sequence_length + 1, 0)
+            searches.append((self.subsequence(junction_start, len(self)) +
+                             self.subsequence(0, max_recognition_sequence_length - 1), junction_start))
         for restriction_enzyme, data in restriction_enzyme_types.items():
-            if self.strand_direction == StrandDirections.FWD_STRAND.value:
-                occurrences = re.finditer(data["recognition_sequence"], search_sequence)
-            else:
-                comp_recognition_seq = complement_sequence(data["recognition_sequence"])
-                occurrences = re.finditer(comp_recognition_seq, search_sequence)
-            res_starts = reduce(lambda x, y: x + [y.start()], occurrences, [])
-            for start in res_starts:
-                # If we are starting somewhere within the sequence,
-                # must index appropriately by the distance within the sequence
-                if search_positions:
-                    start += search_positions[0]
-                # If a base modification is present within the cut site sequence,
-                # must not add cut site
-                base_mod = False
-                if self.base_modifications:
-                    for base_modification_data in self.base_modifications.values():
-                        if start <= base_modification_data.position <= start + len(data["recognition_sequence"]):
-                            base_mod = True
-                if base_mod:
-                    continue
-                # If a cut site is already present at index,
-                # must not add cut site
-                if start in self.cut_sites:
-                    continue
-                new_cut_site = RestrictionEnzymeCutSite(self, start, restriction_enzyme)
-                self._cut_sites[start] = new_cut_site
+            if restriction_enzymes is not None and restriction_enzyme not in restriction_enzymes:
+                continue
+            recognition_seq = self._recognition_sequence(data, self.strand_direction)
+            for search_index, (search_sequence, search_start) in enumerate(searches):
+                # Lookahead, so overlapping sites are all found whichever window is searched
+                occurrences = re.finditer(f"(?={recognition_seq})", search_sequence)
+                res_starts = [occurrence.start() for occurrence in occurrences]
+                for start in res_starts:
+                    # If we are starting somewhere within the sequence,
+                    # must index appropriately by the distance within the sequence
+                    start += search_start
+                    # Only sites spanning the origin are taken from the junction
+                    if search_index == 1 and not (start < len(self) < start + len(recognition_seq)
+                                                  and len(recognition_seq) <= len(self)):
+                        continue
+                    # If a base modification is present within the cut site sequence,
+                    # must not add cut site
+                    if any((start + offset) % len(self) in self._base_modifications
+                           for offset in range(len(recognition_seq))):
+                        continue
+                    # If a cut site is already present at index,
+                    # must not add cut site
+                    if start in self._cut_sites:
+                        continue
+                    new_cut_site = RestrictionEnzymeCutSite(self, start, restriction_enzyme)
+                    self._cut_sites[start] = new_cut_site
+
+    @staticmethod
+    def _recognition_sequence(restriction_enzyme_data: dict, strand_direction: str) -> str:
+        if strand_direction == StrandDirections.FWD_STRAND.value:
+            return restriction_enzyme_data["recognition_sequence"]
+        return complement_sequence(restriction_enzyme_data["recognition_sequence"])
+
+    def scan_cut_sites(self, processes: Optional[int] = None, chunk_size: int = 1000000) -> None:
+        """
+        Scans the whole strand for cut sites again, in chunks across a process pool for
+        chromosome-scale strands, see parallel_scans.scan_cut_sites. Sites already known are kept
+        and sites blocked by base modifications are left out.
+        """
+        self._check_mutable(features=True)
+        self._add_all_cut_sites(processes=processes, chunk_size=chunk_size)
 
     def _remove_cut_sites(self, cut_site_start_list: List[int]) -> None:
         for cut_site_start in cut_site_start_list:
-            if cut_site_start in self.cut_sites:
+            if cut_site_start in self._cut_sites:
                 del self._cut_sites[cut_site_start]
             else:
                 raise KeyError(f"Cut site with start position {cut_site_start} does not exist.")
@@ -307,21 +522,44 @@ class SingleStrandNucleicAcidSequence(NucleicAcidSequence):
         self._remove_cut_sites(cut_site_pos_list)
 
     def copy(self) -> "SingleStrandNucleicAcidSequence":
-        new_ss_seq = SingleStrandNucleicAcidSequence(
-            sequence=self.sequence,
-            nucleic_acid_type=self.nucleic_acid_type,
-            strand_direction=self.strand_direction,
-            circular=self.circular,
-            note=self.note,
-            annotations=self.annotations,
-            base_modifications=self.base_modifications,
-        )
-        return new_ss_seq
+        """
+        Copies the strand in O(1). The copy has its own id and shares the sequence buffer and
+        feature stores with this strand, the first of both to edit its sequence or touch its
+        features takes its own copies then. The copy is never part of a dsDNA.
+        """
+        return self._shared_copy(uuid.uuid4().hex, frozen=False)
+
+    def snapshot(self) -> "SingleStrandNucleicAcidSequence":
+        """
+        Makes a read-only view of the strand as it is now, with the same id, in O(number of
+        pieces). Later edits of the strand do not show in the snapshot, and reading a snapshot
+        never changes it, so it can be shared by any number of threads without locks. Editing a
+        snapshot raises an Exception, copy it to edit.
+        """
+        # Everything reads compute lazily is computed now, so the snapshot never writes
+        self._feature_store("_annotation_store")
+        self._feature_store("_cut_site_store")
+        str(self._buffer)
+        return self._shared_copy(self.id, frozen=True)
+
+    def _shared_copy(self, id: str, frozen: bool) -> "SingleStrandNucleicAcidSequence":
+        shared = copy.copy(self)
+        shared._id = id
+        shared._is_part_of_dsDNA = False
+        shared._frozen = frozen
+        if self._pending_shifts is not None:
+            shared._pending_shifts = self._pending_shifts.copy()
+        for strand in (self, shared):
+            strand._shared_buffer = True
+            strand._shared_features = True
+        if not frozen:
+            track_nucleic_acid(shared)
+        return shared
 
     def change_strand_direction(self) -> None:
-        if self._is_part_of_dsDNA:
-            raise Exception("Operation not allowed directly on ssDNA part of dsDNA. "
-                            "Use dsDNA methods.")
+        self._check_mutable()
+        if self._pending_shifts is not None:
+            self._apply_shifts()
         if self.strand_direction == StrandDirections.FWD_STRAND.value:
             self._strand_direction = StrandDirections.REV_STRAND.value
             self._remove_all_cut_sites()
@@ -332,81 +570,460 @@ class SingleStrandNucleicAcidSequence(NucleicAcidSequence):
             self._add_all_cut_sites()
 
     def reverse(self, change_strand_dir=False) -> None:
-        if self._is_part_of_dsDNA:
-            raise Exception("Operation not allowed directly on ssDNA part of dsDNA. "
-                            "Use dsDNA methods.")
-        self._sequence = reverse_sequence(self.sequence)
-        if change_strand_dir:
-            self.change_strand_direction()
-        if self.annotations:
-            self.remove_all_annotations()
-        if self.base_modifications:
-            self.remove_all_base_modifications()
-        self._remove_all_cut_sites()
-        self._add_all_cut_sites()
+        self._reorient(reverse=True, complement=False, change_strand_dir=change_strand_dir)
 
     def complement(self, change_strand_dir=False) -> None:
-        if self._is_part_of_dsDNA:
-            raise Exception("Operation not allowed directly on ssDNA part of dsDNA. "
-                            "Use dsDNA methods.")
-        self._sequence = complement_sequence(self._sequence, nuc_type=self.nucleic_acid_type)
-        if change_strand_dir:
-            self.change_strand_direction()
-        if self.annotations:
-            self.remove_all_annotations()
-        if self.base_modifications:
-            self.remove_all_base_modifications()
-        self._remove_all_cut_sites()
-        self._add_all_cut_sites()
+        self._reorient(reverse=False, complement=True, change_strand_dir=change_strand_dir)
 
     def reverse_complement(self, change_strand_dir=False):
-        self.reverse(change_strand_dir=change_strand_dir)
-        self.complement(change_strand_dir=change_strand_dir)
+        # Reversing and complementing would each change the strand direction, so it never changes
+        self._reorient(reverse=True, complement=True, change_strand_dir=False)
+
+    def _reorient(self, reverse: bool, complement: bool, change_strand_dir: bool) -> None:
+        # Flips the buffer view in O(1) and remaps features in O(number of features), the
+        # i-th base becomes base n - 1 - i when reversing. Cut sites are mapped rather than
+        # rescanned for every enzyme whose recognition sequence maps onto itself.
+        self._check_mutable()
+        self._own_buffer()
+        if self._pending_shifts is not None:
+            self._apply_shifts()
+        if self._pending_rotation is not None:
+            self._apply_rotation()
+        last_index = len(self) - 1
+        old_strand_direction = self.strand_direction
+        if reverse:
+            self._buffer.reverse()
+        if complement:
+            self._buffer.complement(complement_translation_table(self.nucleic_acid_type))
+        if change_strand_dir:
+            if self.strand_direction == StrandDirections.FWD_STRAND.value:
+                self._strand_direction = StrandDirections.REV_STRAND.value
+            else:
+                self._strand_direction = StrandDirections.FWD_STRAND.value
+
+        if reverse:
+            self._annotations = {
+                name: annot._moved(last_index - annot.end, last_index - annot.start)
+                for name, annot in self._annotations.items()
+            }
+        removed_base_mod_positions = []
+        if complement:
+            # Every base that can carry a modification changes when complemented, the cut sites
+            # they blocked are looked for where those bases are now
+            removed_base_mod_positions = [last_index - pos if reverse else pos for pos in self._base_modifications]
+            self._base_modifications = {}
+        elif reverse:
+            self._base_modifications = {
+                last_index - pos: base_mod._moved(last_index - pos)
+                for pos, base_mod in self._base_modifications.items()
+            }
+
+        rescan_enzymes = []
+        for restriction_enzyme, data in restriction_enzyme_types.items():
+            old_recognition_seq = self._recognition_sequence(data, old_strand_direction)
+            if reverse:
+                old_recognition_seq = reverse_sequence(old_recognition_seq)
+            if complement:
+                old_recognition_seq = complement_sequence(old_recognition_seq)
+            if old_recognition_seq != self._recognition_sequence(data, self.strand_direction):
+                rescan_enzymes.append(restriction_enzyme)
+        old_cut_sites = self._cut_sites
+        self._cut_sites = {}
+        for cut_site in old_cut_sites.values():
+            if cut_site.restriction_enzyme in rescan_enzymes:
+                continue
+            new_start = last_index - cut_site.end if reverse else cut_site.start
+            self._cut_sites[new_start] = RestrictionEnzymeCutSite(self, new_start, cut_site.restriction_enzyme)
+        if rescan_enzymes:
+            self._add_all_cut_sites(restriction_enzymes=rescan_enzymes)
+        # Cut sites blocked by the removed base modifications are open again
+        for pos in removed_base_mod_positions:
+            self._add_all_cut_sites(search_positions=(pos - max_recognition_sequence_length + 1,
+                                                      pos + max_recognition_sequence_length))
+
+    def rotate(self, offset: int) -> None:
+        """
+        Moves the origin of a circular strand so the base at offset becomes the first base. Only
+        the origin of the sequence view moves, features are remapped when next accessed. Cut sites
+        are the same on every rotation of a ring, so they are mapped rather than rescanned.
+        """
+        self._check_mutable()
+        if not isinstance(offset, int):
+            raise TypeError("Offset must be an integer.")
+        if not self.circular:
+            raise ValueError("Only circular sequences can be rotated.")
+        offset %= len(self)
+        # Edits are mapped in the coordinates they were made in
+        if self._pending_shifts is not None:
+            self._apply_shifts()
+        if offset:
+            self._own_buffer()
+            self._buffer.rotate(offset)
+            self._pending_rotation = (self._pending_rotation or 0) + offset
+
+    def linearize(self, position: int = 0) -> None:
+        """
+        Opens a circular strand before position, which becomes the first base of the linear
+        strand. Like rotate, features are remapped when next accessed. Annotations and cut sites
+        spanning the opening are removed then.
+        """
+        self.rotate(position)
+        self._circular = False
+        self._pending_rotation = self._pending_rotation or 0
+
+    def _apply_rotation(self) -> None:
+        offset, self._pending_rotation = self._pending_rotation, None
+        n = len(self)
+        annotations = {}
+        for name, annot in self._annotation_store.items():
+            start, end = (annot.start - offset) % n, (annot.end - offset) % n
+            if self.circular or start < end:
+                annotations[name] = annot._moved(start, end)
+        self._annotation_store = annotations
+        self._base_modification_store = {
+            (pos - offset) % n: base_mod._moved((pos - offset) % n)
+            for pos, base_mod in self._base_modification_store.items()
+        }
+        cut_sites = {}
+        for cut_site in self._cut_site_store.values():
+            start = (cut_site.start - offset) % n
+            if self.circular or start + len(cut_site.recognition_sequence) <= n:
+                cut_sites[start] = RestrictionEnzymeCutSite(self, start, cut_site.restriction_enzyme)
+        self._cut_site_store = cut_sites
+
+    def insert(self, position: int, sequence: str) -> None:
+        """
+        Inserts bases before position. Features downstream of the insertion are shifted and
+        annotations spanning it grow. Cut sites are only rescanned around the insertion.
+        """
+        self._validate_edit(sequence)
+        self._buffer.insert(position, sequence.upper())
+        self._shift_features(position, 0, len(sequence))
+
+    def delete(self, position: int, length: int = 1) -> None:
+        """
+        Deletes length bases starting at position. Features downstream of the deletion are
+        shifted, annotations overlapping it shrink and those lying within it are removed, as are
+        base modifications on deleted bases. Cut sites are only rescanned around the deletion.
+        """
+        self._validate_edit()
+        if length >= len(self):
+            raise ValueError("Cannot delete every base of the sequence.")
+        self._buffer.delete(position, length)
+        self._shift_features(position, length, 0)
+
+    def substitute(self, position: int, sequence: str) -> None:
+        """
+        Replaces the bases starting at position with sequence, which keeps the length unchanged.
+        Base modifications on bases that no longer carry the modified base are removed. Cut sites
+        are only rescanned around the substitution.
+        """
+        self._validate_edit(sequence)
+        self._buffer.substitute(position, sequence.upper())
+        self._shift_features(position, len(sequence), len(sequence))
+
+    def _validate_edit(self, sequence: Optional[str] = None) -> None:
+        self._check_mutable()
+        self._own_buffer()
+        if sequence is not None:
+            self._validate_sequence(sequence.upper())
+            self._validate_nucleic_acid_type_with_sequence(self.nucleic_acid_type, sequence.upper())
+        # Features must be in place before the sequence changes length
+        if self._pending_rotation is not None:
+            self._apply_rotation()
+
+    def _shift_features(self, position: int, removed_length: int, inserted_length: int) -> None:
+        # Moves every feature after an edit which replaced removed_length bases at position
+        # with inserted_length bases. Coordinates inside a removed region collapse onto its edges.
+        # Annotations are moved right away, as what an edit does to them depends on the edits
+        # before it. Cut sites and base modifications stay where they are, the edit is recorded
+        # in a CoordinateMap and they are moved and rescanned once, when next read.
+        offset = inserted_length - removed_length
+        removed_end = position + removed_length
+        if self._shared_features:
+            self._own_features()
+        if offset:
+            for name, annot in list(self._annotations.items()):
+                new_start = self._shift_coordinate(annot.start, position, removed_end, offset, position)
+                new_end = self._shift_coordinate(annot.end, position, removed_end, offset, position - 1)
+                if self.circular and new_end < 0:
+                    new_end = len(self) - 1
+                if new_start == new_end or new_end < 0 or (not self.circular and new_start > new_end):
+                    del self._annotations[name]
+                elif (new_start, new_end) != (annot.start, annot.end):
+                    self._annotations[name] = annot._moved(new_start, new_end)
+        elif self._pending_shifts is None:
+            self._substitute_features(position, removed_end)
+            return
+
+        if self._pending_shifts is None:
+            self._pending_shifts = CoordinateMap(len(self) - offset)
+        if not offset:
+            # Nothing moves, only features on the substituted bases need checking, found where
+            # they are stored
+            for pos in range(position, removed_end):
+                stored_pos = self._pending_shifts.to_stored(pos)
+                base_mod = self._base_modification_store.get(stored_pos)
+                if base_mod and self.subsequence(pos, pos + 1) != base_mod.base:
+                    del self._base_modification_store[stored_pos]
+            for start in range(position - max_recognition_sequence_length + 1, removed_end):
+                stored_start = self._pending_shifts.to_stored(start)
+                cut_site = self._cut_site_store.get(stored_start)
+                if cut_site and cut_site.end + start - stored_start >= position:
+                    del self._cut_site_store[stored_start]
+        self._pending_shifts.edit(position, removed_length, inserted_length)
+        if len(self._pending_shifts) > CoordinateMap.max_segments:
+            self._apply_shifts()
+
+    def _substitute_features(self, position: int, removed_end: int) -> None:
+        if self.circular:
+            # Sites spanning the origin are found again by the rescan below
+            for start in [start for start, cut_site in self._cut_sites.items() if cut_site.end < start]:
+                del self._cut_sites[start]
+        # Nothing moves, only features on the substituted bases need checking
+        for pos in range(position, removed_end):
+            base_mod = self._base_modifications.get(pos)
+            if base_mod and self.subsequence(pos, pos + 1) != base_mod.base:
+                del self._base_modifications[pos]
+        for start in range(position - max_recognition_sequence_length + 1, removed_end):
+            cut_site = self._cut_sites.get(start)
+            if cut_site and cut_site.end >= position:
+                del self._cut_sites[start]
+        self._add_all_cut_sites(search_positions=(position - max_recognition_sequence_length + 1,
+                                                  removed_end + max_recognition_sequence_length - 1))
+
+    def _apply_shifts(self) -> None:
+        # Moves cut sites and base modifications through every edit since they were last read,
+        # in O(number of features), and rescans for cut sites around the edited bases only
+        shifts, self._pending_shifts = self._pending_shifts, None
+        if self._shared_features:
+            self._own_features()
+        base_mods = {}
+        for pos, base_mod in self._base_modification_store.items():
+            new_pos = shifts.to_current(pos)
+            if new_pos is not None:
+                base_mods[new_pos] = base_mod if new_pos == pos else base_mod._moved(new_pos)
+        self._base_modification_store = base_mods
+        cut_sites = {}
+        for start, cut_site in self._cut_site_store.items():
+            # Sites spanning the origin are found again by the rescan below
+            new_start = shifts.to_current(start, cut_site.end) if cut_site.end >= start else None
+            if new_start is not None:
+                cut_sites[new_start] = cut_site if new_start == start else cut_site._moved(new_start - start)
+        self._cut_site_store = cut_sites
+        for window in shifts.changed_windows(len(self), max_recognition_sequence_length):
+            self._add_all_cut_sites(search_positions=window)
+
+    @staticmethod
+    def _shift_coordinate(coordinate: int, position: int, removed_end: int, offset: int, collapsed: int) -> int:
+        if coordinate < position:
+            return coordinate
+        if coordinate < removed_end:
+            return collapsed
+        return coordinate + offset
 
     def set_circular(self) -> None:
-        if self._is_part_of_dsDNA:
-            raise Exception("Operation not allowed directly on ssDNA part of dsDNA. "
-                            "Use dsDNA methods.")
+        self._check_mutable()
         if self.circular is True:
             raise Exception("circular is already True.")
         else:
+            # Features of a pending linearization or edit must be dropped while still linear
+            if self._pending_shifts is not None:
+                self._apply_shifts()
+            if self._pending_rotation is not None:
+                self._apply_rotation()
             self._circular = True
 
     def remove_circular(self) -> None:
-        if self._is_part_of_dsDNA:
-            raise Exception("Operation not allowed directly on ssDNA part of dsDNA. "
-                            "Use dsDNA methods.")
+        self._check_mutable()
         if self.circular is False:
             raise Exception("circular is already False.")
         else:
+            if self._pending_shifts is not None:
+                self._apply_shifts()
             self._circular = False
         annot_names_to_remove = [
             name for name, annot in self.annotations.items()
             if annot.end < annot.start
         ]
         self.remove_annotations(annot_names_to_remove)
+        self._remove_cut_sites([start for start, cut_site in self.cut_sites.items() if cut_site.end < start])
 
-    def view(self) -> None:
-        strand = +1
+    def _read_sequence(self) -> str:
+        # The sequence 5'->3', reverse strands are stored 3'->5'
         if self.strand_direction == StrandDirections.REV_STRAND.value:
-            strand = -1
-        features = []
-        for annotation in self.annotations.values():
-            label=annotation.name
-            if annotation.note:
-                label=f"{annotation.name}, {annotation.note}"
-            features.append(GraphicFeature(
-                label=label,
-                start=annotation.start,
-                end=annotation.end,
-                strand=strand,
-                color=Colors.random_color(),
-            ))
-        if self.circular:
-            record = CircularGraphicRecord(sequence_length=len(self.sequence), features=features)
-        else:
-            record = GraphicRecord(sequence_length=len(self.sequence), features=features)
-        record.plot(figure_width=5)
+            return reverse_sequence(self.sequence)
+        return self.sequence
+
+    def translate(self, frame: int = 1, table_id: int = 1, to_stop: bool = False) -> str:
+        """
+        Translates the strand read 5'->3' from the given frame (1 to 3), see
+        translations.translate_sequence.
+        """
+        if frame not in (1, 2, 3):
+            raise ValueError(f"Invalid frame: {frame}. Options are [1, 2, 3]")
+        from src.translations import translate_sequence
+
+        return translate_sequence(self._read_sequence()[frame - 1:], table_id, to_stop)
+
+    def find_orfs(
+        self,
+        min_protein_length: int = 30,
+        table_id: int = 1,
+        both_strands: bool = True,
+        add_annotations: bool = False,
+        name_prefix: str = "ORF",
+    ) -> List[dict]:
+        """
+        Finds the open reading frames of the strand and, unless both_strands is False, of its
+        reverse complement, see translations.find_orfs. Circular strands are searched across the
+        origin.
+
+        Parameters:
+        - min_protein_length (int): The fewest amino acids an ORF must encode.
+        - table_id (int): The NCBI genetic code, see translations.codon_tables.
+        - both_strands (bool): If False, only the frames of this strand are searched.
+        - add_annotations (bool): If True, each ORF is also added as an annotation.
+        - name_prefix (str): Prefix of the ORF names, which are numbered from 1 in order of start.
+
+        Returns:
+        - list (dict): One annotation dict per ORF with name, start, end and a note giving the
+            strand, frame and protein length, plus the strand, frame and protein. Coordinates are
+            indexes of this strand as stored.
+        """
+        from src.translations import find_orfs
+
+        n = len(self)
+        is_reverse = self.strand_direction == StrandDirections.REV_STRAND.value
+        orfs = find_orfs(self._read_sequence(), self.circular, table_id, min_protein_length, both_strands)
+        if is_reverse:
+            for orf in orfs:
+                orf["start"], orf["end"] = n - 1 - orf["end"], n - 1 - orf["start"]
+            orfs.sort(key=lambda orf: (orf["start"], orf["strand"]))
+        for number, orf in enumerate(orfs, 1):
+            orf["name"] = f"{name_prefix}{number}"
+            orf["note"] = self._orf_note(orf)
+        if add_annotations:
+            self._add_found_annotations(orfs)
+        return orfs
+
+    @staticmethod
+    def _orf_note(orf: dict) -> str:
+        return f"strand {orf['strand']:+d}, frame {orf['frame']}, {len(orf['protein'])} aa"
+
+    def _add_found_annotations(self, found: List[dict]) -> None:
+        # Annotations cannot start on the last base or end on the first
+        self.add_annotations([
+            {key: feature[key] for key in ("name", "start", "end", "note")}
+            for feature in found if feature["start"] < len(self) - 1 and feature["end"] > 0
+        ])
+
+    def _add_region_annotations(self, regions, name_prefix: str, note: str) -> None:
+        self._add_found_annotations([
+            {"name": f"{name_prefix}_{number}", "start": start, "end": end, "note": note}
+            for number, (start, end) in enumerate(regions.tolist(), 1)
+        ])
+
+    def kmer_counts(self, k: int, canonical: bool = False):
+        """
+        Counts the k-mers of the strand read 5'->3', see kmer_spectra.kmer_counts and
+        kmer_spectra.decode_kmers.
+        """
+        from src.kmer_spectra import kmer_counts
+
+        return kmer_counts(self._read_sequence(), k, canonical, self.circular)
+
+    def kmer_spectrum(self, k: int, canonical: bool = False):
+        from src.kmer_spectra import kmer_spectrum
+
+        return kmer_spectrum(self._read_sequence(), k, canonical, self.circular)
+
+    def find_repeats(
+        self,
+        k: int = 16,
+        min_copies: int = 2,
+        canonical: bool = True,
+        add_annotations: bool = False,
+        name_prefix: str = "repeat",
+    ):
+        """
+        Finds the regions made of k-mers occurring at least min_copies times, see
+        kmer_spectra.find_repeats. Primers of k bases or more may bind these more than once.
+
+        Returns:
+        - np.ndarray: One (start, end) row per region, in indexes of this strand as stored. With
+            add_annotations, each is also added as an annotation named name_prefix_1, ... .
+        """
+        from src.kmer_spectra import find_repeats
+
+        regions = find_repeats(self.sequence, k, min_copies, canonical, self.circular)
+        if add_annotations:
+            self._add_region_annotations(regions, name_prefix, f"{k}-mer repeat")
+        return regions
+
+    def low_complexity_regions(
+        self,
+        window: int = 64,
+        threshold: float = 20,
+        add_annotations: bool = False,
+        name_prefix: str = "low_complexity",
+    ):
+        """
+        Finds low complexity regions by DUST score, see kmer_spectra.low_complexity_regions.
+        Returns and annotates them as find_repeats does.
+        """
+        from src.kmer_spectra import low_complexity_regions
+
+        regions = low_complexity_regions(self.sequence, window, threshold, self.circular)
+        if add_annotations:
+            self._add_region_annotations(regions, name_prefix, "low complexity")
+        return regions
+
+    def masked_sequence(self, window: int = 64, threshold: float = 20, mask_base: str = "N") -> str:
+        # The sequence with its low complexity regions replaced by mask_base, the strand is unchanged
+        from src.kmer_spectra import mask_regions
+
+        return mask_regions(self.sequence, self.low_complexity_regions(window, threshold), mask_base)
+
+    def domesticate(
+        self,
+        cds_names: Optional[List[str]] = None,
+        codon_usage: Optional[dict] = None,
+        forbidden_motifs: Optional[List[str]] = None,
+        restriction_enzymes: Optional[List[str]] = None,
+        table_id: int = 1,
+        beam_width: int = 64,
+        change_penalty: float = 0.0,
+        in_place: bool = False,
+    ):
+        """
+        Recodes coding annotations with synonymous codons to follow a codon usage table and remove
+        forbidden motifs, see codon_optimizations.CodonOptimizer. Use one CodonOptimizer for
+        batches of strands.
+
+        Returns:
+        - tuple: The edited strand, a copy unless in_place, and one report dict per CDS.
+        """
+        from src.codon_optimizations import CodonOptimizer
+
+        optimizer = CodonOptimizer(codon_usage, forbidden_motifs, restriction_enzymes, table_id,
+                                   beam_width, change_penalty)
+        return optimizer.domesticate(self, cds_names, in_place)
+
+    def view(
+        self,
+        region: Optional[tuple[int, int]] = None,
+        resolution: int = 1000,
+        max_features: int = 150,
+    ) -> None:
+        """
+        Plots the annotations, merging those too small to tell apart and coloring them by name,
+        see sequence_maps.sequence_map. Use sequence_maps.write_map to draw into a file instead.
+        """
+        # Imported here as drawing pulls in matplotlib, which only plotting needs
+        from src.sequence_maps import plot_map, sequence_map
+
+        plot_map(sequence_map(self, region, resolution, max_features), figure_width=5)
 
 
 def transfer_annotations(
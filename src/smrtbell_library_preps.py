@@ -0,0 +1,102 @@
+from itertools import islice
+from typing import Callable, Iterable, Iterator
+
+from src.double_stranded_nucleic_acids import DoubleStrandNucleicAcidSequence
+from src.nucleic_acids import reverse_sequence
+from src.sequence_registry import _bulk_ids
+from src.single_stranded_nucleic_acids import SingleStrandNucleicAcidSequence
+from src.util_classes import NucleicAcidTypes, StrandDirections
+from src.util_functions import validate_chunk_size
+
+
+# Ids are drawn for this many constructs at a time
+_id_batch_size = 1024
+
+
+def smrtbell_constructs(
+    inserts: Iterable[DoubleStrandNucleicAcidSequence],
+    front_adapter_seq: str,
+    back_adapter_seq: str,
+    annotate: bool = False,
+    scan_cut_sites: bool = False,
+) -> Iterator[SingleStrandNucleicAcidSequence]:
+    """
+    Builds the circular SMRTbell construct of each insert lazily, in the same layout as
+    NucleicAcidReaction._perform_pacbio_smrtbell_library_prep: front adapter, insert forward
+    strand, back adapter and insert reverse strand, each read 5'->3'. The adapters are prepared
+    once for all inserts and no features are computed unless asked for.
+
+    Parameters:
+    - inserts (iterable): DoubleStrandNucleicAcidSequence objects, consumed as the generator is.
+    - front_adapter_seq (str): The DNA sequence of the front adapter.
+    - back_adapter_seq (str): The DNA sequence of the back adapter.
+    - annotate (bool): If True, each construct gets front_adapter, insert, back_adapter and
+        insert_reverse annotations.
+    - scan_cut_sites (bool): If True, cut sites are added to each construct.
+
+    Returns:
+    - generator (SingleStrandNucleicAcidSequence): One circular construct per insert.
+    """
+    front_adapter_seq = front_adapter_seq.upper()
+    back_adapter_rev_seq = reverse_sequence(back_adapter_seq.upper())
+    ids = iter(())
+    for index, insert in enumerate(inserts):
+        if not isinstance(insert, DoubleStrandNucleicAcidSequence):
+            raise ValueError(f"Insert {index} must be a DoubleStrandNucleicAcidSequence object.")
+        if insert.nucleic_acid_type != NucleicAcidTypes.DNA.value:
+            raise ValueError(f"Insert {index} cannot be RNA, it must be DNA.")
+        construct_id = next(ids, None)
+        if construct_id is None:
+            ids = iter(_bulk_ids(_id_batch_size))
+            construct_id = next(ids)
+        insert_fwd_seq = insert.forward_sequence.sequence
+        insert_rev_seq = reverse_sequence(insert.reverse_sequence.sequence)
+        construct = SingleStrandNucleicAcidSequence._restore(
+            construct_id,
+            "".join((front_adapter_seq, insert_fwd_seq, back_adapter_rev_seq, insert_rev_seq)),
+            NucleicAcidTypes.DNA.value,
+            True,
+            StrandDirections.FWD_STRAND.value,
+            "",
+        )
+        if annotate:
+            construct.add_annotations(_construct_annotations(
+                len(front_adapter_seq), len(insert_fwd_seq), len(back_adapter_rev_seq), len(insert_rev_seq)))
+        if scan_cut_sites:
+            construct._add_all_cut_sites()
+        yield construct
+
+
+def _construct_annotations(*part_lengths: int) -> list:
+    annotations = []
+    start = 0
+    for name, length in zip(["front_adapter", "insert", "back_adapter", "insert_reverse"], part_lengths):
+        # Single base parts cannot be annotated
+        if length > 1:
+            annotations.append({"name": name, "start": start, "end": start + length - 1})
+        start += length
+    return annotations
+
+
+def write_smrtbell_constructs(
+    constructs: Iterable[SingleStrandNucleicAcidSequence],
+    writer: Callable[[Iterable], object],
+    chunk_size: int = 10000,
+) -> int:
+    """
+    Streams constructs to a writer chunk by chunk, so only chunk_size constructs are held at a
+    time. The writer is any callable taking an iterable of nucleic acids, such as
+    SequenceStore.add or FastaWriter.write.
+
+    Returns:
+    - int: The number of constructs written.
+    """
+    validate_chunk_size(chunk_size)
+    constructs = iter(constructs)
+    count = 0
+    while True:
+        chunk = list(islice(constructs, chunk_size))
+        if not chunk:
+            return count
+        writer(chunk)
+        count += len(chunk)
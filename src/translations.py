@@ -0,0 +1,188 @@
+from functools import lru_cache
+from itertools import product
+from typing import List, Optional
+
+import numpy as np
+
+from src.nucleic_acids import reverse_complement_sequence
+from src.util_classes import IUPACCodes
+
+
+# NCBI genetic codes, codons ordered TTT, TTC, TTA, TTG, TCT, ... GGG
+_codon_order_bases = "TCAG"
+codon_tables = {
+    1: {
+        "name": "Standard",
+        "amino_acids": "FFLLSSSSYY**CC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG",
+        "starts": "---M---------------M---------------M----------------------------",
+    },
+    2: {
+        "name": "Vertebrate Mitochondrial",
+        "amino_acids": "FFLLSSSSYY**CCWWLLLLPPPPHHQQRRRRIIMMTTTTNNKKSS**VVVVAAAADDEEGGGG",
+        "starts": "--------------------------------MMMM---------------M------------",
+    },
+    4: {
+        "name": "Mold, Protozoan, and Coelenterate Mitochondrial and Mycoplasma/Spiroplasma",
+        "amino_acids": "FFLLSSSSYY**CCWWLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG",
+        "starts": "--MM---------------M------------MMMM---------------M------------",
+    },
+    11: {
+        "name": "Bacterial, Archaeal and Plant Plastid",
+        "amino_acids": "FFLLSSSSYY**CC*WLLLLPPPPHHQQRRRRIIIMTTTTNNKKSSRRVVVVAAAADDEEGGGG",
+        "starts": "---M---------------M------------MMMM---------------M------------",
+    },
+}
+
+# Every IUPAC code gets an index below 16, U is read as T
+_iupac_codes = IUPACCodes.list_names()
+_code_indexes = np.full(256, 255, dtype=np.uint8)
+for _index, _code in enumerate(_iupac_codes):
+    _code_indexes[ord(_code)] = _index
+_code_bases = [["T" if base == "U" else base for base in IUPACCodes[code].value] for code in _iupac_codes]
+
+# IUPAC amino acid codes for codons that can only be one of two amino acids
+_ambiguous_amino_acids = {"B": {"D", "N"}, "Z": {"E", "Q"}, "J": {"I", "L"}}
+
+
+@lru_cache(maxsize=None)
+def _codon_lookup(table_id: int):
+    # Amino acid and start flag of every codon of IUPAC codes, indexed by 256 * first + 16 * second + third
+    # code index. Ambiguous codons translate to the amino acid all their codons share, then B, Z or J, else X.
+    if table_id not in codon_tables:
+        raise ValueError(f"Invalid codon table: {table_id}. Options are {list(codon_tables.keys())}")
+    table = codon_tables[table_id]
+    codon_amino_acids, codon_starts = {}, {}
+    for i, codon in enumerate(product(_codon_order_bases, repeat=3)):
+        codon_amino_acids["".join(codon)] = table["amino_acids"][i]
+        codon_starts["".join(codon)] = table["starts"][i] == "M"
+    amino_acids = np.full(16 ** 3, ord("X"), dtype=np.uint8)
+    starts = np.zeros(16 ** 3, dtype=bool)
+    for first, second, third in product(range(16), repeat=3):
+        codons = ["".join(codon) for codon in
+                  product(_code_bases[first], _code_bases[second], _code_bases[third])]
+        codon_index = 256 * first + 16 * second + third
+        translations = {codon_amino_acids[codon] for codon in codons}
+        if len(translations) == 1:
+            amino_acids[codon_index] = ord(translations.pop())
+        else:
+            for ambiguous_amino_acid, options in _ambiguous_amino_acids.items():
+                if translations <= options:
+                    amino_acids[codon_index] = ord(ambiguous_amino_acid)
+        starts[codon_index] = all(codon_starts[codon] for codon in codons)
+    return amino_acids, starts
+
+
+def _encode(sequence: str) -> np.ndarray:
+    encoded = _code_indexes[np.frombuffer(sequence.upper().encode("ascii"), dtype=np.uint8)]
+    if (encoded == 255).any():
+        raise ValueError("Cannot translate, invalid nucleotide found in sequence.")
+    return encoded.astype(np.int64)
+
+
+def _codon_indexes(encoded: np.ndarray, frame: int) -> np.ndarray:
+    codons = encoded[frame:frame + (encoded.size - frame) // 3 * 3].reshape(-1, 3)
+    return codons[:, 0] * 256 + codons[:, 1] * 16 + codons[:, 2]
+
+
+def translate_sequence(sequence: str, table_id: int = 1, to_stop: bool = False) -> str:
+    """
+    Translates a sequence read 5'->3' from its first base, trailing bases of an incomplete codon
+    are ignored. Ambiguity codes translate to the amino acid every codon they stand for agrees on, to
+    B, Z or J when those codons only differ between D/N, E/Q or I/L, and to X otherwise.
+
+    Parameters:
+    - sequence (str): The DNA or RNA sequence.
+    - table_id (int): The NCBI genetic code, see codon_tables.
+    - to_stop (bool): If True, translation ends before the first stop codon.
+
+    Returns:
+    - str: The protein sequence, stops as *.
+    """
+    amino_acids, _ = _codon_lookup(table_id)
+    protein = amino_acids[_codon_indexes(_encode(sequence), 0)].tobytes().decode("ascii")
+    return protein.split("*", 1)[0] if to_stop else protein
+
+
+def _frame_orfs(encoded: np.ndarray, frame: int, table_id: int, min_protein_length: int,
+                first_start: int, last_start: int, max_length: int,
+                max_upstream: Optional[int] = None) -> List[tuple]:
+    # ORFs of one frame as (start, end, protein), from the first start codon after each stop to
+    # the next stop, for starts between first_start and last_start (exclusive). With max_upstream,
+    # a start codon is also first if no start codon is within that many bases before it.
+    amino_acids, starts = _codon_lookup(table_id)
+    codon_indexes = _codon_indexes(encoded, frame)
+    translation = amino_acids[codon_indexes]
+    stops = np.flatnonzero(translation == ord("*"))
+    start_codons = np.flatnonzero(starts[codon_indexes])
+    if not stops.size or not start_codons.size:
+        return []
+    segments = np.searchsorted(stops, start_codons)
+    first_in_segment = np.ones(start_codons.size, dtype=bool)
+    first_in_segment[1:] = segments[1:] != segments[:-1]
+    if max_upstream is not None:
+        first_in_segment[1:] |= 3 * np.diff(start_codons) >= max_upstream
+    start_codons, segments = start_codons[first_in_segment], segments[first_in_segment]
+    has_stop = segments < stops.size
+    start_codons, stop_codons = start_codons[has_stop], stops[segments[has_stop]]
+    positions = frame + 3 * start_codons
+    keep = ((positions >= first_start) & (positions < last_start) &
+            (stop_codons - start_codons >= min_protein_length) & (3 * (stop_codons - start_codons + 1) <= max_length))
+    orfs = []
+    for start_codon, stop_codon in zip(start_codons[keep].tolist(), stop_codons[keep].tolist()):
+        # Alternative start codons are still translated as methionine
+        protein = "M" + translation[start_codon + 1:stop_codon].tobytes().decode("ascii")
+        orfs.append((frame + 3 * start_codon, frame + 3 * stop_codon + 2, protein))
+    return orfs
+
+
+def find_orfs(
+    sequence: str,
+    circular: bool = False,
+    table_id: int = 1,
+    min_protein_length: int = 30,
+    both_strands: bool = True,
+) -> List[dict]:
+    """
+    Finds the open reading frames of a sequence in all six frames in O(n). Each ORF runs from
+    the first start codon after an in-frame stop to the next stop codon, including it. On
+    circular sequences ORFs may run across the origin, but never more than once around, and the
+    stop before them is looked for at most one turn back, so they do not depend on the origin.
+
+    Parameters:
+    - sequence (str): The sequence read 5'->3'.
+    - circular (bool): If True, the sequence is read as a ring.
+    - table_id (int): The NCBI genetic code, see codon_tables.
+    - min_protein_length (int): The fewest amino acids an ORF must encode, the stop not counted.
+    - both_strands (bool): If False, only the three frames of the sequence itself are searched.
+
+    Returns:
+    - list (dict): One dict per ORF with the start and end index (inclusive) of the bases on the
+        sequence, the end is smaller than the start for ORFs across the origin. The lowest index
+        is the start for both strands. Also the strand (1 or -1), the frame (1 to 3) counted from
+        the 5' end of that strand, and the protein.
+    """
+    n = len(sequence)
+    oriented_sequences = [(1, sequence)]
+    if both_strands:
+        oriented_sequences.append((-1, reverse_complement_sequence(sequence)))
+    orfs = []
+    for strand, oriented_sequence in oriented_sequences:
+        if circular:
+            # Unrolled three times around, ORFs start in the middle turn so everything within one
+            # turn before and after them is in view. A ring has no first base, so a start codon is
+            # the first after a stop only looking back at most one turn, wherever the origin is.
+            encoded = _encode(oriented_sequence * 3)
+            first_start, last_start, max_upstream = n, 2 * n, n
+        else:
+            encoded = _encode(oriented_sequence)
+            first_start, last_start, max_upstream = 0, n, None
+        for frame in range(3):
+            for start, end, protein in _frame_orfs(encoded, frame, table_id, min_protein_length,
+                                                   first_start, last_start, n, max_upstream):
+                start, end = start % n, end % n
+                frame_number = start % 3 + 1
+                if strand == -1:
+                    start, end = n - 1 - end, n - 1 - start
+                orfs.append({"start": start, "end": end, "strand": strand, "frame": frame_number,
+                             "protein": protein})
+    return sorted(orfs, key=lambda orf: (orf["start"], orf["strand"]))
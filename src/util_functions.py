@@ -1,7 +1,17 @@
-from typing import Union
+import os
+from functools import lru_cache
+from itertools import islice
+from typing import TYPE_CHECKING, Callable, Iterable, Iterator, Optional, Union
 
+from src.util_classes import IUPACCodes
 
-def kmer_trimming_search(template_seq: str, query_seq: str, trim_front=True) -> Union[int, int]:
+if TYPE_CHECKING:
+    from multiprocessing.pool import Pool
+
+    import numpy as np
+
+
+def kmer_trimming_search(template_seq: str, query_seq: str, trim_front=True, circular=False) -> Union[int, int]:
     """
     Searches for a primer binding site on a template sequence by progressively trimming
     the primer sequence from the start or end until a perfect match is found.
@@ -10,6 +20,8 @@ def kmer_trimming_search(template_seq: str, query_seq: str, trim_front=True) ->
     - template_seq (str): The DNA sequence of the template.
     - primer_seq (str): The DNA sequence of the primer.
     - trim_direction (str): Direction to trim the primer sequence. 'start' or 'end'.
+    - circular (bool): If True, the template is searched as a ring and a match may span its origin,
+        in which case the last base index is smaller than the first.
 
     Returns:
     - tuple (int, int): THe index positions of the first and last base that the query sequence matches
@@ -18,19 +30,160 @@ def kmer_trimming_search(template_seq: str, query_seq: str, trim_front=True) ->
 
     template_seq = template_seq.upper()
     query_seq = query_seq.upper()
+    find = (lambda seq: circular_find(template_seq, seq)) if circular else template_seq.find
     if trim_front:
-        for i in range(len(query_seq)):
-            trimmed_query_seq = query_seq[i:]
-            if trimmed_query_seq in template_seq:
-                start = template_seq.index(trimmed_query_seq)
-                end = template_seq.index(trimmed_query_seq) + len(trimmed_query_seq) - 1
-                return (start, end)
+        trimmed_query_seqs = (query_seq[i:] for i in range(len(query_seq)))
     # return first base index of match 
     else:
-        for i in range(len(query_seq), 0, -1):
-            trimmed_query_seq = query_seq[:i]
-            if trimmed_query_seq in template_seq:
-                start = template_seq.index(trimmed_query_seq)
-                end = template_seq.index(trimmed_query_seq) + len(trimmed_query_seq) - 1
-                return (start, end)
+        trimmed_query_seqs = (query_seq[:i] for i in range(len(query_seq), 0, -1))
+    for trimmed_query_seq in trimmed_query_seqs:
+        start = find(trimmed_query_seq)
+        if start != -1:
+            end = (start + len(trimmed_query_seq) - 1) % len(template_seq)
+            return (start, end)
     return -1
+
+
+def circular_find(template_seq: str, query_seq: str, start: int = 0) -> int:
+    """
+    Finds the first occurrence of a query sequence at or after start on a circular template
+    sequence, like str.find but including occurrences spanning the origin. Only a junction
+    window of the template is copied to search across the origin.
+
+    Parameters:
+    - template_seq (str): The sequence of the circular template.
+    - query_seq (str): The sequence to find, at most as long as the template.
+    - start (int): The first template index an occurrence may start at.
+
+    Returns:
+    - int: The template index the occurrence starts at, or -1 if there is none.
+    """
+    index = template_seq.find(query_seq, start)
+    if index != -1 or start >= len(template_seq) or not 1 < len(query_seq) <= len(template_seq):
+        return index
+    # Any occurrence left starts within the last len(query_seq) - 1 bases and spans the origin
+    junction_start = max(start, len(template_seq) - len(query_seq) + 1)
+    index = ring_slice(template_seq, junction_start, len(template_seq) + len(query_seq) - 1).find(query_seq)
+    return -1 if index == -1 else junction_start + index
+
+
+def ring_slice(sequence: str, start: int, end: int) -> str:
+    # Slice of a circular sequence, end may run past the origin by up to one full turn
+    if end <= len(sequence):
+        return sequence[start:end]
+    return sequence[start:] + sequence[:end - len(sequence)]
+
+
+def least_rotation(sequence: str) -> int:
+    """
+    Finds the rotation of a sequence that is lexicographically smallest using Booth's algorithm,
+    which runs in linear time.
+
+    Parameters:
+    - sequence (str): The sequence to rotate.
+
+    Returns:
+    - int: The index the smallest rotation starts at, sequence[index:] + sequence[:index].
+    """
+    doubled_seq = sequence + sequence
+    failure = [-1] * len(doubled_seq)
+    best = 0
+    for j in range(1, len(doubled_seq)):
+        base = doubled_seq[j]
+        i = failure[j - best - 1]
+        while i != -1 and base != doubled_seq[best + i + 1]:
+            if base < doubled_seq[best + i + 1]:
+                best = j - i - 1
+            i = failure[i]
+        if i == -1 and base != doubled_seq[best + i + 1]:
+            if base < doubled_seq[best + i + 1]:
+                best = j
+            failure[j - best] = -1
+        else:
+            failure[j - best] = i + 1
+    return best
+
+
+@lru_cache(maxsize=None)
+def _iupac_matches() -> "np.ndarray":
+    # [code][base] is True when the unambiguous base (byte) is one the IUPAC code stands for. Built
+    # on first use, numpy is only imported by the functions that need it.
+    import numpy as np
+
+    matches = np.zeros((256, 256), dtype=bool)
+    for code in IUPACCodes:
+        for base in code.value:
+            matches[ord(code.name), ord(base)] = True
+            if base == "T":
+                matches[ord(code.name), ord("U")] = True
+    return matches
+
+
+def _motif_starts(encoded_seq: "np.ndarray", motif: str) -> "np.ndarray":
+    import numpy as np
+
+    match_count = encoded_seq.size - len(motif) + 1
+    if match_count < 1:
+        return np.zeros(0, dtype=np.int64)
+    iupac_matches = _iupac_matches()
+    matches = np.ones(match_count, dtype=bool)
+    for offset, code in enumerate(motif):
+        matches &= iupac_matches[ord(code)][encoded_seq[offset:offset + match_count]]
+    return np.flatnonzero(matches)
+
+
+def find_motif_positions(sequence: str, motif: str, circular: bool = False) -> "np.ndarray":
+    """
+    Finds every (overlapping) occurrence of a motif, which may contain IUPAC codes, with one
+    vectorized comparison per motif base. Ambiguous bases in the sequence never match.
+
+    Parameters:
+    - sequence (str): The sequence to search.
+    - motif (str): The motif, e.g. CCWGG.
+    - circular (bool): If True, occurrences spanning the origin are found too.
+
+    Returns:
+    - np.ndarray: The sorted start index of every occurrence.
+    """
+    import numpy as np
+
+    motif = motif.upper()
+    encoded_seq = np.frombuffer(sequence.upper().encode("ascii"), dtype=np.uint8)
+    starts = _motif_starts(encoded_seq, motif)
+    if circular and 1 < len(motif) <= len(sequence):
+        junction_start = len(sequence) - len(motif) + 1
+        junction = np.concatenate((encoded_seq[junction_start:], encoded_seq[:len(motif) - 1]))
+        starts = np.concatenate((starts, _motif_starts(junction, motif) + junction_start))
+    return starts
+
+
+def validate_chunk_size(chunk_size) -> None:
+    if not isinstance(chunk_size, int) or chunk_size < 1:
+        raise ValueError("Chunk size must be a positive integer.")
+
+
+def imap_windows(pool: "Pool", function: Callable, jobs: Iterable, processes: Optional[int],
+                 chunksize: int = 1) -> Iterator:
+    """
+    Runs function on every job across a process pool, in the order of jobs. Jobs are handed to
+    the pool a window of four tasks per process at a time, so huge or lazy iterables are only
+    read as needed and never fully queued.
+
+    Parameters:
+    - pool (multiprocessing.pool.Pool): The pool to run the jobs in.
+    - function (callable): Called with each job in a worker, must be picklable.
+    - jobs (iterable): The jobs, consumed lazily.
+    - processes (int): The number of processes of the pool, None for one per CPU.
+    - chunksize (int): Number of jobs sent to a worker at a time.
+
+    Returns:
+    - generator: The result of every job.
+    """
+    validate_chunk_size(chunksize)
+    window_size = chunksize * (processes or os.cpu_count() or 1) * 4
+    jobs = iter(jobs)
+    while True:
+        window = list(islice(jobs, window_size))
+        if not window:
+            return
+        yield from pool.imap(function, window, chunksize=chunksize)
@@ -0,0 +1,257 @@
+import csv
+import os
+from typing import Iterable, List, NamedTuple, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from src.double_stranded_nucleic_acids import DoubleStrandNucleicAcidSequence
+from src.restriction_enzyme_cutsites import restriction_enzyme_types
+from src.single_stranded_nucleic_acids import SingleStrandNucleicAcidSequence
+
+
+# Fragment sizes of common ladders, in bp
+ladders = {
+    "1kb": (10000, 8000, 6000, 5000, 4000, 3000, 2000, 1500, 1000, 500),
+    "1kb_plus": (10000, 8000, 6000, 5000, 4000, 3000, 2000, 1500, 1200, 1000, 900, 800, 700, 600, 500,
+                 400, 300, 200, 100),
+    "100bp": (1517, 1200, 1000, 900, 800, 700, 600, 500, 400, 300, 200, 100),
+}
+# Sizes each agarose percentage separates well, the smallest and largest in bp
+_agarose_ranges = {
+    0.5: (1000, 30000),
+    0.7: (800, 12000),
+    1.0: (500, 10000),
+    1.2: (400, 7000),
+    1.5: (200, 3000),
+    2.0: (50, 2000),
+}
+gel_formats = ["svg", "png", "pdf"]
+
+
+class GelModel(NamedTuple):
+    """
+    Agarose gel run, lengths in mm. Migration is sigmoid in log size: fragments in the range the
+    agarose percentage separates spread over the middle 80% of the run, larger ones bunch up near
+    the wells and smaller ones near the dye front, as on a real gel.
+    """
+    agarose_percent: float = 1.0
+    run_length: float = 60.0
+    band_width: float = 1.0
+
+    def resolution_range(self) -> Tuple[float, float]:
+        # The separated range, interpolated in log size between the tabulated percentages
+        percents = sorted(_agarose_ranges)
+        if not percents[0] <= self.agarose_percent <= percents[-1]:
+            raise ValueError(f"Agarose percentage must be between {percents[0]} and {percents[-1]}.")
+        low = np.interp(self.agarose_percent, percents, [np.log10(_agarose_ranges[p][0]) for p in percents])
+        high = np.interp(self.agarose_percent, percents, [np.log10(_agarose_ranges[p][1]) for p in percents])
+        return float(10 ** low), float(10 ** high)
+
+    def migration(self, sizes) -> np.ndarray:
+        """
+        Distance from the well, in mm, of fragments of the given sizes.
+        """
+        low, high = self.resolution_range()
+        middle = np.sqrt(low * high)
+        # The largest separated size runs 10% of the way, the smallest 90%
+        steepness = np.log(9) / np.log(high / middle)
+        return self.run_length / (1 + (np.asarray(sizes, dtype=np.float64) / middle) ** steepness)
+
+
+class VirtualGel(NamedTuple):
+    """
+    Bands of every lane of a gel as flat arrays, one entry per fragment, so whole plates are
+    computed and drawn with array operations. Lane 0 is the ladder.
+    """
+    names: Tuple[str, ...]
+    lanes: np.ndarray
+    sizes: np.ndarray
+    distances: np.ndarray
+    model: GelModel
+
+    def bands(self, lane: int) -> List[Tuple[int, float]]:
+        # (size, distance) of each fragment of a lane, slowest first
+        selected = self.lanes == lane
+        order = np.argsort(self.distances[selected], kind="stable")
+        return [(int(size), float(distance)) for size, distance in
+                zip(self.sizes[selected][order], self.distances[selected][order])]
+
+
+def digest_fragments(nucleic_acid, enzymes: Optional[Iterable[str]] = None) -> List[int]:
+    """
+    Sizes of the fragments a digest makes, from the cut sites found on the strand, so
+    scan_cut_sites has to have run. Double strands are cut at the sites of their forward strand.
+    A circular sequence cut n times makes n fragments, uncut it stays one molecule of its length.
+
+    Parameters:
+    - nucleic_acid: A SingleStrandNucleicAcidSequence or DoubleStrandNucleicAcidSequence.
+    - enzymes (iterable of str): Enzymes of the digest, all the enzymes that cut when None.
+
+    Returns:
+    - list (int): Fragment sizes, largest first.
+    """
+    strand = nucleic_acid.forward_sequence if isinstance(nucleic_acid, DoubleStrandNucleicAcidSequence) \
+        else nucleic_acid
+    if not isinstance(strand, SingleStrandNucleicAcidSequence):
+        raise ValueError("Digests can only be made of SingleStrandNucleicAcidSequence or "
+                         "DoubleStrandNucleicAcidSequence objects.")
+    if enzymes is not None:
+        enzymes = set(enzymes)
+        invalid = enzymes - set(restriction_enzyme_types)
+        if invalid:
+            raise ValueError(f"Invalid restriction enzymes: {sorted(invalid)}. "
+                             f"Options are {list(restriction_enzyme_types)}")
+    n = len(strand)
+    # Each enzyme cuts between its cut position and the next base
+    cuts = sorted({cut_site.cut_position for cut_site in strand.cut_sites.values()
+                   if enzymes is None or cut_site.restriction_enzyme in enzymes})
+    if not cuts:
+        return [n]
+    if strand.circular:
+        sizes = np.diff(cuts + [cuts[0] + n])
+    else:
+        sizes = np.diff([-1] + cuts + [n - 1])
+    return sorted((int(size) for size in sizes if size > 0), reverse=True)
+
+
+def _fragment_sizes(lane) -> List[int]:
+    # A lane is one fragment or an iterable of them: sizes, nucleic acids, or products as
+    # in_silico_pcr.electronic_pcr reports them
+    if isinstance(lane, (int, np.integer)):
+        return [int(lane)]
+    if isinstance(lane, DoubleStrandNucleicAcidSequence):
+        return [len(lane.forward_sequence)]
+    if isinstance(lane, SingleStrandNucleicAcidSequence):
+        return [len(lane)]
+    if isinstance(lane, dict):
+        if "size" not in lane:
+            raise ValueError("PCR products in a lane must have a size.")
+        return [int(lane["size"])]
+    if isinstance(lane, str):
+        raise ValueError("Lanes take fragment sizes, nucleic acids or PCR products, not sequences.")
+    return [size for fragment in lane for size in _fragment_sizes(fragment)]
+
+
+def run_gel(
+    lanes: Iterable,
+    ladder: Union[str, Sequence[int]] = "1kb",
+    model: Optional[GelModel] = None,
+    names: Optional[Sequence[str]] = None,
+) -> VirtualGel:
+    """
+    Runs every lane on one gel, e.g. the digests of a plate of minipreps, with the ladder in
+    lane 0. The fragments of all lanes are gathered into one array and migrated in one call.
+
+    Parameters:
+    - lanes (iterable): One entry per lane, each a fragment or an iterable of fragments. A
+        fragment is a size in bp, a SingleStrandNucleicAcidSequence or
+        DoubleStrandNucleicAcidSequence, such as the pcr_construct of a PCR reaction, or a
+        product dict of in_silico_pcr.electronic_pcr. digest_fragments gives the lane of a digest.
+    - ladder (str or sequence of int): One of ladders, or the sizes of a custom ladder.
+    - model (GelModel): The gel, a 1% agarose gel by default.
+    - names (sequence of str): Names of the sample lanes, numbered from 1 by default.
+
+    Returns:
+    - VirtualGel: The bands, ready for band_matrix, plot_gel, write_gel or write_bands.
+    """
+    model = model or GelModel()
+    if isinstance(ladder, str):
+        if ladder not in ladders:
+            raise ValueError(f"Invalid ladder: {ladder}. Options are {list(ladders)}")
+        ladder_name, ladder_sizes = ladder, ladders[ladder]
+    else:
+        ladder_name, ladder_sizes = "ladder", tuple(ladder)
+    lane_sizes = [list(ladder_sizes)] + [_fragment_sizes(lane) for lane in lanes]
+    if names is None:
+        names = [str(number) for number in range(1, len(lane_sizes))]
+    elif len(names) != len(lane_sizes) - 1:
+        raise ValueError(f"Got {len(names)} lane names for {len(lane_sizes) - 1} lanes.")
+    counts = [len(sizes) for sizes in lane_sizes]
+    sizes = np.fromiter((size for sizes in lane_sizes for size in sizes), dtype=np.int64, count=sum(counts))
+    if (sizes < 1).any():
+        raise ValueError("Fragment sizes must be positive.")
+    lane_indexes = np.repeat(np.arange(len(lane_sizes), dtype=np.int32), counts)
+    return VirtualGel((ladder_name,) + tuple(names), lane_indexes, sizes, model.migration(sizes), model)
+
+
+def band_matrix(gel: VirtualGel, pixels_per_mm: float = 4.0) -> np.ndarray:
+    """
+    Renders the gel as a (lanes, rows) array of band intensities from 0 to 1, each row
+    1 / pixels_per_mm mm further from the wells. Stain binds along the whole fragment, so bands
+    are as bright as their size, fragments of one size in a lane add up, and each band is
+    blurred by a Gaussian of the model band width.
+    """
+    rows = int(np.ceil(gel.model.run_length * pixels_per_mm)) + 1
+    row_indexes = np.clip(np.rint(gel.distances * pixels_per_mm).astype(np.int64), 0, rows - 1)
+    matrix = np.bincount(gel.lanes.astype(np.int64) * rows + row_indexes, weights=gel.sizes,
+                         minlength=len(gel.names) * rows).reshape(len(gel.names), rows)
+    sigma = gel.model.band_width * pixels_per_mm / 2
+    radius = int(np.ceil(3 * sigma))
+    if radius:
+        kernel = np.exp(-0.5 * (np.arange(-radius, radius + 1) / sigma) ** 2)
+        padded = np.pad(matrix, ((0, 0), (radius, radius)))
+        # One shifted add per kernel offset, each over every lane at once
+        matrix = sum(weight * padded[:, offset:offset + rows] for offset, weight in enumerate(kernel))
+    peak = matrix.max()
+    return matrix / peak if peak > 0 else matrix
+
+
+def plot_gel(gel: VirtualGel, ax=None, pixels_per_mm: float = 4.0, lane_width: float = 0.4):
+    """
+    Draws the gel on a matplotlib axis, bright bands on black with the ladder sizes marked, on
+    a new pyplot figure when no axis is given.
+
+    Returns:
+    - The axis drawn on.
+    """
+    if ax is None:
+        # Imported here as only drawing on a new figure needs pyplot
+        import matplotlib.pyplot as plt
+
+        _, ax = plt.subplots(figsize=(1 + lane_width * len(gel.names), 4))
+    matrix = band_matrix(gel, pixels_per_mm)
+    # Each lane is three columns of bands and one of gel between lanes, bands are shown with a
+    # gamma, as a camera would, so faint bands stay visible next to bright ones
+    image = np.zeros((matrix.shape[1], len(gel.names), 4))
+    image[:, :, :3] = np.sqrt(matrix.T)[:, :, None]
+    ax.imshow(image.reshape(matrix.shape[1], -1), cmap="gray", aspect="auto", interpolation="nearest",
+              vmin=0, vmax=1, extent=(-0.375, len(gel.names) - 0.375, gel.model.run_length, 0))
+    ax.set_xticks(range(len(gel.names)))
+    ax.set_xticklabels(gel.names, rotation=90)
+    ladder = gel.bands(0)
+    ax.set_yticks([distance for _, distance in ladder])
+    ax.set_yticklabels([str(size) for size, _ in ladder])
+    ax.set_ylabel("bp")
+    return ax
+
+
+def write_gel(gel: VirtualGel, path: str, pixels_per_mm: float = 4.0, dpi: int = 150) -> str:
+    """
+    Draws the gel into an SVG, PNG or PDF file, the format following the file extension, off
+    screen with the Agg renderer as sequence_maps.write_map does.
+    """
+    file_format = os.path.splitext(path)[1][1:].lower()
+    if file_format not in gel_formats:
+        raise ValueError(f"Invalid gel format: {file_format}. Options are {gel_formats}")
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    figure = Figure(figsize=(1 + 0.4 * len(gel.names), 4))
+    FigureCanvasAgg(figure)
+    plot_gel(gel, ax=figure.add_subplot(), pixels_per_mm=pixels_per_mm)
+    figure.savefig(path, format=file_format, dpi=dpi, bbox_inches="tight")
+    return path
+
+
+def write_bands(gel: VirtualGel, path: str) -> str:
+    """
+    Writes every band to a CSV file with its lane, lane name, size and distance in mm, lane by
+    lane and slowest first.
+    """
+    order = np.lexsort((gel.distances, gel.lanes))
+    with open(path, "w", newline="") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(["lane", "name", "size", "distance"])
+        writer.writerows([int(gel.lanes[i]), gel.names[gel.lanes[i]], int(gel.sizes[i]), round(float(gel.distances[i]), 3)]
+                         for i in order)
+    return path
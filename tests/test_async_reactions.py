@@ -0,0 +1,101 @@
+import asyncio
+import time
+
+import pytest
+
+from src.async_reactions import AsyncReactionRunner
+from src.double_stranded_nucleic_acids import DoubleStrandNucleicAcidSequence
+from src.read_simulations import SimulatedRead
+from src.sequence_registry import get_nucleic_acid
+from src.single_stranded_nucleic_acids import SingleStrandNucleicAcidSequence
+
+template_seq = "ATGCGTACGTTAGCATGCAAATTGCCGATCGATCGG"
+
+
+def _pcr_job(reverse_primer_seq="GCTAGCTAGCC"):
+    inputs = {"template": DoubleStrandNucleicAcidSequence(forward_sequence=template_seq),
+              "forward_primer": SingleStrandNucleicAcidSequence(sequence="ATGCGTACG"),
+              "reverse_primer": SingleStrandNucleicAcidSequence(sequence=reverse_primer_seq)}
+    return "pcr", inputs, {}
+
+
+def test_reactions_run_in_worker_processes():
+    async def run():
+        async with AsyncReactionRunner(processes=2, max_concurrency=2) as runner:
+            reaction_type, inputs, kwargs = _pcr_job()
+            reaction = await runner.run_reaction(reaction_type, inputs, **kwargs)
+            product = reaction.outputs["pcr_construct"]
+            assert product.forward_sequence.sequence == template_seq
+            assert reaction.inputs is inputs
+            # Products made in a worker resolve by id like any other
+            assert get_nucleic_acid(product.id) is product
+            reactions = [reaction async for reaction in runner.map_reactions(_pcr_job() for _ in range(5))]
+            assert len(reactions) == 5
+            with pytest.raises(NotImplementedError):
+                await runner.run_reaction("unknown", {})
+        with pytest.raises(RuntimeError):
+            await runner.run_reaction(*_pcr_job()[:2])
+
+    asyncio.run(run())
+
+
+def test_map_reactions_applies_backpressure_and_cancels():
+    taken = []
+
+    async def jobs():
+        for number in range(20):
+            taken.append(number)
+            yield _pcr_job()
+
+    async def run():
+        async with AsyncReactionRunner(processes=0, max_concurrency=3) as runner:
+            reactions = runner.map_reactions(jobs())
+            await reactions.__anext__()
+            # Only a window of max_concurrency jobs is taken ahead of the consumer
+            assert len(taken) <= 4
+            await reactions.aclose()
+            assert len(taken) <= 4
+            # A caller cancelled while waiting for a slot never runs its reaction
+            blockers = [asyncio.create_task(runner.run_reaction(*_pcr_job()[:2])) for _ in range(3)]
+            waiting = asyncio.create_task(runner.run_reaction(*_pcr_job()[:2]))
+            await asyncio.sleep(0)
+            waiting.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await waiting
+            assert all(reaction.outputs for reaction in await asyncio.gather(*blockers))
+            assert not runner._slots.locked()
+
+    asyncio.run(run())
+
+
+def test_sequence_files_are_read_and_written_off_the_loop(tmp_path):
+    strands = [SingleStrandNucleicAcidSequence(sequence=template_seq[:10 + number], note=f"strand {number}")
+               for number in range(7)]
+    reads = [SimulatedRead(f"read{number}", "ACGT", "IIII", "construct", "subread") for number in range(3)]
+
+    async def run():
+        beats = []
+
+        async def heartbeat():
+            while True:
+                beats.append(time.perf_counter())
+                await asyncio.sleep(0)
+
+        async with AsyncReactionRunner(processes=0) as runner:
+            beat_task = asyncio.create_task(heartbeat())
+            assert await runner.write_fasta(str(tmp_path / "strands.fasta"), strands) == 7
+            assert await runner.write_fastq(str(tmp_path / "reads.fastq"), reads) == 3
+            records = await runner.read_fasta(str(tmp_path / "strands.fasta"))
+            assert [sequence for _, sequence in records] == [strand.sequence for strand in strands]
+            batches = [batch async for batch in runner.iter_fasta(str(tmp_path / "strands.fasta"), batch_size=3)]
+            assert [len(batch) for batch in batches] == [3, 3, 1]
+            assert [record.name for record in await runner.read_fastq(str(tmp_path / "reads.fastq"))] == \
+                ["read0", "read1", "read2"]
+            async for batch in runner.iter_fastq(str(tmp_path / "reads.fastq"), batch_size=2):
+                assert len(batch) == 2
+                break
+            beat_task.cancel()
+        # The loop kept running while the files were read and written
+        assert len(beats) > 1
+
+    asyncio.run(run())
@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from src.batch_runner import main, read_manifest, run_batch
+
+template_seq = "ATGCGTACGTTAGCATGCAAATTGCCGATCGATCGG"
+
+
+def _results(output_dir):
+    with open(output_dir / "results.jsonl") as handle:
+        return [json.loads(line) for line in handle]
+
+
+def test_manifest_steps_feed_each_other(tmp_path):
+    (tmp_path / "templates.fasta").write_text(f">plasmid circular\n{template_seq}\n>linear\n{template_seq}\n")
+    manifest = {
+        "sequences": ["templates.fasta", {"name": "fwd", "sequence": "ATGCGTACG"}],
+        "steps": [
+            {"name": "pcr", "reaction_type": "pcr",
+             "inputs": {"template": "$template", "forward_primer": "fwd", "reverse_primer": "$reverse_primer"}},
+            {"name": "check", "reaction_type": "electronic_pcr",
+             "inputs": {"templates": ["$pcr.pcr_construct", "$template"], "forward_primer": "fwd",
+                        "reverse_primer": "$reverse_primer"},
+             "kwargs": {"include_sequences": False}},
+        ],
+        "items": [{"id": "a", "template": "linear", "reverse_primer": "GCTAGCTAGCC"},
+                  {"id": "b", "template": "plasmid", "reverse_primer": "GCTAGC"}],
+    }
+    (tmp_path / "manifest.json").write_text(json.dumps(manifest))
+    sequences, steps, items = read_manifest(str(tmp_path / "manifest.json"))
+    assert sequences["plasmid"] == (template_seq, True) and sequences["linear"] == (template_seq, False)
+    stats = run_batch(sequences, steps, items, str(tmp_path / "out"))
+    assert (stats["done"], stats["failed"], stats["skipped"]) == (2, 0, 0)
+    results = _results(tmp_path / "out")
+    assert [result["id"] for result in results] == ["a", "b"]
+    assert results[0]["outputs"]["pcr"]["pcr_construct"]["length"] == len(template_seq)
+    assert [product["size"] for product in results[0]["outputs"]["check"]["pcr_products"]] == \
+        [len(template_seq)] * 2
+    products = (tmp_path / "out" / "products.fasta").read_text()
+    assert products.startswith(">a/pcr/pcr_construct ") and products.count(">") == 2
+    assert results[-1]["products_offset"] == len(products)
+
+
+def test_csv_items_resume_after_interruption(tmp_path):
+    rows = ["id,reaction_type,template,forward_primer,reverse_primer,kwargs"]
+    rows += [f"item{number},pcr,{template_seq},ATGCGTACG,GCTAGCTAGCC," for number in range(6)]
+    rows.append(f'bad,pcr,{template_seq},NOT_A_PRIMER,GCTAGCTAGCC,"{{""keep_primer_annotations"": true}}"')
+    (tmp_path / "items.csv").write_text("\n".join(rows) + "\n")
+    output_dir = tmp_path / "out"
+    stats = run_batch(*read_manifest(str(tmp_path / "items.csv")), str(output_dir))
+    assert (stats["done"], stats["failed"]) == (6, 1)
+    results = _results(output_dir)
+    assert results[-1]["status"] == "failed" and "NOT_A_PRIMER" in results[-1]["error"]
+    # An interruption leaves a result cut short and products of an item without a result
+    lines = (output_dir / "results.jsonl").read_text().splitlines(keepends=True)
+    (output_dir / "results.jsonl").write_text("".join(lines[:3]) + lines[3][:20])
+    with open(output_dir / "products.fasta", "a") as handle:
+        handle.write(">item3/pcr/pcr_construct\nACGT\n")
+    stats = run_batch(*read_manifest(str(tmp_path / "items.csv")), str(output_dir), processes=2, chunksize=1)
+    assert (stats["done"], stats["failed"], stats["skipped"]) == (3, 1, 3)
+    assert [result["id"] for result in _results(output_dir)] == [f"item{number}" for number in range(6)] + ["bad"]
+    assert (output_dir / "products.fasta").read_text().count(">") == 6
+    stats = run_batch(*read_manifest(str(tmp_path / "items.csv")), str(output_dir))
+    assert (stats["done"], stats["failed"], stats["skipped"]) == (0, 0, 7)
+    stats = run_batch(*read_manifest(str(tmp_path / "items.csv")), str(output_dir), retry_failed=True)
+    assert (stats["failed"], stats["skipped"]) == (1, 6)
+
+
+def test_command_line_with_yaml_manifest(tmp_path, capsys):
+    pytest.importorskip("yaml")
+    (tmp_path / "manifest.yaml").write_text(
+        "sequences:\n"
+        f"  - {{name: template, sequence: {template_seq}}}\n"
+        "items:\n"
+        "  - {id: one, reaction_type: pcr, template: template, forward_primer: ATGCGTACG,"
+        " reverse_primer: GCTAGCTAGCC}\n"
+        "  - {id: one, reaction_type: pcr, template: template, forward_primer: ATGCGTACG,"
+        " reverse_primer: GCTAGCTAGCC}\n"
+    )
+    with pytest.raises(ValueError, match="more than once"):
+        main([str(tmp_path / "manifest.yaml"), "--output-dir", str(tmp_path / "out"), "--processes", "1"])
+    assert [result["id"] for result in _results(tmp_path / "out")] == ["one"]
+    (tmp_path / "manifest.yaml").write_text((tmp_path / "manifest.yaml").read_text().replace("id: one", "id: two", 1)
+                                            .replace("id: one", "id: three"))
+    assert main([str(tmp_path / "manifest.yaml"), "--output-dir", str(tmp_path / "out"), "--restart"]) == 0
+    assert [result["id"] for result in _results(tmp_path / "out")] == ["two", "three"]
+    assert "2 done, 0 failed, 0 skipped" in capsys.readouterr().err
@@ -0,0 +1,68 @@
+import pytest
+
+from src.codon_optimizations import CodonOptimizer
+from src.nucleic_acids import reverse_sequence
+from src.single_stranded_nucleic_acids import SingleStrandNucleicAcidSequence
+from src.translations import translate_sequence
+
+
+def test_optimize_follows_codon_usage_and_avoids_motifs():
+    optimizer = CodonOptimizer(forbidden_motifs=[])
+    assert optimizer.optimize("ATGCTTCTTTAG") == "ATGCTGCTGTAA"
+    optimizer = CodonOptimizer(restriction_enzymes=["HindIII"])
+    # The best codons for K and L would make AAGCTT
+    assert optimizer.optimize("ATGAAGCTTCTT") == "ATGAAACTGCTG"
+    # Motifs across the ends count, the contexts themselves are left alone
+    recoded = optimizer.optimize("ATGCTT", left_context="AAGCTTAAG")
+    assert recoded == "ATGCTG"
+    recoded = optimizer.optimize("ATGAAA", right_context="GCTT")
+    assert "AAGCTT" not in recoded + "GCTT"
+    # A motif the fixed start codon forces is left, the rest is still recoded
+    assert CodonOptimizer(forbidden_motifs=["ATGG"]).optimize("ATGGAACTT") == "ATGGAACTG"
+    with pytest.raises(ValueError):
+        optimizer.optimize("ATGAA")
+    with pytest.raises(ValueError):
+        CodonOptimizer(forbidden_motifs=["GAXTC"])
+
+
+def test_domesticate_keeps_annotations_and_protein():
+    cds = "ATGGAATTCAAAGGATCCCTGTAA"
+    strand = SingleStrandNucleicAcidSequence(
+        sequence="TT" + cds + "GG",
+        annotations=[{"name": "gene", "start": 2, "end": 25, "note": "CDS gene"},
+                     {"name": "tag", "start": 5, "end": 10, "note": ""}],
+    )
+    edited, reports = strand.domesticate()
+    assert strand.sequence == "TT" + cds + "GG"
+    assert translate_sequence(edited.sequence[2:26]) == translate_sequence(cds)
+    assert edited.cut_sites == {}
+    assert reports == [{"name": "gene", "codons_changed": 3, "forbidden_sites": []}]
+    assert (edited.annotations["gene"].start, edited.annotations["gene"].end) == (2, 25)
+    assert set(edited.annotations) == {"gene", "tag"}
+    # Reverse strands are recoded as read 5'->3'
+    reverse_strand = SingleStrandNucleicAcidSequence(
+        sequence=reverse_sequence("TT" + cds + "GG"), strand_direction="reverse",
+        annotations=[{"name": "gene", "start": 2, "end": 25, "note": "CDS"}],
+    )
+    edited_reverse, _ = reverse_strand.domesticate()
+    assert reverse_sequence(edited_reverse.sequence) == edited.sequence
+
+
+def test_domesticate_all_shares_one_optimizer():
+    optimizer = CodonOptimizer(restriction_enzymes=["EcoRI", "BamHI"])
+    strands = [
+        SingleStrandNucleicAcidSequence(
+            sequence="ATG" + "GAATTC" * copies + "GGATCCTAA",
+            annotations=[{"name": "cds", "start": 0, "end": 6 * copies + 11, "note": "CDS"}],
+        )
+        for copies in range(1, 6)
+    ]
+    results = list(optimizer.domesticate_all(strands))
+    steps = len(optimizer._steps)
+    assert [reports[0]["codons_changed"] for _, reports in results] == [3, 4, 5, 6, 7]
+    assert all(not edited.cut_sites for edited, _ in results)
+    assert all(translate_sequence(edited.sequence) == translate_sequence(strand.sequence)
+               for (edited, _), strand in zip(results, strands))
+    # The codon steps checked for the first strands are reused
+    list(optimizer.domesticate_all(strands))
+    assert len(optimizer._steps) == steps
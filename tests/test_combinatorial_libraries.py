@@ -0,0 +1,56 @@
+from itertools import islice
+
+import pytest
+
+from src.combinatorial_libraries import enumerate_library, library_size
+from src.single_stranded_nucleic_acids import SingleStrandNucleicAcidSequence
+
+slots = [
+    {"pro1": "TTGACAGAATTCTATAAT", "pro2": "TTTACAGCTAGCTATAAT"},
+    {"rbs1": "AGGAGC", "rbs2": "AGGA"},
+    {"cds1": "CATGGCTAAATAA", "cds2": "ATGCGGCCGCTAA"},
+]
+
+
+def _cut_sites(strand):
+    return {start: (cut_site.restriction_enzyme, cut_site.end) for start, cut_site in strand.cut_sites.items()}
+
+
+def test_enumerate_library():
+    assert library_size(slots) == 8
+    variants = list(enumerate_library(slots))
+    assert len(variants) == 8
+    assert [variant.note for variant in variants[:3]] == [
+        "pro1 + rbs1 + cds1", "pro1 + rbs1 + cds2", "pro1 + rbs2 + cds1"]
+    assert len({variant.id for variant in variants}) == 8
+    for variant in variants:
+        names = variant.note.split(" + ")
+        assert variant.forward_sequence.sequence == "".join(slots[slot][name] for slot, name in enumerate(names))
+        for strand in (variant.forward_sequence, variant.reverse_sequence):
+            scanned = SingleStrandNucleicAcidSequence(sequence=strand.sequence, strand_direction=strand.strand_direction)
+            assert _cut_sites(strand) == _cut_sites(scanned)
+    # CCATGG only exists across the rbs1 and cds1 junction
+    assert _cut_sites(variants[0].forward_sequence)[23] == ("NcoI", 28)
+    annotations = variants[0].forward_sequence.annotations
+    assert [(name, annot.start, annot.end) for name, annot in annotations.items()] == [
+        ("pro1", 0, 17), ("rbs1", 18, 23), ("cds1", 24, 36)]
+
+
+def test_enumerate_circular_library():
+    variants = list(enumerate_library([{"a": "CGCGAATTCAAAAAAAAA"}, {"b": "TTTTTTTTTTGCGGC", "c": "TTTTTTTTTT"}],
+                                      circular=True, annotate=False))
+    assert all(variant.circular for variant in variants)
+    # NotI across the origin of the first variant only
+    assert _cut_sites(variants[0].forward_sequence) == {3: ("EcoRI", 8), 28: ("NotI", 2)}
+    assert _cut_sites(variants[1].forward_sequence) == {3: ("EcoRI", 8)}
+    assert variants[0].forward_sequence.annotations == {}
+
+
+def test_enumerate_library_is_lazy_and_validates():
+    huge = [{f"part{i}": "ACGT" for i in range(100)}] * 3
+    assert library_size(huge) == 10 ** 6
+    assert len(list(islice(enumerate_library(huge, scan_cut_sites=False), 5))) == 5
+    with pytest.raises(ValueError):
+        list(enumerate_library([{"bad": "ACGU"}]))
+    with pytest.raises(ValueError):
+        list(enumerate_library([{}]))
@@ -0,0 +1,113 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.double_stranded_nucleic_acids import DoubleStrandNucleicAcidSequence
+from src.single_stranded_nucleic_acids import SingleStrandNucleicAcidSequence
+
+
+def _strand():
+    return SingleStrandNucleicAcidSequence(
+        sequence="ATGCGAATTCAAGGATCCTTGA",
+        annotations=[{"name": "site", "start": 4, "end": 9, "note": ""}],
+    )
+
+
+def test_copy_is_independent_of_original():
+    original = _strand()
+    strand_copy = original.copy()
+    assert strand_copy.id != original.id
+    assert strand_copy.sequence == original.sequence
+    strand_copy.insert(0, "GGG")
+    strand_copy.remove_annotations(["site"])
+    assert original.sequence == "ATGCGAATTCAAGGATCCTTGA"
+    assert set(original.annotations) == {"site"}
+    assert sorted(original.cut_sites) == [4, 12]
+    assert sorted(strand_copy.cut_sites) == [7, 15]
+    # Features of a copy belong to the copy
+    original.delete(0, 1)
+    assert original.annotations["site"].start == 3
+    assert all(cut_site._parent_nucleic_acid_sequence_id == strand_copy.id
+               for cut_site in strand_copy.cut_sites.values())
+    assert strand_copy.copy().annotations == {}
+
+
+def test_snapshot_is_read_only_and_unchanged_by_edits():
+    strand = _strand()
+    snapshot = strand.snapshot()
+    assert snapshot.id == strand.id
+    with pytest.raises(Exception, match="read-only"):
+        snapshot.insert(0, "A")
+    with pytest.raises(Exception, match="read-only"):
+        snapshot.note = "edited"
+    with pytest.raises(TypeError):
+        snapshot._annotations["other"] = None
+    for edit in (lambda: snapshot.add_annotations([{"name": "other", "start": 0, "end": 2}]),
+                 lambda: snapshot.edit_annotation("site", note="edited"),
+                 lambda: snapshot.remove_annotations(["site"]),
+                 lambda: snapshot.add_base_modifications([{"position": 4, "modification_type": "6mA"}])):
+        with pytest.raises(Exception, match="read-only"):
+            edit()
+    # Reading the hash does not cache it on the snapshot
+    assert snapshot.content_hash == strand.content_hash
+    assert snapshot._content_hash == (None, None)
+    double_strand = DoubleStrandNucleicAcidSequence(forward_sequence="ATGCGAATTCAAGGATCCTTGA")
+    double_snapshot = double_strand.snapshot()
+    assert double_snapshot.content_hash == double_strand.content_hash
+    assert double_snapshot._content_hash == (None, None)
+    strand.insert(0, "GG")
+    strand.remove_annotations(["site"])
+    assert snapshot.sequence == "ATGCGAATTCAAGGATCCTTGA"
+    assert snapshot.annotations["site"].start == 4
+    assert sorted(snapshot.cut_sites) == [4, 12]
+    # A copy of a snapshot can be edited again
+    editable = snapshot.copy()
+    editable.insert(0, "T")
+    assert editable.sequence == "TATGCGAATTCAAGGATCCTTGA"
+
+
+def test_snapshot_reads_from_thread_pool():
+    strand = SingleStrandNucleicAcidSequence(sequence="GAATTC" * 200, circular=True)
+    strand.rotate(3)
+    snapshot = strand.snapshot()
+    expected = (snapshot.sequence, snapshot.content_hash, sorted(snapshot.cut_sites))
+
+    def read(_):
+        return snapshot.sequence, snapshot.content_hash, sorted(snapshot.cut_sites)
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        results = list(pool.map(read, range(64)))
+    assert all(result == expected for result in results)
+
+
+def test_double_strand_unlock_is_per_thread():
+    ds = DoubleStrandNucleicAcidSequence("ATGCGAATTCAAGGATCC")
+    errors = []
+
+    def edit_strand_directly():
+        try:
+            ds.forward_sequence.insert(0, "A")
+        except Exception as error:
+            errors.append(error)
+
+    with ds.forward_sequence._unlocked():
+        thread = threading.Thread(target=edit_strand_directly)
+        thread.start()
+        thread.join()
+    assert len(errors) == 1
+    assert ds.forward_sequence.sequence == "ATGCGAATTCAAGGATCC"
+
+
+def test_double_strand_copy_and_snapshot():
+    ds = DoubleStrandNucleicAcidSequence("ATGCGAATTCAAGGATCC", note="plasmid")
+    ds_copy = ds.copy()
+    snapshot = ds.snapshot()
+    ds_copy.insert(3, "TTT")
+    ds.delete(0, 3)
+    assert ds_copy.note == "plasmid"
+    assert ds_copy.reverse_sequence.sequence == "TACAAAGCTTAAGTTCCTAGG"
+    assert snapshot.forward_sequence.sequence == "ATGCGAATTCAAGGATCC"
+    assert ds.forward_sequence.sequence == "CGAATTCAAGGATCC"
+    with pytest.raises(Exception, match="read-only"):
+        snapshot.insert(0, "A")
@@ -0,0 +1,24 @@
+from src.double_stranded_nucleic_acids import DoubleStrandNucleicAcidSequence
+
+
+def test_ds_insert_and_delete_edit_both_strands():
+    ds_seq = DoubleStrandNucleicAcidSequence(forward_sequence="ATGCGTAA")
+    ds_seq.insert(4, "GAATTC")
+    ds_seq.delete(0, 2)
+
+    assert ds_seq.forward_sequence.sequence == "GCGAATTCGTAA"
+    assert ds_seq.reverse_sequence.sequence == "CGCTTAAGCATT"
+    assert list(ds_seq.forward_sequence.cut_sites.keys()) == [2]
+    assert list(ds_seq.reverse_sequence.cut_sites.keys()) == [2]
+
+
+def test_ds_rotate_and_linearize():
+    ds_seq = DoubleStrandNucleicAcidSequence(forward_sequence="TTCAAAAGAA", circular=True, reverse_sequence_start=0)
+    ds_seq.rotate(7)
+    assert ds_seq.forward_sequence.sequence == "GAATTCAAAA"
+    assert ds_seq.reverse_sequence.sequence == "CTTAAGTTTT"
+    assert list(ds_seq.reverse_sequence.cut_sites.keys()) == [0]
+    ds_seq.linearize(5)
+    assert not ds_seq.circular
+    assert ds_seq.forward_sequence.sequence == "CAAAAGAATT"
+    assert ds_seq.forward_sequence.cut_sites == {}
@@ -0,0 +1,47 @@
+from src.double_stranded_nucleic_acids import DoubleStrandNucleicAcidSequence
+from src.feature_tables import (
+    add_annotations_from_frame,
+    add_base_modifications_from_frame,
+    features_to_frames,
+)
+from src.single_stranded_nucleic_acids import SingleStrandNucleicAcidSequence
+
+
+def test_features_to_frames():
+    plasmid = DoubleStrandNucleicAcidSequence(forward_sequence="ATGCGGGATCCTAGCATGCAAATTGAATTCAA")
+    plasmid.forward_sequence.add_annotations([{"name": "Gene1", "start": 2, "end": 14, "note": "note"}])
+    oligo = SingleStrandNucleicAcidSequence(sequence="GATCGAATTC",
+                                            base_modifications=[{"position": 1, "modification_type": "6-mA"}])
+    frames = features_to_frames([plasmid, oligo])
+
+    annotations = frames["annotations"]
+    assert annotations.to_dict("records") == [
+        {"strand_id": plasmid.forward_sequence.id, "name": "Gene1", "start": 2, "end": 14, "note": "note"}]
+    assert frames["base_modifications"]["position"].tolist() == [1]
+    cut_sites = frames["cut_sites"]
+    assert len(cut_sites) == 7
+    assert cut_sites[cut_sites["strand_id"] == oligo.id]["restriction_enzyme"].tolist() == ["EcoRI"]
+    assert cut_sites["start"].dtype == "int64"
+    # Empty tables keep the column types
+    empty = features_to_frames([SingleStrandNucleicAcidSequence(sequence="ACGT")])
+    assert empty["annotations"][["start", "end"]].dtypes.tolist() == ["int64", "int64"]
+    assert empty["base_modifications"]["position"].dtype == "int64"
+    assert empty["cut_sites"]["cut_position"].dtype == "int64"
+
+
+def test_frames_round_trip_onto_new_strands():
+    source = SingleStrandNucleicAcidSequence(sequence="GATCGAATTCAAGATC",
+                                             annotations=[{"name": "A", "start": 0, "end": 3},
+                                                          {"name": "B", "start": 4, "end": 9}],
+                                             base_modifications=[{"position": 5, "modification_type": "6-mA"}])
+    target = SingleStrandNucleicAcidSequence(sequence=source.sequence)
+    frames = features_to_frames([source])
+    frames["annotations"]["strand_id"] = target.id
+    frames["base_modifications"]["strand_id"] = target.id
+    add_annotations_from_frame([target], frames["annotations"])
+    add_base_modifications_from_frame([target], frames["base_modifications"])
+
+    assert sorted(target.annotations) == ["A", "B"]
+    assert target.annotations["B"].end == 9
+    assert sorted(target.base_modifications) == [5]
+    assert target.cut_sites == {}
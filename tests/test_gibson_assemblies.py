@@ -0,0 +1,62 @@
+import pytest
+
+from src.double_stranded_nucleic_acids import DoubleStrandNucleicAcidSequence
+from src.gibson_assemblies import find_terminal_overlaps
+from src.nucleic_acid_reactions import NucleicAcidReaction
+from src.nucleic_acids import reverse_complement_sequence
+
+part_a = "ATGGCTAGCAAAGGAGAAGAACTTTTCACTGGAGTTGTCCCAATTCTTGTT"
+part_b = "GAATTAGATGGTGATGTTAATGGGCACAAATTTTCTGTCAGTGGAGAGGGT"
+part_c = "GAAGGTGATGCAACATACGGAAAACTTACCCTTAAATTTATTTGCACTACT"
+overlap_ab = part_b[:20]
+overlap_bc = part_c[:20]
+overlap_ca = part_a[:20]
+
+
+def test_find_terminal_overlaps():
+    overlaps = find_terminal_overlaps([part_a + overlap_ab, reverse_complement_sequence(part_b)], min_overlap=15)
+    # The end of a runs into b, which was given reverse complemented
+    assert overlaps == {(0, 1): [(1, -1, 20)], (1, 1): [(0, -1, 20)]}
+    assert find_terminal_overlaps([part_a + overlap_ab, part_b], min_overlap=21) == {}
+    with pytest.raises(ValueError):
+        find_terminal_overlaps([part_a], min_overlap=20, max_overlap=10)
+
+
+def test_gibson_assembly_linear_and_circular():
+    fragment_a = DoubleStrandNucleicAcidSequence(forward_sequence=part_a + overlap_ab)
+    fragment_a.forward_sequence.add_annotations([{"name": "start_codon", "start": 0, "end": 2}])
+    fragment_b = DoubleStrandNucleicAcidSequence(forward_sequence=reverse_complement_sequence(part_b + overlap_bc))
+    fragment_b.forward_sequence.add_annotations([{"name": "b_end", "start": 0, "end": 19}])
+    fragment_c = DoubleStrandNucleicAcidSequence(forward_sequence=part_c)
+    reaction = NucleicAcidReaction(reaction_type="gibson_assembly",
+                                   inputs={"fragments": [fragment_c, fragment_a, fragment_b]})
+    (assembly,) = reaction.outputs["assemblies"]
+    assert assembly["fragments"] == [(fragment_a.id, 1), (fragment_b.id, -1), (fragment_c.id, 1)]
+    assert assembly["overlaps"] == [20, 20]
+    assert not assembly["circular"]
+    product = reaction.outputs["assembly_products"][0]
+    assert product.forward_sequence.sequence == part_a + part_b + part_c
+    assert product.forward_sequence.annotations["start_codon"].start == 0
+    # Annotations of a reversed fragment land on the reverse strand of the product
+    b_end_start = len(part_a) + len(part_b)
+    assert (product.reverse_sequence.annotations["b_end"].start,
+            product.reverse_sequence.annotations["b_end"].end) == (b_end_start, b_end_start + 19)
+
+    fragment_c = DoubleStrandNucleicAcidSequence(forward_sequence=part_c + overlap_ca)
+    fragment_c.forward_sequence.add_annotations([{"name": "start_codon", "start": len(part_c), "end": len(part_c) + 2}])
+    (assembly,) = NucleicAcidReaction(reaction_type="gibson_assembly",
+                                      inputs={"fragments": [fragment_a, fragment_b, fragment_c]}).outputs["assemblies"]
+    assert assembly["circular"]
+    assert assembly["overlaps"] == [20, 20, 20]
+    product = assembly["product"]
+    assert product.circular
+    assert product.forward_sequence.sequence == part_a + part_b + part_c
+    # Carried by both fragments of the closing overlap, kept once
+    assert list(product.forward_sequence.annotations) == ["start_codon"]
+
+
+def test_gibson_assembly_ambiguous_overlaps():
+    fragments = [DoubleStrandNucleicAcidSequence(forward_sequence=seq)
+                 for seq in [part_a + overlap_ab, part_b, overlap_ab + part_c]]
+    with pytest.raises(ValueError):
+        NucleicAcidReaction(reaction_type="gibson_assembly", inputs={"fragments": fragments})
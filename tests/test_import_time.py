@@ -0,0 +1,22 @@
+import os
+import subprocess
+import sys
+
+
+def test_reaction_engine_imports_without_heavy_dependencies():
+    # Plotting, tables and vectorized scans import their dependencies when first used
+    script = ("import sys, src.nucleic_acid_reactions; "
+              "print(','.join(name for name in ('numpy', 'pandas', 'matplotlib', 'dna_features_viewer') "
+              "if name in sys.modules))")
+    output = subprocess.run([sys.executable, "-c", script], check=True, capture_output=True, text=True,
+                            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    assert output.stdout.strip() == ""
+
+
+def test_vectorized_scans_still_work_after_lazy_import():
+    from src.single_stranded_nucleic_acids import SingleStrandNucleicAcidSequence
+
+    strand = SingleStrandNucleicAcidSequence(sequence="ATGAAATAGGATC")
+    assert strand.translate(to_stop=True) == "MK"
+    strand.add_methylation(["Dam"])
+    assert list(strand.base_modifications) == [10]
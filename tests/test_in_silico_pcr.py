@@ -0,0 +1,74 @@
+from src.double_stranded_nucleic_acids import DoubleStrandNucleicAcidSequence
+from src.in_silico_pcr import electronic_pcr, find_pcr_products
+from src.nucleic_acid_reactions import NucleicAcidReaction
+from src.single_stranded_nucleic_acids import SingleStrandNucleicAcidSequence
+
+
+def test_find_pcr_products_matches_pcr_reaction():
+    products = find_pcr_products("ATGCGTAATAAGC", "GGGGGGGATGC", "TTCGTTT",
+                                 min_amplicon_size=1, max_amplicon_size=100, anchor_length=4)
+
+    assert len(products) == 1
+    assert products[0]["sequence"] == "GGGGGGGATGCGTAATAAGCAAA"
+    assert products[0]["size"] == 23
+    assert products[0]["start"] == 0
+    assert products[0]["end"] == 12
+
+
+def test_find_pcr_products_multiple_products_and_size_bounds():
+    template = "ATGCAAAAGCTTTTTATGCAAAAGCTT"
+    products = find_pcr_products(template, "ATGC", "TCGA", min_amplicon_size=1, max_amplicon_size=100)
+
+    assert sorted(product["size"] for product in products) == [11, 11, 26]
+
+    products = find_pcr_products(template, "ATGC", "TCGA", min_amplicon_size=20, max_amplicon_size=100)
+    assert [product["size"] for product in products] == [26]
+
+
+def test_find_pcr_products_spanning_origin():
+    template = "AAGCTTTTTTTTTTATGC"
+    linear_products = find_pcr_products(template, "ATGC", "TCGA", min_amplicon_size=1, max_amplicon_size=100)
+    circular_products = find_pcr_products(template, "ATGC", "TCGA", min_amplicon_size=1, max_amplicon_size=100,
+                                          circular=True)
+
+    assert linear_products == []
+    assert len(circular_products) == 1
+    assert circular_products[0]["spans_origin"] is True
+    assert circular_products[0]["sequence"] == "ATGCAAGCT"
+    assert circular_products[0]["start"] == 14
+    assert circular_products[0]["end"] == 4
+
+
+def test_electronic_pcr_reaction_over_templates():
+    templates = [
+        DoubleStrandNucleicAcidSequence(forward_sequence="ATGCGTAATAAGC"),
+        SingleStrandNucleicAcidSequence(sequence="CCCCCCCCCCCC"),
+        DoubleStrandNucleicAcidSequence(forward_sequence="AAGCTTTTTTTTTTATGC", circular=True,
+                                        reverse_sequence_start=0),
+    ]
+    fwd_primer = SingleStrandNucleicAcidSequence(sequence="ATGC")
+    rev_primer = SingleStrandNucleicAcidSequence(sequence="TTCG")
+
+    pcr_reaction = NucleicAcidReaction(reaction_type="electronic_pcr", inputs={
+        "templates": templates,
+        "forward_primer": fwd_primer,
+        "reverse_primer": rev_primer,
+    })
+    products = pcr_reaction.outputs["pcr_products"]
+
+    assert [product["template_index"] for product in products] == [0, 2]
+    assert products[0]["sequence"] == "ATGCGTAATAAGC"
+    assert products[1]["template_id"] == templates[2].id
+
+
+def test_electronic_pcr_parallel_matches_serial():
+    templates = [DoubleStrandNucleicAcidSequence(forward_sequence="ATGC" + "A" * i + "AAGC") for i in range(20)]
+    fwd_primer = SingleStrandNucleicAcidSequence(sequence="ATGC")
+    rev_primer = SingleStrandNucleicAcidSequence(sequence="TTCG")
+
+    serial = list(electronic_pcr(templates, fwd_primer, rev_primer, max_amplicon_size=20))
+    parallel = list(electronic_pcr(templates, fwd_primer, rev_primer, max_amplicon_size=20,
+                                   processes=2, chunksize=3))
+
+    assert serial == parallel
+    assert len(serial) == 13
@@ -0,0 +1,54 @@
+import numpy as np
+
+from src.kmer_spectra import (
+    collection_kmer_counts,
+    decode_kmers,
+    find_repeats,
+    kmer_counts,
+    kmer_hashes,
+    kmer_spectrum,
+    low_complexity_regions,
+    mask_regions,
+)
+from src.nucleic_acids import reverse_complement_sequence
+from src.single_stranded_nucleic_acids import SingleStrandNucleicAcidSequence
+
+
+def test_kmer_hashes_and_counts():
+    starts, hashes = kmer_hashes("ACGTNACG", 3)
+    assert starts.tolist() == [0, 1, 5]
+    assert decode_kmers(hashes, 3) == ["ACG", "CGT", "ACG"]
+    kmers, counts = kmer_counts("ACGTNACG", 3)
+    assert dict(zip(decode_kmers(kmers, 3), counts.tolist())) == {"ACG": 2, "CGT": 1}
+    # Canonical k-mers are the same on both strands, circular ones span the origin
+    sequence = "GGATCCATTTAGC"
+    assert np.array_equal(kmer_counts(sequence, 5, canonical=True, circular=True)[1].sum(), len(sequence))
+    assert all(np.array_equal(a, b) for a, b in zip(
+        kmer_counts(sequence, 5, canonical=True), kmer_counts(reverse_complement_sequence(sequence), 5, canonical=True)))
+    assert kmer_spectrum("AAAA", 2).tolist() == [0, 0, 0, 1]
+
+
+def test_find_repeats_and_collection_counts():
+    repeat = "GATTACAGATTACAGGCT"
+    sequence = "CCCC" + repeat + "TTTCGCA" + reverse_complement_sequence(repeat) + "CC"
+    # The T after the repeat pairs with the A before its reverse complement
+    regions = find_repeats(sequence, k=12)
+    assert regions.tolist() == [[4, 22], [28, 46]]
+    assert find_repeats(sequence, k=12, canonical=False).tolist() == []
+    kmers, counts, sequence_counts = collection_kmer_counts(["ACGTAC", "ACGGG", "TTTT"], 3, canonical=False)
+    found = dict(zip(decode_kmers(kmers, 3), zip(counts.tolist(), sequence_counts.tolist())))
+    assert found["ACG"] == (2, 2) and found["TTT"] == (2, 1)
+
+
+def test_low_complexity_on_strand():
+    sequence = "GATCGGCTAAGCTTGCAC" + "CA" * 40 + "TGGCAATCGGATACGTTAGC"
+    regions = low_complexity_regions(sequence, window=20, threshold=4)
+    assert regions.tolist() == [[18, 97]]
+    assert mask_regions("ACGTACGT", np.array([[6, 1]])) == "NNGTACNN"
+    strand = SingleStrandNucleicAcidSequence(sequence=sequence)
+    assert strand.masked_sequence(window=20, threshold=4) == sequence[:18] + "N" * 80 + sequence[98:]
+    strand.low_complexity_regions(window=20, threshold=4, add_annotations=True)
+    strand.find_repeats(k=20, add_annotations=True)
+    assert {name: (annotation.start, annotation.end, annotation.note)
+            for name, annotation in strand.annotations.items()} == {
+        "low_complexity_1": (18, 97, "low complexity"), "repeat_1": (18, 97, "20-mer repeat")}
@@ -0,0 +1,49 @@
+import random
+
+import numpy as np
+
+from src.parallel_scans import scan_cut_sites, scan_motif_positions
+from src.single_stranded_nucleic_acids import SingleStrandNucleicAcidSequence
+from src.util_functions import find_motif_positions
+
+
+def _random_sequence(length, seed):
+    rng = random.Random(seed)
+    pieces = []
+    while sum(map(len, pieces)) < length:
+        pieces.append(rng.choice(["GAATTC", "GCGGCCGC", "GGATCC", "CCCGGG"]) if rng.random() < 0.3 else
+                      "".join(rng.choice("ACGT") for _ in range(rng.randint(1, 12))))
+    return "".join(pieces)
+
+
+def test_scan_cut_sites_matches_serial_scan():
+    sequence = _random_sequence(3000, 1)
+    for circular in [False, True]:
+        for strand_direction in ["forward", "reverse"]:
+            strand = SingleStrandNucleicAcidSequence(sequence=sequence, circular=circular,
+                                                     strand_direction=strand_direction)
+            expected = {start: cut_site.restriction_enzyme for start, cut_site in strand.cut_sites.items()}
+            # Chunks shorter than a recognition sequence still find every site once
+            for chunk_size in [5, 97]:
+                assert scan_cut_sites(sequence, strand_direction, circular, processes=2,
+                                      chunk_size=chunk_size) == expected
+    # Only the junction of both ends holds this NotI site
+    assert scan_cut_sites("GCCGCAAAAGCG", circular=True, processes=2, chunk_size=4) == {9: "NotI"}
+
+
+def test_scan_motif_positions_matches_serial_search():
+    sequence = _random_sequence(2000, 2)
+    for motif in ["GATC", "CCWGG", "CG"]:
+        for circular in [False, True]:
+            assert np.array_equal(scan_motif_positions(sequence, motif, circular, processes=2, chunk_size=50),
+                                  find_motif_positions(sequence, motif, circular))
+
+
+def test_strand_scan_cut_sites_in_parallel():
+    strand = SingleStrandNucleicAcidSequence(sequence="GAATTCAAGGATCCAAGAATTC")
+    strand._remove_all_cut_sites()
+    strand.add_base_modifications([{"position": 10, "modification_type": "6-mA"}])
+    strand.scan_cut_sites(processes=2, chunk_size=6)
+    # The modified base blocks BamHI
+    assert {start: cut_site.restriction_enzyme for start, cut_site in strand.cut_sites.items()} == {
+        0: "EcoRI", 16: "EcoRI"}
@@ -0,0 +1,73 @@
+import io
+import random
+
+from src.double_stranded_nucleic_acids import DoubleStrandNucleicAcidSequence
+from src.nucleic_acids import reverse_complement_sequence
+from src.read_mappings import ConstructIndex, Variant, construct_variants, map_reads
+from src.sequence_io import FastqRecord, FastqWriter, read_fastq
+
+
+def _random_sequence(length, seed):
+    rng = random.Random(seed)
+    return "".join(rng.choice("ACGT") for _ in range(length))
+
+
+def test_read_fastq_round_trip():
+    records = [FastqRecord("read/1", "ACGTN", "II#!5"), FastqRecord("read/2", "", "")]
+    handle = io.StringIO()
+    FastqWriter(handle).write(records)
+    handle.seek(0)
+    assert list(read_fastq(handle)) == records
+    try:
+        list(read_fastq(io.StringIO("@read\nACGT\n+\nII\n")))
+    except ValueError as error:
+        assert "4 bases but 2 qualities" in str(error)
+    else:
+        raise AssertionError("Expected ValueError")
+
+
+def test_map_read_reports_variants_and_annotations():
+    sequence = _random_sequence(600, 1)
+    construct = DoubleStrandNucleicAcidSequence(forward_sequence=sequence)
+    construct.forward_sequence.add_annotations([{"name": "gene", "start": 100, "end": 399, "note": "CDS"}])
+    index = ConstructIndex([construct, DoubleStrandNucleicAcidSequence(forward_sequence=_random_sequence(600, 2))])
+    # Mismatch at 150, insertion before 250 and deletion of 300 and 301
+    read = sequence[50:150] + ("A" if sequence[150] != "A" else "C") + sequence[151:250] + "GG" + \
+        sequence[250:300] + sequence[302:500]
+    mapping = index.map_read("read", read, "I" * len(read))
+    assert (mapping.construct_id, mapping.strand, mapping.start, mapping.end) == (construct.id, 1, 50, 499)
+    assert mapping.edit_distance == 5 and not mapping.ambiguous
+    assert [(variant.position, variant.kind) for variant in mapping.variants] == \
+        [(150, "mismatch"), (250, "insertion"), (299, "deletion")]
+    assert mapping.variants[1] == Variant(250, "insertion", "", "GG", ("gene",), 40)
+    # The deleted TA of ATA is reported as its leftmost equivalent, AT
+    assert mapping.variants[2].reference == sequence[299:301] == "AT"
+    # Reverse reads map to the forward strand with the same variants
+    reverse_mapping = index.map_read("reverse", reverse_complement_sequence(read))
+    assert reverse_mapping.strand == -1
+    assert [variant[:4] for variant in reverse_mapping.variants] == [variant[:4] for variant in mapping.variants]
+    assert index.map_read("unrelated", _random_sequence(300, 3)).construct_id is None
+
+
+def test_map_reads_across_circular_constructs():
+    constructs = [
+        DoubleStrandNucleicAcidSequence(forward_sequence=_random_sequence(800, seed), circular=True,
+                                        reverse_sequence_start=0)
+        for seed in range(10, 16)
+    ]
+    index = ConstructIndex(constructs)
+    reads = []
+    for number, construct in enumerate(constructs):
+        sequence = construct.forward_sequence.sequence
+        # Reads across the origin, with a variant every clone read shares
+        read = sequence[700:] + sequence[:5] + ("T" if sequence[5] != "T" else "G") + sequence[6:200]
+        reads.append((f"read{number}", read if number % 2 else reverse_complement_sequence(read)))
+    mappings = list(map_reads(reads * 2, index, chunksize=4))
+    assert [mapping.read_name for mapping in mappings] == [name for name, _ in reads * 2]
+    assert [mapping.construct_id for mapping in mappings] == [construct.id for construct in constructs] * 2
+    assert all((mapping.start, mapping.end) == (700, 199) for mapping in mappings)
+    assert list(map_reads(reads, index, processes=2, chunksize=2)) == mappings[:len(reads)]
+    tallies = construct_variants(mappings, min_reads=2)
+    assert all(list(tallies[construct.id]) == [(5, "mismatch", construct.forward_sequence.sequence[5],
+                                                "T" if construct.forward_sequence.sequence[5] != "T" else "G")]
+               for construct in constructs)
@@ -0,0 +1,56 @@
+import io
+
+from src.double_stranded_nucleic_acids import DoubleStrandNucleicAcidSequence
+from src.nucleic_acids import reverse_complement_sequence
+from src.read_simulations import ReadModel, simulate_reads
+from src.sequence_io import FastqWriter, SamWriter
+from src.smrtbell_library_preps import smrtbell_constructs
+
+adapter = "ATCTCTCTCAACAACAACAACGGAGGAGGAGGAAAAGAGAGAGAT"
+insert_seq = "ATGCGTACGTTAGCATGCAAATTGCCGATCGATCGGGATCCTAGCTAGGCTAGCATCGATCG"
+
+
+def _constructs(count=3):
+    inserts = [DoubleStrandNucleicAcidSequence(forward_sequence=insert_seq) for _ in range(count)]
+    return list(smrtbell_constructs(inserts, adapter, adapter))
+
+
+def test_error_free_subreads_and_ccs():
+    model = ReadModel(mean_read_length=1000, read_length_sigma=0.1, substitution_rate=0,
+                      insertion_rate=0, deletion_rate=0, min_subread_length=len(insert_seq))
+    reads = list(simulate_reads(_constructs(), adapter, adapter, model, ccs=True, seed=7))
+
+    subreads = [read for read in reads if read.kind == "subread"]
+    assert subreads
+    assert {read.sequence for read in subreads} == {insert_seq, reverse_complement_sequence(insert_seq)}
+    ccs_reads = [read for read in reads if read.kind == "ccs"]
+    assert len(ccs_reads) == 3
+    assert all(read.sequence == insert_seq and read.name.endswith("/ccs") for read in ccs_reads)
+    assert all(len(read.qualities) == len(read.sequence) for read in reads)
+
+
+def test_reads_are_reproducible_across_processes():
+    constructs = _constructs(6)
+    model = ReadModel(mean_read_length=500)
+    reads = list(simulate_reads(constructs, adapter, adapter, model, zmws_per_construct=2, seed=3, chunksize=2))
+    pooled_reads = list(simulate_reads(constructs, adapter, adapter, model, zmws_per_construct=2, seed=3,
+                                       processes=2, chunksize=2))
+    assert reads == pooled_reads
+    assert reads != list(simulate_reads(constructs, adapter, adapter, model, zmws_per_construct=2, seed=4,
+                                        chunksize=2))
+    assert {read.name.split("/")[1] for read in reads} <= {str(zmw) for zmw in range(12)}
+
+
+def test_fastq_and_sam_writers():
+    reads = list(simulate_reads(_constructs(1), adapter, adapter, ReadModel(mean_read_length=300), seed=1))
+    handle = io.StringIO()
+    FastqWriter(handle).write(reads)
+    lines = handle.getvalue().splitlines()
+    assert len(lines) == 4 * len(reads)
+    assert lines[0] == f"@{reads[0].name}" and lines[1] == reads[0].sequence and lines[2] == "+"
+
+    handle = io.StringIO()
+    SamWriter(handle).write(reads)
+    lines = handle.getvalue().splitlines()
+    assert lines[0].startswith("@HD")
+    assert lines[1].split("\t")[:2] == [reads[0].name, "4"]
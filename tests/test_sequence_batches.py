@@ -0,0 +1,57 @@
+import pytest
+
+from src.sequence_batches import SequenceBatch, make_single_strands
+from src.single_stranded_nucleic_acids import SingleStrandNucleicAcidSequence
+
+
+def test_make_single_strands_matches_constructor():
+    sequences = ["gaattcAAGCTT", "CCCGGGATCC", "ATGC", "GGATCCGAATTCGGATCC"]
+    strands = make_single_strands(sequences, strand_direction="reverse")
+    for sequence, strand in zip(sequences, strands):
+        expected = SingleStrandNucleicAcidSequence(sequence=sequence, strand_direction="reverse")
+        assert strand.sequence == expected.sequence
+        assert strand.strand_direction == "reverse"
+        assert {start: site.restriction_enzyme for start, site in strand.cut_sites.items()} == \
+               {start: site.restriction_enzyme for start, site in expected.cut_sites.items()}
+    assert len({strand.id for strand in strands}) == len(sequences)
+
+    forward_strands = make_single_strands(sequences, scan_cut_sites=False)
+    assert all(strand.cut_sites == {} for strand in forward_strands)
+
+
+def test_circular_batch_finds_sites_spanning_the_origin():
+    sequences = ["TTCAAAAGAA", "GGATCCAAAA", "ATCCAAAAGG", "GAATTC", "AATTCG"]
+    for strand_direction in ("forward", "reverse"):
+        strands = make_single_strands(sequences, circular=True, strand_direction=strand_direction)
+        for sequence, strand in zip(sequences, strands):
+            expected = SingleStrandNucleicAcidSequence(sequence=sequence, circular=True,
+                                                       strand_direction=strand_direction)
+            assert {start: (site.restriction_enzyme, site.end, site.cut_position)
+                    for start, site in strand.cut_sites.items()} == \
+                {start: (site.restriction_enzyme, site.end, site.cut_position)
+                 for start, site in expected.cut_sites.items()}
+    assert {start: site.restriction_enzyme for start, site in
+            make_single_strands(["TTCAAAAGAA"], circular=True)[0].cut_sites.items()} == {7: "EcoRI"}
+
+
+def test_sequence_batch():
+    batch = SequenceBatch(["GAATTC", "acgt", "GGATCCGGATCC"])
+    assert len(batch) == 3
+    assert batch[1] == "ACGT"
+    assert batch[-1] == "GGATCCGGATCC"
+    assert list(batch) == ["GAATTC", "ACGT", "GGATCCGGATCC"]
+    assert batch.lengths.tolist() == [6, 4, 12]
+    assert batch.cut_sites() == [[(0, "EcoRI")], [], [(0, "BamHI"), (6, "BamHI")]]
+    assert batch.strand(2).id == batch.ids[2]
+
+
+def test_sequence_batch_validation():
+    with pytest.raises(ValueError, match="index 1"):
+        SequenceBatch(["ACGT", "ACXT"])
+    with pytest.raises(ValueError, match="index 0"):
+        SequenceBatch(["AC|GT", "ACGT", "A"])
+    with pytest.raises(ValueError, match="when U in sequence"):
+        SequenceBatch(["ACGT", "ACGU"])
+    with pytest.raises(ValueError):
+        SequenceBatch(["ACGT", ""])
+    assert SequenceBatch(["ACGU"], nucleic_acid_type="RNA")[0] == "ACGU"
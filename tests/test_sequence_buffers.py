@@ -0,0 +1,58 @@
+from src.sequence_buffers import CoordinateMap, SequenceBuffer
+
+
+def test_sequence_buffer_edits():
+    buffer = SequenceBuffer("ATGCGTAA")
+    buffer.insert(4, "CCC")
+    buffer.delete(0, 2)
+    buffer.substitute(5, "TT")
+
+    assert str(buffer) == "GCCCCTTAA"
+    assert len(buffer) == 9
+
+
+def test_sequence_buffer_slice_across_pieces():
+    buffer = SequenceBuffer("AAAAAAAA")
+    buffer.insert(2, "CC")
+    buffer.insert(6, "GG")
+    buffer.substitute(0, "T")
+
+    assert buffer.slice(1, 9) == "ACCAAGGA"
+    assert buffer.slice(-3, 3) == "TAC"
+    assert str(buffer) == "TACCAAGGAAAA"
+
+
+def test_sequence_buffer_compacts_pieces():
+    buffer = SequenceBuffer("A" * 10)
+    for i in range(SequenceBuffer.max_pieces + 10):
+        buffer.insert(i % 10, "C")
+
+    assert len(buffer._pieces) <= SequenceBuffer.max_pieces
+    assert len(buffer) == 10 + SequenceBuffer.max_pieces + 10
+    assert str(buffer).count("C") == SequenceBuffer.max_pieces + 10
+
+
+def test_buffer_rotation():
+    buffer = SequenceBuffer("AACCGGTT")
+    buffer.rotate(3)
+    assert buffer.slice(3, 7) == "TTAA"
+    assert str(buffer) == "CGGTTAAC"
+    buffer.reverse()
+    buffer.rotate(2)
+    buffer.insert(1, "A")
+    assert str(buffer) == "AATTGGCCA"
+
+
+def test_coordinate_map():
+    coordinate_map = CoordinateMap(20)
+    coordinate_map.edit(5, 0, 3)
+    coordinate_map.edit(10, 4, 0)
+    coordinate_map.edit(15, 2, 2)
+
+    assert [coordinate_map.to_current(pos) for pos in (4, 5, 6, 7, 11, 12)] == [4, 8, 9, None, 10, 11]
+    assert [coordinate_map.to_stored(pos) for pos in (5, 8, 10, 15)] == [None, 5, 11, 16]
+    assert coordinate_map.to_current(3, 6) is None
+    assert coordinate_map.to_current(12, 15) == 11
+    # Ranges running into replaced bases did not survive in one piece
+    assert coordinate_map.to_current(12, 16) is None
+    assert coordinate_map.changed_windows(19, 3) == [(3, 12), (13, 19)]
@@ -0,0 +1,55 @@
+import random
+
+from src.sequence_diffs import AlignedBlock, diff_sequences, liftover
+from src.single_stranded_nucleic_acids import SingleStrandNucleicAcidSequence
+
+
+def test_diff_sequences_chain_and_changes():
+    chain = diff_sequences("AAAACCCCGAATTCGGGG", "TTAAAACCCCGAGTTCGG")
+    assert chain.blocks == [AlignedBlock(0, 2, 10), AlignedBlock(11, 13, 3), AlignedBlock(16, 16, 2)]
+    assert chain.changes == [(0, 0, 0, 2), (10, 11, 12, 13), (14, 16, 16, 16)]
+    assert [chain.lift(position) for position in (0, 9, 10, 11, 15)] == [2, 11, None, 13, None]
+    assert chain.lift_interval(8, 17) == (10, 17)
+    assert chain.lift_interval(14, 15) is None
+    assert diff_sequences("ACGT", "ACGT").blocks == [AlignedBlock(0, 0, 4)]
+    assert diff_sequences("ACGT", "").changes == [(0, 4, 0, 0)]
+
+
+def test_diff_sequences_of_long_versions():
+    random.seed(7)
+    old_sequence = "".join(random.choice("ACGT") for _ in range(100000))
+    new_sequence = list(old_sequence)
+    for position in sorted(random.sample(range(100000), 200), reverse=True):
+        new_sequence[position:position + 3] = random.choice(["", "G", "TTTT"])
+    new_sequence = "".join(new_sequence)
+    chain = diff_sequences(old_sequence, new_sequence)
+    for block in chain.blocks:
+        assert old_sequence[block.old_start:block.old_start + block.length] == \
+            new_sequence[block.new_start:block.new_start + block.length]
+    assert sum(block.length for block in chain.blocks) > 99000
+    assert all(earlier.old_start + earlier.length <= later.old_start and
+               earlier.new_start + earlier.length <= later.new_start
+               for earlier, later in zip(chain.blocks, chain.blocks[1:]))
+
+
+def test_liftover_features():
+    old = SingleStrandNucleicAcidSequence(
+        sequence="AAAACCCCGAATTCGGGGTTTTACGTACGTGATCAAAA",
+        annotations=[{"name": "promoter", "start": 0, "end": 7, "note": "CDS"},
+                     {"name": "site", "start": 8, "end": 13, "note": ""},
+                     {"name": "gone", "start": 18, "end": 21, "note": ""},
+                     {"name": "tail", "start": 16, "end": 30, "note": ""}],
+        base_modifications=[{"position": 31, "modification_type": "6-mA"},
+                            {"position": 2, "modification_type": "6-mA"}],
+    )
+    new = SingleStrandNucleicAcidSequence(sequence="TTAAAACCCCGAGTTCGGACGTACGTGATCAAAA")
+    report = liftover(old, new)
+    assert report["annotations"] == {"promoter": (2, 9), "site": (10, 15), "tail": (18, 26)}
+    assert report["trimmed_annotations"] == ["tail"]
+    assert report["base_modifications"] == {31: 27, 2: 4}
+    assert report["unmapped"] == [("annotation", "gone", "deleted or rearranged")]
+    # The EcoRI site was edited away
+    assert report["lost_cut_sites"] == [8] and report["gained_cut_sites"] == []
+    assert new.annotations["promoter"].note == "CDS"
+    assert set(new.base_modifications) == {4, 27}
+    assert liftover(old, new)["unmapped"][0] == ("annotation", "promoter", "name exists on target")
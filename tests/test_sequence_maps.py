@@ -0,0 +1,52 @@
+import os
+
+from src.double_stranded_nucleic_acids import DoubleStrandNucleicAcidSequence
+from src.sequence_maps import MapFeature, feature_color, level_of_detail, sequence_map, write_map, write_maps
+from src.single_stranded_nucleic_acids import SingleStrandNucleicAcidSequence
+
+
+def test_feature_colors_are_stable():
+    assert feature_color("AmpR") == feature_color("AmpR")
+    strand = SingleStrandNucleicAcidSequence(
+        sequence="ATGC" * 50, annotations=[{"name": "AmpR", "start": 10, "end": 100, "note": "resistance"}])
+    feature = sequence_map(strand).features[0]
+    assert feature == MapFeature("AmpR, resistance", 10, 100, 1, feature_color("AmpR"))
+
+
+def test_level_of_detail_merges_small_features():
+    features = [MapFeature(f"site{i}", 10 * i, 10 * i + 2, 1, "#0074d9") for i in range(1000)]
+    features.append(MapFeature("gene", 0, 5000, 1, "#2ecc40"))
+    shown = level_of_detail(features, 10000, resolution=100, max_features=20)
+    assert len(shown) <= 20
+    assert MapFeature("gene", 0, 5000, 1, "#2ecc40") in shown
+    assert sum(int(feature.label.split()[0]) for feature in shown if feature.label.endswith("features")) == 1000
+    # Aggregates merged again on a later pass still count the features, not the aggregates
+    clustered = [MapFeature(f"site{i}", 100 * (i // 10) + 8 * (i % 10), 100 * (i // 10) + 8 * (i % 10) + 2, 1,
+                            "#0074d9") for i in range(500)]
+    assert len(level_of_detail(clustered, 10000, resolution=1000, max_features=100)) == 50
+    shown = level_of_detail(clustered, 10000, resolution=1000, max_features=20)
+    assert [(feature.label, feature.count) for feature in shown] == [("500 features", 500)]
+    # Strands are never merged together, and features across the origin are kept as they are
+    both_strands = clustered[:20] + [feature._replace(strand=-1) for feature in clustered[20:40]]
+    wrapped = MapFeature("ori", 9990, 5, 1, "#2ecc40")
+    shown = level_of_detail(both_strands + [wrapped], 10000, resolution=1000, max_features=1)
+    assert [(feature.label, feature.strand) for feature in shown] == [
+        ("20 features", 1), ("20 features", -1), ("ori", 1)]
+    # Zoomed in far enough nothing is merged
+    assert level_of_detail(features[:5], 50, resolution=1000) == features[:5]
+
+
+def test_write_maps_to_files(tmp_path):
+    strand = SingleStrandNucleicAcidSequence(
+        sequence="ATGC" * 500,
+        annotations=[{"name": f"site{i}", "start": 4 * i, "end": 4 * i + 2, "note": ""} for i in range(400)],
+    )
+    region_map = sequence_map(strand, region=(100, 200))
+    assert all(feature.end >= 100 and feature.start < 200 for feature in region_map.features)
+    path = write_map(region_map, str(tmp_path / "region.png"))
+    with open(path, "rb") as png:
+        assert png.read(8) == b"\x89PNG\r\n\x1a\n"
+    plasmid = DoubleStrandNucleicAcidSequence("ATGCGAATTCAAGGATCC" * 10, circular=True, reverse_sequence_start=0)
+    paths = list(write_maps([strand, plasmid], str(tmp_path / "maps"), processes=2))
+    assert [os.path.basename(path) for path in paths] == [f"{strand.id}.svg", f"{plasmid.id}.svg"]
+    assert all(os.path.getsize(path) > 0 for path in paths)
@@ -0,0 +1,49 @@
+import gc
+
+import pytest
+
+from src.double_stranded_nucleic_acids import DoubleStrandNucleicAcidSequence
+from src.sequence_registry import SequenceRegistry, get_nucleic_acid
+from src.single_stranded_nucleic_acids import SingleStrandNucleicAcidSequence
+
+
+def test_content_hash_is_rotation_and_strand_invariant_for_circular_ds():
+    plasmid = DoubleStrandNucleicAcidSequence(forward_sequence="ATGCGGAATTCTAGC", circular=True,
+                                              reverse_sequence_start=0)
+    rotated = DoubleStrandNucleicAcidSequence(forward_sequence="AATTCTAGCATGCGG", circular=True,
+                                              reverse_sequence_start=0)
+    flipped = DoubleStrandNucleicAcidSequence(forward_sequence="GCTAGAATTCCGCAT", circular=True,
+                                              reverse_sequence_start=0)
+    linear = DoubleStrandNucleicAcidSequence(forward_sequence="ATGCGGAATTCTAGC")
+
+    assert plasmid.content_hash == rotated.content_hash == flipped.content_hash
+    assert plasmid.content_hash != linear.content_hash
+
+
+def test_content_hash_follows_edits():
+    ss_seq = SingleStrandNucleicAcidSequence(sequence="ATGCGTAA")
+    original_hash = ss_seq.content_hash
+    ss_seq.substitute(0, "T")
+
+    assert ss_seq.content_hash != original_hash
+    assert ss_seq.content_hash == SingleStrandNucleicAcidSequence(sequence="TTGCGTAA").content_hash
+
+
+def test_registry_deduplicates_and_resolves_ids():
+    registry = SequenceRegistry()
+    first = DoubleStrandNucleicAcidSequence(forward_sequence="ATGCGGAATTC")
+    duplicate = DoubleStrandNucleicAcidSequence(forward_sequence="GAATTCCGCAT")
+    other = DoubleStrandNucleicAcidSequence(forward_sequence="ATGCGGAATTA")
+
+    assert list(registry.deduplicate([first, duplicate, other])) == [first, first, other]
+    assert len(registry) == 2
+    assert registry.find_duplicate(duplicate) is first
+    assert get_nucleic_acid(first.forward_sequence.id) is first.forward_sequence
+    assert registry.get(other.id) is other
+
+    other_id = other.id
+    del other
+    gc.collect()
+    assert len(registry) == 1
+    with pytest.raises(KeyError):
+        get_nucleic_acid(other_id)
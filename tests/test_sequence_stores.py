@@ -0,0 +1,75 @@
+from src.double_stranded_nucleic_acids import DoubleStrandNucleicAcidSequence
+from src.sequence_stores import SequenceStore
+from src.single_stranded_nucleic_acids import SingleStrandNucleicAcidSequence
+
+
+def make_store():
+    plasmid = DoubleStrandNucleicAcidSequence(forward_sequence="ATGCGGGATCCTAGCATGCAAATTGAATTCAA")
+    plasmid.forward_sequence.add_annotations([{"name": "Gene1", "start": 2, "end": 14, "note": "BamHI inside"},
+                                              {"name": "Gene2", "start": 16, "end": 24}])
+    oligo = SingleStrandNucleicAcidSequence(sequence="GATCGAATTCAAGATC",
+                                            base_modifications=[{"position": 1, "modification_type": "6-mA"},
+                                                                {"position": 13, "modification_type": "6-mA"}])
+    store = SequenceStore()
+    store.add([plasmid, oligo])
+    return store, plasmid, oligo
+
+
+def test_store_round_trip():
+    store, plasmid, oligo = make_store()
+    loaded_plasmid = store.load(plasmid.id)
+    loaded_oligo = store.load(oligo.id)
+
+    assert len(store) == 2
+    assert plasmid.id in store
+    assert loaded_plasmid.id == plasmid.id
+    assert loaded_plasmid.forward_sequence.sequence == plasmid.forward_sequence.sequence
+    assert loaded_plasmid.forward_sequence.annotations["Gene1"].parent_ss_nucleic_acid_id == plasmid.forward_sequence.id
+    assert sorted(loaded_plasmid.forward_sequence.cut_sites) == sorted(plasmid.forward_sequence.cut_sites)
+    assert sorted(loaded_plasmid.reverse_sequence.cut_sites) == sorted(plasmid.reverse_sequence.cut_sites)
+    assert sorted(loaded_oligo.base_modifications) == [1, 13]
+    assert loaded_oligo.content_hash == oligo.content_hash
+
+
+def test_store_feature_queries():
+    store, plasmid, oligo = make_store()
+
+    bam_hits = store.find_cut_sites_in_annotation("BamHI", "Gene1")
+    assert [(hit["strand_id"], hit["start"], hit["double_strand_id"]) for hit in bam_hits] == [
+        (plasmid.forward_sequence.id, 5, plasmid.id)]
+    assert store.find_cut_sites_in_annotation("BamHI", "Gene2") == []
+    near = store.find_base_modifications_near("6-mA", 12, 2)
+    assert [(hit["strand_id"], hit["position"]) for hit in near] == [(oligo.id, 13)]
+    assert [hit["name"] for hit in store.find_annotations(start=15, end=16)] == ["Gene2"]
+    assert len(store.find_cut_sites(restriction_enzyme="EcoRI")) == 3
+    # Overlaps are found through the start indexes, bounded by the longest stored feature
+    oligo.add_annotations([{"name": "whole", "start": 0, "end": 15}])
+    store.add([oligo])
+    assert [hit["name"] for hit in store.find_annotations(start=14, end=20, strand_id=oligo.id)] == ["whole"]
+    assert sorted(hit["name"] for hit in store.find_annotations(start=15, end=16)) == ["Gene2", "whole"]
+    plan = store._connection.execute(
+        'EXPLAIN QUERY PLAN SELECT * FROM annotations f WHERE f."end" >= 14 AND f.start >= -1 AND f.start <= 20 '
+        "AND f.strand_id = 'id'").fetchall()
+    assert "annotations_strand_start" in plan[0]["detail"]
+    # Features spanning the origin of circular strands are found from either end
+    ring = SingleStrandNucleicAcidSequence(sequence="TTCAAAAAAAAAAGAA", circular=True,
+                                           annotations=[{"name": "origin", "start": 12, "end": 3}])
+    store.add([ring])
+    assert [hit["name"] for hit in store.find_annotations(start=1, end=2, strand_id=ring.id)] == ["origin"]
+    assert [hit["name"] for hit in store.find_annotations(start=14, strand_id=ring.id)] == ["origin"]
+    assert store.find_annotations(start=5, end=10, strand_id=ring.id) == []
+    assert [(hit["start"], hit["end"]) for hit in store.find_cut_sites("EcoRI", start=0, end=1)] == [(13, 2)]
+
+
+def test_store_replace_remove_and_lazy_load():
+    store, plasmid, oligo = make_store()
+    plasmid.forward_sequence.remove_annotations(["Gene2"])
+    store.add([plasmid])
+
+    assert [hit["name"] for hit in store.find_annotations(strand_id=plasmid.forward_sequence.id)] == ["Gene1"]
+    loaded = store.iter_load(store.ids())
+    assert next(loaded).id in (plasmid.id, oligo.id)
+
+    store.remove([plasmid.id])
+    assert list(store.ids()) == [oligo.id]
+    assert store.find_annotations() == []
@@ -0,0 +1,57 @@
+import io
+
+from src.double_stranded_nucleic_acids import DoubleStrandNucleicAcidSequence
+from src.nucleic_acid_reactions import NucleicAcidReaction
+from src.sequence_io import FastaWriter, read_fasta
+from src.sequence_stores import SequenceStore
+from src.single_stranded_nucleic_acids import SingleStrandNucleicAcidSequence
+
+
+def _batch_inputs():
+    return {
+        "templates": (DoubleStrandNucleicAcidSequence(forward_sequence=seq) for seq in ["GAATTCAA", "ACGTTT"]),
+        "front_adapter": SingleStrandNucleicAcidSequence(sequence="CCCTT"),
+        "back_adapter": SingleStrandNucleicAcidSequence(sequence="GGAA"),
+    }
+
+
+def test_smrtbell_batch_matches_single_prep():
+    inputs = _batch_inputs()
+    template = DoubleStrandNucleicAcidSequence(forward_sequence="GAATTCAA")
+    single = NucleicAcidReaction(reaction_type="pacbio_smrtbell_library_prep", inputs={
+        "template": template,
+        "front_adapter": inputs["front_adapter"],
+        "back_adapter": inputs["back_adapter"],
+    }).outputs["smrtbell_library_construct"]
+    batch = NucleicAcidReaction(reaction_type="pacbio_smrtbell_library_prep_batch", inputs=inputs)
+    constructs = list(batch.outputs["smrtbell_library_constructs"])
+
+    assert len(constructs) == 2
+    assert constructs[0].sequence == single.sequence == "CCCTTGAATTCAAAAGGTTGAATTC"
+    assert constructs[0].circular
+    assert constructs[0].cut_sites == {}
+    assert constructs[0].id != constructs[1].id
+
+
+def test_smrtbell_batch_features_and_writers():
+    constructs = list(NucleicAcidReaction(
+        reaction_type="pacbio_smrtbell_library_prep_batch", inputs=_batch_inputs(),
+        annotate=True, scan_cut_sites=True).outputs["smrtbell_library_constructs"])
+    assert [(a.name, a.start, a.end) for a in constructs[0].annotations.values()] == [
+        ("front_adapter", 0, 4), ("insert", 5, 12), ("back_adapter", 13, 16), ("insert_reverse", 17, 24)]
+    assert sorted(constructs[0].cut_sites.keys()) == [5, 19]
+
+    handle = io.StringIO()
+    with FastaWriter(handle, line_width=10) as fasta_writer:
+        reaction = NucleicAcidReaction(
+            reaction_type="pacbio_smrtbell_library_prep_batch", inputs=_batch_inputs(),
+            writer=fasta_writer.write, chunk_size=1)
+    assert reaction.outputs["smrtbell_library_construct_count"] == 2
+    handle.seek(0)
+    records = list(read_fasta(handle))
+    assert [sequence for _, sequence in records] == ["CCCTTGAATTCAAAAGGTTGAATTC", "CCCTTACGTTTAAGGAAACGT"]
+
+    with SequenceStore() as store:
+        NucleicAcidReaction(reaction_type="pacbio_smrtbell_library_prep_batch", inputs=_batch_inputs(),
+                            writer=store.add)
+        assert len(store) == 2
@@ -1,3 +1,7 @@
+import pytest
+
+from src.feature_tables import add_annotations_from_frame, features_to_frames
+from src.sequence_stores import SequenceStore
 from src.single_stranded_nucleic_acids import SingleStrandNucleicAcidSequence
 
 
@@ -93,7 +97,8 @@ def test_reverse_sequence():
     dna_seq.reverse()
 
     assert dna_seq.sequence == "AATGCGTA"
-    assert dna_seq.base_modifications == {}
+    assert list(dna_seq.base_modifications.keys()) == [7]
+    assert dna_seq.base_modifications[7].modification_type == "6-mA"
 
 
 def test_compliment_sequence():
@@ -114,8 +119,177 @@ def test_reverse_compliment_sequence():
     assert dna_seq.base_modifications == {}
 
 
+def test_reverse_complement_remaps_features():
+    dna_seq = SingleStrandNucleicAcidSequence(sequence="ATGCGGAATTCTAGCATGCAAATT",
+                                              annotations=[{"name": "Gene1", "start": 2, "end": 8, "note": "Gene1"}],
+                                              base_modifications=[{"position": 0, "modification_type": "6-mA"}])
+    dna_seq.reverse_complement()
+
+    assert dna_seq.sequence == "AATTTGCATGCTAGAATTCCGCAT"
+    assert (dna_seq.annotations["Gene1"].start, dna_seq.annotations["Gene1"].end) == (15, 21)
+    assert dna_seq.annotations["Gene1"].note == "Gene1"
+    assert dna_seq.base_modifications == {}
+    assert sorted((start, cut_site.restriction_enzyme) for start, cut_site in dna_seq.cut_sites.items()) == [
+        (5, "SphI"), (13, "EcoRI")]
+    assert dna_seq.cut_sites[13].cut_position == 13
+    # Sites blocked by a removed modification are found where the modified base moved to
+    blocked = SingleStrandNucleicAcidSequence(sequence="GAATTCAAAA",
+                                              base_modifications=[{"position": 1, "modification_type": "6-mA"}])
+    assert blocked.cut_sites == {}
+    blocked.reverse_complement()
+    assert blocked.sequence == "TTTTGAATTC"
+    assert {start: site.restriction_enzyme for start, site in blocked.cut_sites.items()} == {4: "EcoRI"}
+
+
+def test_reverse_keeps_cut_sites_consistent_with_rescan():
+    dna_seq = SingleStrandNucleicAcidSequence(sequence="GAATTCAAGGATCCAAGCATGC",
+                                              base_modifications=[{"position": 12, "modification_type": "5-mC"}])
+    dna_seq.reverse(change_strand_dir=True)
+    rescanned = SingleStrandNucleicAcidSequence(sequence=dna_seq.sequence, strand_direction="reverse",
+                                                base_modifications=[{"position": 9, "modification_type": "5-mC"}])
+
+    assert dna_seq.strand_direction == "reverse"
+    assert sorted(dna_seq.cut_sites) == sorted(rescanned.cut_sites)
+    assert [cut_site.cut_position for cut_site in dna_seq.cut_sites.values()] == [
+        cut_site.cut_position for cut_site in rescanned.cut_sites.values()]
+
+
 def test_change_circular():
     dna_seq = SingleStrandNucleicAcidSequence(sequence="ATGCGGAATTCTAGCATGCAAATT", nucleic_acid_type="DNA", circular=False, strand_direction="forward")
     dna_seq.set_circular()
 
     assert dna_seq.circular == True
+
+
+def test_insert_shifts_features_and_rescans_cut_sites():
+    dna_seq = SingleStrandNucleicAcidSequence(sequence="ATGCGGAATTCTAGCATGCAAATT",
+                                              annotations=[{"name": "Gene1", "start": 0, "end": 8},
+                                                           {"name": "Gene2", "start": 12, "end": 20}],
+                                              base_modifications=[{"position": 21, "modification_type": "6-mA"}])
+    dna_seq.insert(8, "GGG")
+
+    assert dna_seq.sequence == "ATGCGGAAGGGTTCTAGCATGCAAATT"
+    assert (dna_seq.annotations["Gene1"].start, dna_seq.annotations["Gene1"].end) == (0, 11)
+    assert (dna_seq.annotations["Gene2"].start, dna_seq.annotations["Gene2"].end) == (15, 23)
+    assert list(dna_seq.base_modifications.keys()) == [24]
+    assert dna_seq.base_modifications[24].position == 24
+    assert list(dna_seq.cut_sites.keys()) == [16]
+    assert dna_seq.cut_sites[16].restriction_enzyme == "SphI"
+
+
+def test_delete_and_substitute():
+    dna_seq = SingleStrandNucleicAcidSequence(sequence="ATGCGGAATTCTAGCATGCAAATT",
+                                              annotations=[{"name": "Gene1", "start": 2, "end": 5},
+                                                           {"name": "Gene2", "start": 12, "end": 20}],
+                                              base_modifications=[{"position": 3, "modification_type": "5-mC"},
+                                                                  {"position": 14, "modification_type": "5-mC"}])
+    dna_seq.delete(1, 6)
+
+    assert dna_seq.sequence == "AATTCTAGCATGCAAATT"
+    assert "Gene1" not in dna_seq.annotations
+    assert (dna_seq.annotations["Gene2"].start, dna_seq.annotations["Gene2"].end) == (6, 14)
+    assert list(dna_seq.base_modifications.keys()) == [8]
+
+    dna_seq.substitute(8, "G")
+    dna_seq.substitute(0, "GA")
+
+    assert dna_seq.sequence == "GATTCTAGGATGCAAATT"
+    assert dna_seq.base_modifications == {}
+    assert list(dna_seq.cut_sites.keys()) == []
+
+
+def test_edits_move_features_once_when_read():
+    kwargs = dict(sequence="GAATTCAAAAGGATCCAAAAGCATGCAAAA", circular=True,
+                  base_modifications=[{"position": 7, "modification_type": "6-mA"},
+                                      {"position": 26, "modification_type": "6-mA"}])
+    edits = [("insert", 3, "GG"), ("substitute", 12, "T"), ("delete", 20, 4), ("insert", 0, "GCATGC"),
+             ("substitute", 26, "CC"), ("delete", 30, 2), ("insert", 31, "TTCGA")]
+    read_every_edit = SingleStrandNucleicAcidSequence(**kwargs)
+    read_once = SingleStrandNucleicAcidSequence(**kwargs)
+    for method, *args in edits:
+        getattr(read_every_edit, method)(*args)
+        read_every_edit.cut_sites
+        getattr(read_once, method)(*args)
+    copied = read_once.copy()
+    assert read_once._pending_shifts is not None
+    assert read_once.sequence == copied.sequence == read_every_edit.sequence
+    for ss_seq in (read_once, copied):
+        assert ({start: cut_site.restriction_enzyme for start, cut_site in ss_seq.cut_sites.items()} ==
+                {start: cut_site.restriction_enzyme for start, cut_site in read_every_edit.cut_sites.items()})
+        assert list(ss_seq.base_modifications) == list(read_every_edit.base_modifications) == [15]
+
+
+def test_circular_cut_sites_across_origin():
+    ss_seq = SingleStrandNucleicAcidSequence(sequence="TTCAAAAGAA", circular=True)
+    cut_site = ss_seq.cut_sites[7]
+    assert (cut_site.start, cut_site.end, cut_site.cut_position) == (7, 2, 7)
+
+    ss_seq.insert(5, "GGG")
+    assert list(ss_seq.cut_sites.keys()) == [10]
+    ss_seq.remove_circular()
+    assert ss_seq.cut_sites == {}
+
+
+def test_rotate_and_linearize():
+    ss_seq = SingleStrandNucleicAcidSequence(
+        sequence="GAATTCAAAAGGATCCAAAA",
+        circular=True,
+        annotations=[{"name": "EcoRI site", "start": 0, "end": 5},
+                     {"name": "BamHI site", "start": 10, "end": 15}],
+        base_modifications=[{"position": 8, "modification_type": "6-mA"}],
+    )
+    ss_seq.rotate(12)
+    assert ss_seq.sequence == "ATCCAAAAGAATTCAAAAGG"
+    assert sorted(ss_seq.cut_sites.keys()) == [8, 18]
+    assert (ss_seq.cut_sites[18].start, ss_seq.cut_sites[18].end) == (18, 3)
+    assert (ss_seq.annotations["BamHI site"].start, ss_seq.annotations["BamHI site"].end) == (18, 3)
+    assert list(ss_seq.base_modifications.keys()) == [16]
+
+    ss_seq.rotate(-12)
+    ss_seq.linearize(12)
+    assert not ss_seq.circular
+    assert ss_seq.sequence == "ATCCAAAAGAATTCAAAAGG"
+    assert list(ss_seq.cut_sites.keys()) == [8]
+    assert list(ss_seq.annotations.keys()) == ["EcoRI site"]
+    with pytest.raises(ValueError):
+        ss_seq.rotate(1)
+
+
+def test_rotated_annotations_round_trip():
+    ss_seq = SingleStrandNucleicAcidSequence(
+        sequence="GAATTCAAAAGGATCCAAAAAA", circular=True, annotations=[{"name": "gene", "start": 3, "end": 8}])
+    ss_seq.rotate(4)
+    assert (ss_seq.annotations["gene"].start, ss_seq.annotations["gene"].end) == (21, 4)
+    frames = features_to_frames([ss_seq])
+    target = SingleStrandNucleicAcidSequence(sequence=ss_seq.sequence, circular=True)
+    frames["annotations"]["strand_id"] = target.id
+    add_annotations_from_frame([target], frames["annotations"])
+    assert (target.annotations["gene"].start, target.annotations["gene"].end) == (21, 4)
+    store = SequenceStore()
+    store.add([ss_seq])
+    assert store.load(ss_seq.id).annotations["gene"].end == 4
+    # Linear sequences still keep annotations off the last and first base
+    with pytest.raises(ValueError):
+        SingleStrandNucleicAcidSequence(sequence=ss_seq.sequence, annotations=[{"name": "gene", "start": 21, "end": 4}])
+
+
+def test_add_methylation():
+    ss_seq = SingleStrandNucleicAcidSequence(sequence="GGATCCAGGACGAATTCTGGA", circular=True)
+    assert sorted(ss_seq.cut_sites.keys()) == [0, 11]
+    ss_seq.add_methylation(["Dam", "Dcm", "CpG"])
+
+    assert {pos: mod.modification_type for pos, mod in ss_seq.base_modifications.items()} == {
+        2: "6-mA", 5: "5-mC", 10: "5-mC"}
+    # BamHI GGATCC is blocked by Dam, EcoRI is not methylated
+    assert list(ss_seq.cut_sites.keys()) == [11]
+    ss_seq.add_methylation(["Dam"])
+    assert len(ss_seq.base_modifications) == 3
+
+    circular_seq = SingleStrandNucleicAcidSequence(sequence="GGTTTTCCA", circular=True)
+    circular_seq.add_methylation(["Dcm"])
+    assert list(circular_seq.base_modifications.keys()) == [7]
+
+    rev_seq = SingleStrandNucleicAcidSequence(sequence="CTAGGTCC", strand_direction="reverse")
+    rev_seq.add_methylation(["Dam", "Dcm"])
+    assert {pos: mod.modification_type for pos, mod in rev_seq.base_modifications.items()} == {
+        2: "6-mA", 6: "5-mC"}
@@ -0,0 +1,61 @@
+import pytest
+
+from src.double_stranded_nucleic_acids import DoubleStrandNucleicAcidSequence
+from src.nucleic_acids import reverse_complement_sequence, reverse_sequence
+from src.single_stranded_nucleic_acids import SingleStrandNucleicAcidSequence
+from src.translations import find_orfs, translate_sequence
+
+gene = "ATGAAACCCGGGTAA"
+
+
+def test_translate_sequence():
+    assert translate_sequence("ATGAAACCCGGGTAAGG") == "MKPG*"
+    assert translate_sequence("ATGAAACCCGGGTAAGG", to_stop=True) == "MKPG"
+    assert translate_sequence("augaaauaa") == "MK*"
+    # TGA is tryptophan in vertebrate mitochondria
+    assert translate_sequence("ATGTGA", table_id=2) == "MW"
+    # GAY is always D, RAY is D or N, NNN could be anything
+    assert translate_sequence("GAYRAYNNN") == "DBX"
+    with pytest.raises(ValueError):
+        translate_sequence("ATG", table_id=3)
+
+
+def test_find_orfs():
+    assert find_orfs("CC" + gene + "CC", min_protein_length=3) == [
+        {"start": 2, "end": 16, "strand": 1, "frame": 3, "protein": "MKPG"}]
+    assert find_orfs("CC" + gene + "CC", min_protein_length=5) == []
+    rev_seq = "C" + reverse_complement_sequence(gene) + "C"
+    assert find_orfs(rev_seq, min_protein_length=3) == [
+        {"start": 1, "end": 15, "strand": -1, "frame": 2, "protein": "MKPG"}]
+    assert find_orfs(rev_seq, min_protein_length=3, both_strands=False) == []
+    # The gene runs across the origin of the ring
+    circular_seq = gene[6:] + "CC" + gene[:6]
+    assert find_orfs(circular_seq, min_protein_length=3) == []
+    assert find_orfs(circular_seq, circular=True, min_protein_length=3) == [
+        {"start": 11, "end": 8, "strand": 1, "frame": 3, "protein": "MKPG"}]
+    # No stop for more than one turn in one frame, the ORFs are the same wherever the origin is
+    ring = "CGATGAACGTTACATTACCTGGTACTTGTTC"
+    for offset in range(len(ring)):
+        orfs = find_orfs(ring[offset:] + ring[:offset], circular=True, min_protein_length=3)
+        assert [((orf["start"] + offset) % len(ring), (orf["end"] + offset) % len(ring), orf["protein"])
+                for orf in orfs] == [(25, 5, "MFR")]
+
+
+def test_strand_translation_and_orfs():
+    ssDNA = SingleStrandNucleicAcidSequence(
+        sequence=reverse_sequence("CC" + gene + "C"), nucleic_acid_type="DNA", circular=False,
+        strand_direction="reverse")
+    assert ssDNA.translate(frame=3) == "MKPG*"
+    orfs = ssDNA.find_orfs(min_protein_length=3, add_annotations=True)
+    assert [(orf["name"], orf["start"], orf["end"]) for orf in orfs] == [("ORF1", 1, 15)]
+    assert ssDNA.annotations["ORF1"].note == "strand +1, frame 3, 4 aa"
+
+    dsDNA = DoubleStrandNucleicAcidSequence(
+        forward_sequence="C" + gene + "G" + reverse_complement_sequence(gene) + "CC",
+        nucleic_acid_type="DNA", circular=False)
+    assert dsDNA.translate(2).startswith("MKPG*")
+    assert dsDNA.translate(-3).startswith("MKPG*")
+    orfs = dsDNA.find_orfs(min_protein_length=3, add_annotations=True)
+    assert [(orf["name"], orf["start"], orf["end"], orf["strand"]) for orf in orfs] == [
+        ("ORF_fwd1", 1, 15, 1), ("ORF_rev1", 17, 31, -1)]
+    assert dsDNA.reverse_sequence.annotations["ORF_rev1"].note == "strand -1, frame 3, 4 aa"
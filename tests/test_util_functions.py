@@ -1,4 +1,8 @@
-from src.util_functions import kmer_trimming_search
+import os
+
+import pytest
+
+from src.util_functions import circular_find, imap_windows, kmer_trimming_search
 
 
 def test_kmer_trimming_search():
@@ -33,3 +37,34 @@ def test_kmer_trimming_search_overhangs():
     assert fwd_search_index_end == expected_fwd_search_index_end
     assert rev_search_index_start == expected_rev_search_index_start
     assert rev_search_index_end == expected_rev_search_index_end
+
+
+def test_circular_search_across_origin():
+    seq = "TTCAAAAGAA"
+    assert circular_find(seq, "GAATTC") == 7
+    assert circular_find(seq, "GAATTC", start=8) == -1
+    assert circular_find(seq, "CAAAA") == 2
+    assert kmer_trimming_search(seq, "GAATTC") == (0, 2)
+    assert kmer_trimming_search(seq, "GAATTC", circular=True) == (7, 2)
+
+
+class _InlinePool:
+    def __init__(self):
+        self.windows = []
+
+    def imap(self, function, jobs, chunksize=1):
+        self.windows.append(len(jobs))
+        return map(function, jobs)
+
+
+def test_imap_windows(monkeypatch):
+    pool = _InlinePool()
+    assert list(imap_windows(pool, abs, range(-10, 0), processes=2)) == list(range(10, 0, -1))
+    assert pool.windows == [8, 2]
+    # Platforms where the CPU count is unknown run as if there was one
+    monkeypatch.setattr(os, "cpu_count", lambda: None)
+    pool = _InlinePool()
+    assert list(imap_windows(pool, abs, range(10), processes=None, chunksize=2)) == list(range(10))
+    assert pool.windows == [8, 2]
+    with pytest.raises(ValueError):
+        list(imap_windows(pool, abs, range(10), processes=None, chunksize=0))
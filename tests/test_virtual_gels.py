@@ -0,0 +1,57 @@
+import csv
+
+import numpy as np
+import pytest
+
+from src.double_stranded_nucleic_acids import DoubleStrandNucleicAcidSequence
+from src.virtual_gels import GelModel, band_matrix, digest_fragments, ladders, run_gel, write_bands
+
+plasmid_seq = "A" * 100 + "GAATTC" + "T" * 294 + "GGATCC" + "C" * 594
+
+
+def test_digest_fragments_of_circular_and_linear_constructs():
+    plasmid = DoubleStrandNucleicAcidSequence(forward_sequence=plasmid_seq, circular=True, reverse_sequence_start=0)
+    plasmid.scan_cut_sites(processes=1)
+    assert digest_fragments(plasmid, ["EcoRI", "BamHI"]) == [700, 300]
+    assert digest_fragments(plasmid, ["EcoRI"]) == [1000]
+    assert digest_fragments(plasmid, ["NotI"]) == [1000]
+    linear = DoubleStrandNucleicAcidSequence(forward_sequence=plasmid_seq)
+    linear.scan_cut_sites(processes=1)
+    assert digest_fragments(linear) == [599, 300, 101]
+    with pytest.raises(ValueError):
+        digest_fragments(linear, ["NotAnEnzyme"])
+
+
+def test_migration_follows_size_and_agarose():
+    model = GelModel(agarose_percent=1.0)
+    distances = model.migration([10000, 3000, 1000, 500])
+    assert np.all(np.diff(distances) > 0)
+    assert distances[0] == pytest.approx(0.1 * model.run_length)
+    assert distances[-1] == pytest.approx(0.9 * model.run_length)
+    # Small fragments separate better on a denser gel
+    assert np.diff(GelModel(agarose_percent=2.0).migration([300, 200]))[0] > \
+        np.diff(model.migration([300, 200]))[0]
+    with pytest.raises(ValueError):
+        GelModel(agarose_percent=5).migration([1000])
+
+
+def test_run_gel_of_a_plate(tmp_path):
+    products = [{"size": 850, "template_id": "a"}, {"size": 300, "template_id": "a"}]
+    plasmid = DoubleStrandNucleicAcidSequence(forward_sequence=plasmid_seq)
+    lanes = [[1000, 500]] * 94 + [products, plasmid]
+    gel = run_gel(lanes, ladder="100bp")
+    assert gel.names[:3] == ("100bp", "1", "2") and len(gel.names) == 97
+    assert gel.sizes.size == len(ladders["100bp"]) + 94 * 2 + 3
+    assert [size for size, _ in gel.bands(95)] == [850, 300]
+    assert gel.bands(96) == [(1000, gel.bands(1)[0][1])]
+    matrix = band_matrix(gel, pixels_per_mm=2)
+    assert matrix.shape == (97, 121) and matrix.max() == 1
+    # Bands of the same size line up across lanes
+    assert np.argmax(matrix[1]) == np.argmax(matrix[96])
+    path = write_bands(gel, str(tmp_path / "bands.csv"))
+    with open(path) as handle:
+        rows = list(csv.DictReader(handle))
+    assert rows[len(ladders["100bp"])] == {"lane": "1", "name": "1", "size": "1000",
+                                           "distance": str(round(gel.bands(1)[0][1], 3))}
+    with pytest.raises(ValueError):
+        run_gel(lanes, names=["only one"])